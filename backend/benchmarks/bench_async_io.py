@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark SSE latency while knowledge files are read and written concurrently:
+blocking read/write_file_content vs. their async variants.
+
+A ticker coroutine stands in for an SSE stream emitting an event every
+few milliseconds; its lateness is how long other streams would stall.
+
+Usage: python benchmarks/bench_async_io.py [clients] [file_mb]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend directory to the path so we can import sgope
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sgope.memory import KnowledgeFileHandler
+
+TICK = 0.005
+ROUNDS = 5
+
+
+async def ticker(stop: asyncio.Event, lateness: list):
+    """Emit an event every TICK seconds and record how late each one is"""
+    loop = asyncio.get_running_loop()
+    expected = loop.time() + TICK
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, expected - loop.time()))
+        lateness.append(max(0.0, loop.time() - expected) * 1000)
+        expected += TICK
+
+
+async def sync_client(handler, paths, payload):
+    for _ in range(ROUNDS):
+        for path in paths:
+            handler.read_file_content(path)
+            handler.write_file_content(path, payload)
+            await asyncio.sleep(0)
+
+
+async def async_client(handler, paths, payload):
+    for _ in range(ROUNDS):
+        for path in paths:
+            await handler.aread_file_content(path)
+            await handler.awrite_file_content(path, payload)
+
+
+async def measure(client, handler, paths, payload, clients: int):
+    stop = asyncio.Event()
+    lateness: list = []
+    tick_task = asyncio.create_task(ticker(stop, lateness))
+    start = time.perf_counter()
+    await asyncio.gather(*(client(handler, paths, payload) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    return elapsed, lateness
+
+
+def report(label: str, elapsed: float, lateness: list):
+    lateness = sorted(lateness) or [0.0]
+    p99 = lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))]
+    print(
+        f"{label:<6} | total {elapsed:6.2f} s"
+        f" | SSE lateness p50 {statistics.median(lateness):7.2f} ms"
+        f" p99 {p99:7.2f} ms max {lateness[-1]:7.2f} ms"
+    )
+
+
+def main(clients: int, file_mb: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = Path(tmp) / "data" / "memory" / "knowledge_files"
+        data_path.mkdir(parents=True)
+        payload = ("lorem ipsum dolor sit amet " * 40 + "\n") * (file_mb * 1024)
+        for i in range(4):
+            (data_path / f"large_{i}.log").write_text(payload)
+
+        handler = KnowledgeFileHandler(data_path=data_path)
+        # Every read goes to disk so both variants do the same I/O
+        handler.content_cache.max_bytes = 0
+        paths = [f"data/memory/knowledge_files/large_{i}.log" for i in range(4)]
+
+        print(
+            f"{clients} clients, 4 files of ~{len(payload) // 2**20} MB, {ROUNDS} rounds"
+        )
+        for label, client in (("sync", sync_client), ("async", async_client)):
+            elapsed, lateness = asyncio.run(
+                measure(client, handler, paths, payload, clients)
+            )
+            report(label, elapsed, lateness)
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    file_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    main(clients, file_mb)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory use of knowledge items: List[Memory] vs. the columnar KnowledgeStore.
+
+Usage: python benchmarks/bench_memory.py [sizes...]
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Add the backend directory to the path so we can import sgope
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sgope.memory import Memory
+from sgope.memory._search_index import SearchIndex
+from sgope.memory._store import KnowledgeStore
+
+ROOT = "data/memory/knowledge_files"
+
+
+def make_records(size: int):
+    rng = random.Random(size)
+    now = time.time()
+    records = []
+    for i in range(size):
+        directory = f"{ROOT}/project_{i % 200}"
+        name = f"notes_{rng.randint(0, 10**6)}_{i}.md"
+        records.append(
+            [f"{directory}/{name}", "file", rng.randint(0, 10**6), now, 1000 + i]
+        )
+    return records
+
+
+def build_models(records):
+    """Items as the handler used to hold them: one pydantic Memory per file"""
+    items = []
+    for path, item_type, size, mtime, _ in records:
+        parent, name = path.rsplit("/", 1)
+        items.append(
+            Memory(
+                type=item_type,
+                name=name,
+                file_path=path,
+                updated_at=datetime.fromtimestamp(mtime),
+                size=size,
+                metadata={
+                    "extension": ".md",
+                    "parent_dir": parent,
+                    "is_hidden": False,
+                    "absolute_path": f"/srv/sgope/backend/{path}",
+                },
+            )
+        )
+    return items
+
+
+def build_store(records):
+    store = KnowledgeStore()
+    for record in records:
+        store.append(*record)
+    return store
+
+
+def build_store_and_index(records):
+    store = build_store(records)
+    index = SearchIndex()
+    for row in store.rows():
+        index.add(row, store.names[row])
+    return store, index
+
+
+def measure(builder, records):
+    gc.collect()
+    tracemalloc.start()
+    result = builder(records)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 1024 / 1024
+
+
+def run(size: int):
+    # Paths arrive as fresh strings from the filesystem or manifest, so the
+    # records themselves are allocated before measuring
+    records = make_records(size)
+    models_mb = measure(build_models, records)
+    store_mb = measure(build_store, records)
+    indexed_mb = measure(build_store_and_index, records)
+    print(
+        f"{size:>7} items | List[Memory] {models_mb:8.1f} MB"
+        f" | KnowledgeStore {store_mb:6.1f} MB"
+        f" | KnowledgeStore + SearchIndex {indexed_mb:6.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    for size in sizes:
+        run(size)
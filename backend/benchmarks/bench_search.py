@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark knowledge file suggestions: ranked fuzzy search vs. the old linear scan.
+
+Usage: python benchmarks/bench_search.py [sizes...]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the backend directory to the path so we can import sgope
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sgope.memory import KnowledgeFileHandler, Memory
+
+WORDS = [
+    "notes",
+    "meeting",
+    "project",
+    "design",
+    "report",
+    "budget",
+    "roadmap",
+    "config",
+    "server",
+    "client",
+    "api",
+    "schema",
+    "draft",
+    "summary",
+    "todo",
+    "research",
+    "paper",
+    "review",
+    "release",
+    "plan",
+    "ideas",
+    "journal",
+]
+EXTENSIONS = [".md", ".txt", ".py", ".json", ".csv"]
+QUERIES = ["r", "rep", "proj", "mtng", "projnotes", "srvcfg", "release_plan", "zzz"]
+
+
+def make_name(rng: random.Random) -> str:
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    if rng.random() < 0.5:
+        words = [words[0]] + [w.title() for w in words[1:]]
+        stem = "".join(words)
+    else:
+        stem = "_".join(words)
+    return f"{stem}_{rng.randint(0, 9999)}{rng.choice(EXTENSIONS)}"
+
+
+def legacy_search(items, query):
+    """The original KnowledgeFileHandler.search: lowercase and scan everything"""
+    query_lower = query.lower()
+    suggestions = []
+    for item in items:
+        if query_lower in item.name.lower():
+            suggestions.append(item)
+    return suggestions[:10]
+
+
+def time_per_query(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            fn(query)
+    return (time.perf_counter() - start) / (repeat * len(QUERIES)) * 1000
+
+
+def run(size: int):
+    rng = random.Random(size)
+    now = datetime.now()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = KnowledgeFileHandler(data_path=Path(tmp))
+        for _ in range(size):
+            name = make_name(rng)
+            handler.add(
+                Memory(
+                    name=name,
+                    file_path=f"data/memory/knowledge_files/{name}",
+                    updated_at=now - timedelta(days=rng.random() * 90),
+                )
+            )
+
+    items = handler.memory
+    repeat = max(1, 20000 // size)
+    # The sorted tables are built on the first lookup; keep that out of the timing
+    handler.search(QUERIES[0])
+    legacy_ms = time_per_query(lambda q: legacy_search(items, q), repeat)
+    ranked_ms = time_per_query(handler.search, repeat)
+    print(
+        f"{size:>7} items | legacy scan {legacy_ms:8.3f} ms/query"
+        f" | ranked fuzzy {ranked_ms:8.3f} ms/query"
+    )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    for size in sizes:
+        run(size)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import json
 from typing import Any, AsyncGenerator, Dict, List, Optional
@@ -11,6 +12,9 @@ from ._openai import OpenAIService
 # Load environment variables
 load_dotenv()
 
+# Concurrent background requests per service type (OLLAMA_MAX_CONCURRENCY, ...)
+DEFAULT_MAX_CONCURRENCY = {"ollama": 2, "openai": 8}
+
 
 class ServiceConfig:
     """In-memory configuration for LLM services (frontend is source of truth)"""
@@ -43,6 +47,7 @@ class LLMManager:
         self.service_config = ServiceConfig()
         self.services = {}
         self.model_mapping = {}
+        self._limits: Dict[Optional[str], asyncio.Semaphore] = {}
         
         # Initialize services from configuration
         self._initialize_services()
@@ -214,6 +219,56 @@ class LLMManager:
                 "timestamp": "unknown"
             }
     
+    async def complete_json(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        model: str = None,
+        max_tokens: int = 256
+    ) -> Optional[Dict[str, Any]]:
+        """One short structured-output request: the response parsed as a JSON object
+
+        The service constrains the output to ``schema`` (JSON schema), so
+        several fields come back from a single call instead of one streamed
+        call each. Returns None if the model is unavailable, the request
+        fails or the response is not a JSON object.
+        """
+        model = model or self.service_config.get_default_model()
+        service = self.services.get(self.model_mapping.get(model))
+        if service is None or not hasattr(service, "complete_json"):
+            return None
+
+        text = await service.complete_json(messages, schema, model, max_tokens)
+        if not text:
+            return None
+        try:
+            result = json.loads(text)
+        except json.JSONDecodeError:
+            # Some backends wrap the object in prose or code fences
+            start, end = text.find("{"), text.rfind("}")
+            try:
+                result = json.loads(text[start:end + 1]) if start != -1 else None
+            except json.JSONDecodeError:
+                result = None
+        return result if isinstance(result, dict) else None
+
+    def concurrency_limit(self, model: Optional[str] = None) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent background requests to the service serving ``model``
+
+        Fan-out work (e.g. analysing many files) holds it around each request so
+        a local backend is not flooded. Sized per service type by
+        ``<TYPE>_MAX_CONCURRENCY`` (``OLLAMA_MAX_CONCURRENCY``, ``OPENAI_MAX_CONCURRENCY``).
+        """
+        service_id = self.model_mapping.get(model or self.service_config.get_default_model())
+        if service_id not in self._limits:
+            service_type = self.service_config.get_services().get(service_id, {}).get("type", "llm")
+            limit = int(os.getenv(
+                f"{service_type.upper()}_MAX_CONCURRENCY",
+                str(DEFAULT_MAX_CONCURRENCY.get(service_type, 4)),
+            ))
+            self._limits[service_id] = asyncio.Semaphore(max(1, limit))
+        return self._limits[service_id]
+
     def get_available_models(self) -> Dict[str, Any]:
         """Get available models from all configured services with health status"""
         result = {
@@ -5,6 +5,7 @@
 # Return the response
 
 import asyncio
+import time
 from datetime import datetime
 from typing import Any, AsyncGenerator, Dict, List, Optional
 import os
@@ -15,6 +16,21 @@ except ImportError:
     AsyncClient = None
     Client = None
 
+# Seconds before retrying structured output on a model where every format failed
+JSON_MODE_RETRY = 600
+
+
+def _rejects_format(error: Exception) -> bool:
+    """Whether ``error`` says the request (its format) was refused.
+
+    Timeouts, connection failures and server errors are transient and say
+    nothing about whether the model supports structured output.
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return 400 <= status < 500 and status not in (408, 429)
+    return "format" in str(error)
+
 
 class OllamaService:
     def __init__(self, host: str = "http://localhost:11434"):
@@ -24,6 +40,8 @@ class OllamaService:
         verify_ssl_setting = os.getenv("OLLAMA_VERIFY_SSL", "False").lower() == "true"
         self.client = Client(host=host, trust_env=trust_env_setting,verify=verify_ssl_setting) if Client else None
         self.async_client = AsyncClient(host=host, trust_env=trust_env_setting,verify=verify_ssl_setting) if AsyncClient else None
+        # model -> index of the response format that worked, or the time all of them failed
+        self._json_modes: Dict[str, Any] = {}
         
     async def stream_chat(
         self, 
@@ -84,6 +102,55 @@ class OllamaService:
                 "timestamp": datetime.now().isoformat()
             }
     
+    async def complete_json(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        model: str = "llama3.2",
+        max_tokens: int = 256
+    ) -> Optional[str]:
+        """One non-streamed response constrained to ``schema`` (Ollama ``format``)
+
+        Falls back to plain JSON mode for servers without schema support.
+        The format that worked is remembered per model, so later calls make
+        one request; only a refused request (4xx) moves on to the next format.
+        Returns the raw JSON text, or None if the request failed.
+        """
+        if not self.async_client:
+            return None
+
+        response_formats = [schema, "json"]
+        mode = self._json_modes.get(model)
+        if isinstance(mode, float):
+            if time.monotonic() - mode < JSON_MODE_RETRY:
+                return None
+            mode = None
+
+        for index in ([mode] if mode is not None else range(len(response_formats))):
+            try:
+                response = await self.async_client.chat(
+                    model=model,
+                    messages=messages,
+                    stream=False,
+                    format=response_formats[index],
+                    options={"num_predict": max_tokens, "temperature": 0}
+                )
+            except Exception as e:
+                print(f"Ollama structured output ({'schema' if index == 0 else 'json'}) failed: {e}")
+                if not _rejects_format(e):
+                    # Try again on the next call without downgrading the model
+                    return None
+                continue
+            self._json_modes[model] = index
+            return response.get('message', {}).get('content', '')
+
+        if mode is None:
+            self._json_modes[model] = time.monotonic()
+        else:
+            # A remembered format that stops working is negotiated again next time
+            self._json_modes.pop(model, None)
+        return None
+
     def list_models(self) -> List[str]:
         """List available Ollama models"""
         if not self.client:
@@ -6,6 +6,7 @@
 
 import asyncio
 import os
+import time
 from datetime import datetime
 from typing import Any, AsyncGenerator, Dict, List, Optional
 import httpx
@@ -16,6 +17,26 @@ except ImportError:
     AsyncOpenAI = None
     OpenAI = None
 
+# Seconds before retrying structured output on a model where every format failed
+JSON_MODE_RETRY = 600
+
+# Reasoning models spend hidden tokens before answering, all counted against
+# max_completion_tokens; give them room so the JSON is not cut off
+REASONING_MODEL_PREFIXES = ("o1", "o3", "o4", "gpt-5")
+REASONING_MAX_TOKENS = 4096
+
+
+def _rejects_format(error: Exception) -> bool:
+    """Whether ``error`` says the request (its response_format) was refused.
+
+    Timeouts, rate limits and server errors are transient and say nothing
+    about whether the model supports structured output.
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return 400 <= status < 500 and status not in (408, 429)
+    return "response_format" in str(error)
+
 
 class OpenAIService:
     """
@@ -27,6 +48,8 @@ class OpenAIService:
         self.base_url = base_url
         self.client = None
         self.sync_client = None
+        # model -> index of the response format that worked, or the time all of them failed
+        self._json_modes: Dict[str, Any] = {}
 
         # Determine SSL verification setting for OpenAI
         trust_env_setting = os.getenv("OPENAI_TRUST_ENV", "False").lower() == "true"
@@ -103,6 +126,64 @@ class OpenAIService:
                 "timestamp": datetime.now().isoformat(),
             }
 
+    async def complete_json(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        model: str = "gpt-3.5-turbo",
+        max_tokens: int = 256,
+    ) -> Optional[str]:
+        """One non-streamed response constrained to ``schema`` (``response_format``)
+
+        Falls back to JSON mode for endpoints without JSON schema support.
+        The format that worked is remembered per model, so later calls make
+        one request; only a refused request (4xx) moves on to the next format.
+        Returns the raw JSON text, or None if the request failed.
+        """
+        if not self.client:
+            return None
+
+        mode = self._json_modes.get(model)
+        if isinstance(mode, float):
+            if time.monotonic() - mode < JSON_MODE_RETRY:
+                return None
+            mode = None
+
+        response_formats = [
+            {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": schema, "strict": True},
+            },
+            {"type": "json_object"},
+        ]
+        if model.startswith(REASONING_MODEL_PREFIXES):
+            max_tokens = max(max_tokens, REASONING_MAX_TOKENS)
+        for index in ([mode] if mode is not None else range(len(response_formats))):
+            try:
+                # max_completion_tokens (not max_tokens) and the default temperature:
+                # reasoning models (o-series) reject the alternatives
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_format=response_formats[index],
+                    max_completion_tokens=max_tokens,
+                )
+            except Exception as e:
+                print(f"OpenAI structured output ({response_formats[index]['type']}) failed: {e}")
+                if not _rejects_format(e):
+                    # Try again on the next call without downgrading the model
+                    return None
+                continue
+            self._json_modes[model] = index
+            return response.choices[0].message.content if response.choices else None
+
+        if mode is None:
+            self._json_modes[model] = time.monotonic()
+        else:
+            # A remembered format that stops working is negotiated again next time
+            self._json_modes.pop(model, None)
+        return None
+
     def list_models(self) -> List[str]:
         """List available models - returns empty list as models are configured per service"""
         # Models are configured per service instance, not globally
@@ -1,10 +1,15 @@
 from ._actions import ActionHandler
+from ._jobs import JobQueue, default_job_queue
 from ._knowledge_files import KnowledgeFileHandler
+from ._metadata import clean_filename, generate_metadata
+from ._patching import PatchConflict, PatchError
+from ._retrieval import assemble_context, context_budget
 from ._types import Action, Memory, Suggestion
 
 # Create global instances
 knowledge_file_handler = KnowledgeFileHandler()
 action_handler = ActionHandler()
+job_queue = default_job_queue()
 
 __all__ = [
     "Memory",
@@ -14,4 +19,12 @@ __all__ = [
     "ActionHandler",
     "knowledge_file_handler",
     "action_handler",
+    "JobQueue",
+    "job_queue",
+    "assemble_context",
+    "context_budget",
+    "generate_metadata",
+    "clean_filename",
+    "PatchError",
+    "PatchConflict",
 ]
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_used ON analyses (used);
+"""
+
+
+class AnalysisCache:
+    """Persistent cache of LLM analyses and summaries (SQLite).
+
+    Entries are keyed by the SHA-256 of the kind of analysis, its prompt
+    template version, the model and the analysed content, so unchanged
+    input costs no LLM call while a new prompt or model misses. Entries
+    unused for ``max_age`` seconds expire, and the least recently used
+    are evicted once the stored results exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, max_age: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(kind: str, version: int, model: Optional[str], content: str) -> str:
+        digest = hashlib.sha256(f"{kind}\0{version}\0{model or ''}\0".encode("utf-8"))
+        digest.update(content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT result FROM analyses WHERE key = ? AND used >= ?",
+                    (key, time.time() - self.max_age),
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute(
+                    "UPDATE analyses SET used = ? WHERE key = ?", (time.time(), key)
+                )
+                conn.commit()
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            print(f"Error reading analysis cache: {e}")
+            return None
+
+    def put(self, key: str, kind: str, result: str):
+        if not self.enabled or not result:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, kind, result, len(result.encode("utf-8")), now, now),
+                )
+                self._evict(conn, now)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing analysis cache: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        entries = size = 0
+        if self.enabled:
+            try:
+                with self._lock:
+                    entries, size = (
+                        self._connect()
+                        .execute(
+                            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses"
+                        )
+                        .fetchone()
+                    )
+            except sqlite3.Error:
+                pass
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM analyses WHERE used < ?", (now - self.max_age,))
+        (total,) = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM analyses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until under the limit
+        freed = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM analyses ORDER BY used"):
+            if total - freed <= self.max_bytes:
+                break
+            doomed.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM analyses WHERE key = ?", doomed)
+
+
+def default_analysis_cache() -> AnalysisCache:
+    """Cache under data/memory, sized by ``ANALYSIS_CACHE_MAX_BYTES`` / ``ANALYSIS_CACHE_MAX_AGE_DAYS``"""
+    return AnalysisCache(
+        Path(__file__).parent.parent.parent / "data" / "memory" / "analysis_cache.db",
+        max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        max_age=float(os.getenv("ANALYSIS_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600,
+    )
@@ -0,0 +1,414 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no reflinks, blobs are always copied
+    fcntl = None
+
+BLOBS_VERSION = 2
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+# Linux ioctl sharing a file's extents (btrfs, XFS, ...) instead of copying them
+_FICLONE = 0x40049409
+
+
+def blob_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """Content-addressed (SHA-256) storage with a name -> digest map.
+
+    Blobs live at ``<directory>/<digest[:2]>/<digest[2:]>``. Knowledge files
+    are independent copies of their blob (reflinks where the filesystem
+    supports them, so the data is still stored once), which any tool may
+    edit in place. The digest -> names map lets identical content be found
+    and a name be traced back to its content without re-hashing. Each blob
+    and name remembers the ``(size, mtime_ns)`` it was written with; a file
+    edited since no longer matches and is treated as new content.
+
+    Mutating methods update the index in memory; callers ``save`` it once
+    per operation.
+
+    Numbered names (``notes_2.txt``, ``notes_3.txt``, ...) come from a
+    per-stem counter instead of probing for the first free suffix.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._index_path = directory / "index.json"
+        self._lock = threading.RLock()
+        # digest -> [size, mtime_ns]
+        self._blobs: Dict[str, List[int]] = {}
+        # name -> [digest, size, mtime_ns]
+        self._names: Dict[str, list] = {}
+        # digest -> names bound to it
+        self._by_digest: Dict[str, List[str]] = {}
+        # source digest (what a file was generated from) -> name
+        self._sources: Dict[str, str] = {}
+        # stem -> next numeric suffix
+        self._counters: Dict[str, int] = {}
+        # attachment digest -> last use (epoch seconds)
+        self._attachments: Dict[str, float] = {}
+        # Names may still be hard links to their blob (index version 1)
+        self.linked = False
+        self._load()
+
+    @staticmethod
+    def is_digest(value: str) -> bool:
+        return isinstance(value, str) and _DIGEST_RE.fullmatch(value) is not None
+
+    def path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest[2:]
+
+    def has(self, digest: str) -> bool:
+        """Whether the blob exists and is unmodified"""
+        if not self.is_digest(digest):
+            return False
+        with self._lock:
+            recorded = self._blobs.get(digest)
+        return recorded is not None and self._stat(self.path(digest)) == recorded
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` (if not already present) and return its digest"""
+        digest = blob_digest(data)
+        if self.has(digest):
+            return digest
+        writer = self.writer()
+        try:
+            writer.write(data)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def writer(self) -> "BlobWriter":
+        """A writer that streams a new blob to disk, hashing as it goes"""
+        return BlobWriter(self)
+
+    def get(self, digest: str) -> Optional[bytes]:
+        if not self.has(digest):
+            return None
+        try:
+            return self.path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def find(self, digest: str, directory: Path) -> Optional[str]:
+        """A name in ``directory`` still holding exactly the blob ``digest``"""
+        with self._lock:
+            for name in list(self._by_digest.get(digest, ())):
+                if self._name_current(name, directory):
+                    return name
+            return None
+
+    def find_source(self, source: str, directory: Path) -> Optional[str]:
+        """The name previously generated from ``source``, if still unmodified"""
+        with self._lock:
+            name = self._sources.get(source)
+            if name is not None and self._name_current(name, directory):
+                return name
+            self._sources.pop(source, None)
+            return None
+
+    def materialize(
+        self, digest: str, directory: Path, filename: str
+    ) -> Tuple[Path, str]:
+        """Create a file for blob ``digest`` in ``directory`` under a free name.
+
+        ``filename`` is used if free, otherwise the next ``stem_N.ext`` from
+        the stem's counter. The exclusive create claims the name
+        atomically, so concurrent adds never overwrite each other.
+        """
+        with self._lock:
+            name = filename
+            while True:
+                target = directory / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    self._copy(digest, target)
+                    break
+                except FileExistsError:
+                    name = self._next_name(filename)
+
+            self._bind(name, digest, self._stat(target))
+            return target, name
+
+    def replace(
+        self, name: str, digest: str, directory: Path, filename: Optional[str] = None
+    ) -> Tuple[Path, str]:
+        """Swap the file ``name`` for blob ``digest``, renamed to ``filename``.
+
+        A new name is claimed as in ``materialize`` before the old file is
+        removed; keeping the name, the blob is copied to a temp name and
+        renamed over it. Either way the file is never missing. Sources bound
+        to ``name`` follow it to the new name.
+        """
+        with self._lock:
+            if filename and filename != name:
+                target, new_name = self.materialize(digest, directory, filename)
+                try:
+                    (directory / name).unlink()
+                except FileNotFoundError:
+                    pass
+                self._unbind(name)
+            else:
+                target, new_name = directory / name, name
+                tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+                try:
+                    tmp_path.unlink()
+                except FileNotFoundError:
+                    pass
+                self._copy(digest, tmp_path)
+                os.replace(tmp_path, target)
+                self._bind(name, digest, self._stat(target))
+
+            for source, bound in self._sources.items():
+                if bound == name:
+                    self._sources[source] = new_name
+            return target, new_name
+
+    def unlink_names(self, directory: Path) -> int:
+        """Turn names hard-linked to their blob (index version 1) into copies.
+
+        Each copy replaces its name atomically and keeps its content and
+        mtime. Returns the number of names converted.
+        """
+        converted = 0
+        with self._lock:
+            for name in list(self._names):
+                target = directory / name
+                try:
+                    if os.stat(target).st_nlink <= 1:
+                        continue
+                except FileNotFoundError:
+                    continue
+                current = self._name_current(name, directory)
+                tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+                try:
+                    tmp_path.unlink()
+                except FileNotFoundError:
+                    pass
+                shutil.copy2(target, tmp_path)
+                os.replace(tmp_path, target)
+                if current:
+                    self._bind(name, self._names[name][0], self._stat(target))
+                converted += 1
+            self.linked = False
+        return converted
+
+    def current(self, name: str, directory: Path) -> bool:
+        """Whether ``name`` still holds exactly the content it was written with"""
+        with self._lock:
+            return self._name_current(name, directory)
+
+    def touch_attachment(self, digest: str):
+        """Mark ``digest`` as an attachment in use, keeping it from ``prune``"""
+        with self._lock:
+            self._attachments[digest] = time.time()
+
+    def bind_source(self, source: str, name: str):
+        with self._lock:
+            self._sources[source] = name
+
+    def prune(self, directory: Path, attachment_retention: float = 0) -> int:
+        """Delete blobs no file links to and no attachment used within the retention"""
+        removed = 0
+        cutoff = time.time() - attachment_retention
+        with self._lock:
+            for name in list(self._names):
+                self._name_current(name, directory)
+            for digest, used in list(self._attachments.items()):
+                if used < cutoff:
+                    del self._attachments[digest]
+            for digest in list(self._blobs):
+                if self._by_digest.get(digest) or digest in self._attachments:
+                    continue
+                blob_path = self.path(digest)
+                try:
+                    # Still hard-linked from a name (index version 1)
+                    if os.stat(blob_path).st_nlink > 1:
+                        continue
+                    blob_path.unlink()
+                except FileNotFoundError:
+                    pass
+                del self._blobs[digest]
+                removed += 1
+            self.save()
+        return removed
+
+    def discard(self, digest: str):
+        """Delete blob ``digest`` unless a name or an attachment uses it"""
+        with self._lock:
+            if (
+                digest not in self._blobs
+                or self._by_digest.get(digest)
+                or digest in self._attachments
+            ):
+                return
+            try:
+                self.path(digest).unlink()
+            except FileNotFoundError:
+                pass
+            del self._blobs[digest]
+
+    def save(self):
+        """Write the index atomically (temp file + rename)"""
+        with self._lock:
+            index = {
+                "version": BLOBS_VERSION,
+                "blobs": self._blobs,
+                "names": self._names,
+                "sources": self._sources,
+                "counters": self._counters,
+                "attachments": self._attachments,
+            }
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._index_path.with_name(self._index_path.name + ".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(index, separators=(",", ":")))
+                os.replace(tmp_path, self._index_path)
+            except Exception as e:
+                print(f"Error saving blob index {self._index_path}: {e}")
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def _adopt(self, tmp_path: str, digest: str) -> bool:
+        """Move a fully written temp file into place as blob ``digest``.
+
+        Returns whether the blob is new (False if it already existed).
+        """
+        with self._lock:
+            if self.has(digest):
+                os.unlink(tmp_path)
+                return False
+            blob_path = self.path(digest)
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, blob_path)
+            self._blobs[digest] = self._stat(blob_path)
+            return True
+
+    def _load(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Ignoring unreadable blob index {self._index_path}: {e}")
+            return
+        if index.get("version") not in (1, BLOBS_VERSION):
+            return
+        # Version 1 hard-linked names to their blob; see unlink_names
+        self.linked = index["version"] == 1
+
+        self._blobs = index.get("blobs", {})
+        self._sources = index.get("sources", {})
+        self._counters = index.get("counters", {})
+        self._attachments = index.get("attachments", {})
+        for name, (digest, size, mtime_ns) in index.get("names", {}).items():
+            self._bind(name, digest, [size, mtime_ns])
+
+    def _bind(self, name: str, digest: str, stat: Optional[List[int]]):
+        self._unbind(name)
+        if stat is None:
+            return
+        self._names[name] = [digest, *stat]
+        self._by_digest.setdefault(digest, []).append(name)
+
+    def _unbind(self, name: str):
+        entry = self._names.pop(name, None)
+        if entry is None:
+            return
+        names = self._by_digest.get(entry[0], [])
+        if name in names:
+            names.remove(name)
+        if not names:
+            self._by_digest.pop(entry[0], None)
+
+    def _name_current(self, name: str, directory: Path) -> bool:
+        """Whether ``name`` is unmodified since it was bound; unbinds it if not"""
+        entry = self._names.get(name)
+        if entry is not None and self._stat(directory / name) == entry[1:]:
+            return True
+        self._unbind(name)
+        return False
+
+    def _copy(self, digest: str, target: Path):
+        """Create ``target`` as a copy of the blob (a reflink if possible).
+
+        Raises FileExistsError if ``target`` is taken.
+        """
+        with open(self.path(digest), "rb") as src, open(target, "xb") as dst:
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                    return
+                except OSError:
+                    # No reflink support on this filesystem: copy the bytes
+                    pass
+            shutil.copyfileobj(src, dst)
+
+    def _next_name(self, filename: str) -> str:
+        stem, ext = filename.rsplit(".", 1) if "." in filename else (filename, "txt")
+        counter = self._counters.get(stem, 2)
+        self._counters[stem] = counter + 1
+        return f"{stem}_{counter}.{ext}"
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[List[int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+
+class BlobWriter:
+    """Streams one blob into a temp file in the store, hashing each chunk.
+
+    ``commit`` moves it into place under its digest (dropping it if that
+    blob already exists); ``abort`` discards it. Memory use is one chunk
+    regardless of the blob's size.
+    """
+
+    def __init__(self, store: BlobStore):
+        self._store = store
+        store.directory.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.directory, suffix=".tmp")
+        # mkstemp creates 0600; blobs are copied into knowledge_files
+        os.fchmod(fd, 0o644)
+        self._file = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+        self.size = 0
+        # Whether commit added a new blob rather than matching an existing one
+        self.created = False
+
+    def write(self, data: bytes):
+        self._hash.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self) -> str:
+        self._file.close()
+        digest = self._hash.hexdigest()
+        self.created = self._store._adopt(self._tmp_path, digest)
+        return digest
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
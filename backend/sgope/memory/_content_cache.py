@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class ContentCache:
+    """Byte-bounded LRU of file contents, validated against the file's stat.
+
+    Entries are keyed on path and remember the ``(mtime_ns, size, inode)``
+    they were read at, so a modified or replaced file is a miss without any
+    explicit invalidation. The least recently used entries are evicted once
+    the cached strings exceed ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int, int], str, int]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def version(stat: os.stat_result) -> Tuple[int, int, int]:
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != self.version(stat):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path: str, stat: os.stat_result, content: str):
+        size = sys.getsizeof(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(path)
+            self._entries[path] = (self.version(stat), content, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._discard(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _discard(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= entry[2]
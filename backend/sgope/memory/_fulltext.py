@@ -0,0 +1,361 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+FULLTEXT_VERSION = 1
+TOKEN_RE = re.compile(r"\w+")
+MAX_TOKEN_LENGTH = 64
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of ``text``"""
+    return [
+        token
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) <= MAX_TOKEN_LENGTH
+    ]
+
+
+def make_snippet(
+    text: str, terms: Set[str], width: int = 240
+) -> Tuple[str, int, List[List[int]]]:
+    """Cut a window of ``text`` around the first match of any of ``terms``.
+
+    Returns ``(snippet, offset of the snippet in text, [[start, end], ...])``
+    with match offsets relative to the snippet.
+    """
+    matches = [
+        (match.start(), match.end())
+        for match in TOKEN_RE.finditer(text)
+        if match.group().lower() in terms
+    ]
+    if not matches:
+        return text[:width], 0, []
+
+    start = max(0, matches[0][0] - width // 4)
+    end = min(len(text), start + width)
+    return (
+        text[start:end],
+        start,
+        [[s - start, e - start] for s, e in matches if s >= start and e <= end],
+    )
+
+
+class _Segment:
+    """Documents and postings (``term -> [doc, tf, doc, tf, ...]``) of one batch"""
+
+    def __init__(self, seg_id: int):
+        self.id = seg_id
+        self.paths: List[str] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+
+    def add(self, path: str, counts: Counter, length: int) -> int:
+        doc = len(self.paths)
+        self.paths.append(path)
+        self.lengths.append(length)
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).extend((doc, tf))
+        return doc
+
+    def documents(self) -> Iterator[Tuple[int, str, Counter, int]]:
+        """``(doc, path, term counts, length)`` for every document"""
+        counts: List[Counter] = [Counter() for _ in self.paths]
+        for term, postings in self.postings.items():
+            for i in range(0, len(postings), 2):
+                counts[postings[i]][term] = postings[i + 1]
+        for doc, path in enumerate(self.paths):
+            yield doc, path, counts[doc], self.lengths[doc]
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id,
+            "paths": self.paths,
+            "lengths": self.lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "_Segment":
+        segment = cls(data["id"])
+        segment.paths = data["paths"]
+        segment.lengths = data["lengths"]
+        segment.postings = data["postings"]
+        return segment
+
+
+class FullTextIndex:
+    """BM25 inverted index over knowledge file contents.
+
+    New and changed documents go into an in-memory buffer segment; once it
+    holds ``buffer_size`` documents it is written to disk as an immutable
+    segment. Updates and deletes never touch old segments: ``_live`` maps each
+    path to the segment and document holding its current version, and stale
+    postings are skipped at query time. When more than ``max_segments``
+    segments accumulate, the smallest are merged into one, dropping stale
+    documents.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        buffer_size: int = 256,
+        max_segments: int = 8,
+        merge_factor: int = 4,
+    ):
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._next_id = 0
+        self._buffer = self._new_segment()
+        # path -> (segment id, doc, mtime, size)
+        self._live: Dict[str, Tuple[int, int, float, int]] = {}
+        self._total_length = 0
+        self._dirty = False
+        if directory is not None:
+            self._load()
+
+    def is_current(self, path: str, mtime: float, size: int) -> bool:
+        """Whether ``path`` is indexed at this mtime and size"""
+        entry = self._live.get(path)
+        return entry is not None and entry[2] == mtime and entry[3] == size
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._live)
+
+    def add(self, path: str, text: str, mtime: float, size: int):
+        """Index (or re-index) the contents of ``path``"""
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        with self._lock:
+            self._forget(path)
+            doc = self._buffer.add(path, counts, len(tokens))
+            self._live[path] = (self._buffer.id, doc, mtime, size)
+            self._total_length += len(tokens)
+            self._dirty = True
+            if len(self._buffer.paths) >= self.buffer_size:
+                self._flush()
+
+    def remove(self, path: str):
+        with self._lock:
+            if self._forget(path):
+                self._dirty = True
+
+    def remove_under(self, path: str):
+        """Remove ``path`` and every document below it"""
+        prefix = path.rstrip("/\\") + os.sep
+        with self._lock:
+            for indexed in [p for p in self._live if p.startswith(prefix)]:
+                self._forget(indexed)
+            self._forget(path)
+            self._dirty = True
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """``(path, score)`` of the best BM25 matches for ``query``"""
+        terms = set(tokenize(query))
+        with self._lock:
+            total_docs = len(self._live)
+            if not terms or not total_docs:
+                return []
+            avg_length = self._total_length / total_docs
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                hits = list(self._postings(term))
+                if not hits:
+                    continue
+                df = len(hits)
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                for path, tf, length in hits:
+                    norm = K1 * (1 - B + B * length / avg_length)
+                    scores[path] = scores.get(path, 0.0) + idf * tf * (K1 + 1) / (
+                        tf + norm
+                    )
+
+        return heapq.nlargest(limit, scores.items(), key=lambda hit: hit[1])
+
+    def save(self):
+        """Flush buffered documents to a segment and persist the index"""
+        with self._lock:
+            if self._buffer.paths:
+                self._flush()
+            elif self._dirty:
+                self._write_meta()
+
+    def __len__(self):
+        return len(self._live)
+
+    def _postings(self, term: str) -> Iterator[Tuple[str, int, int]]:
+        """``(path, tf, length)`` of live documents containing ``term``"""
+        live = self._live
+        for segment in self._segments + [self._buffer]:
+            postings = segment.postings.get(term)
+            if not postings:
+                continue
+            paths = segment.paths
+            for i in range(0, len(postings), 2):
+                doc = postings[i]
+                path = paths[doc]
+                entry = live.get(path)
+                if entry is not None and entry[0] == segment.id and entry[1] == doc:
+                    yield path, postings[i + 1], segment.lengths[doc]
+
+    def _forget(self, path: str) -> bool:
+        entry = self._live.pop(path, None)
+        if entry is None:
+            return False
+        segment = self._segment(entry[0])
+        if segment is not None:
+            self._total_length -= segment.lengths[entry[1]]
+        return True
+
+    def _segment(self, seg_id: int) -> Optional[_Segment]:
+        if seg_id == self._buffer.id:
+            return self._buffer
+        for segment in self._segments:
+            if segment.id == seg_id:
+                return segment
+        return None
+
+    def _new_segment(self) -> _Segment:
+        segment = _Segment(self._next_id)
+        self._next_id += 1
+        return segment
+
+    def _rewrite(self, sources: List[_Segment]) -> _Segment:
+        """Copy the live documents of ``sources`` into a fresh segment"""
+        target = self._new_segment()
+        for source in sources:
+            for doc, path, counts, length in source.documents():
+                entry = self._live.get(path)
+                if entry is None or entry[0] != source.id or entry[1] != doc:
+                    continue
+                new_doc = target.add(path, counts, length)
+                self._live[path] = (target.id, new_doc, entry[2], entry[3])
+        return target
+
+    def _flush(self):
+        buffer, self._buffer = self._buffer, self._new_segment()
+        segment = self._rewrite([buffer])
+        if segment.paths:
+            self._segments.append(segment)
+            self._write_segment(segment)
+        self._merge()
+        self._write_meta()
+
+    def _merge(self):
+        """Merge the smallest segments while there are too many"""
+        removed: List[_Segment] = []
+        while len(self._segments) > self.max_segments:
+            self._segments.sort(key=lambda segment: len(segment.paths))
+            sources = self._segments[: self.merge_factor]
+            merged = self._rewrite(sources)
+            self._segments = self._segments[self.merge_factor :]
+            if merged.paths:
+                self._segments.append(merged)
+                self._write_segment(merged)
+            removed.extend(sources)
+        self._segments.sort(key=lambda segment: segment.id)
+
+        if removed:
+            # Old segment files go only after the new metadata no longer uses them
+            self._write_meta()
+            for segment in removed:
+                self._delete_segment(segment)
+
+    def _segment_path(self, seg_id: int) -> Path:
+        return self.directory / f"segment_{seg_id:06d}.json"
+
+    def _write_segment(self, segment: _Segment):
+        if self.directory is None:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._write_json(self._segment_path(segment.id), segment.to_json())
+        except Exception as e:
+            print(f"Error writing full-text segment {segment.id}: {e}")
+
+    def _delete_segment(self, segment: _Segment):
+        if self.directory is None:
+            return
+        try:
+            self._segment_path(segment.id).unlink()
+        except OSError:
+            pass
+
+    def _write_meta(self):
+        self._dirty = False
+        if self.directory is None:
+            return
+        # Buffered documents are not on disk yet and are re-indexed on load
+        live = {
+            path: list(entry)
+            for path, entry in self._live.items()
+            if entry[0] != self._buffer.id
+        }
+        meta = {
+            "version": FULLTEXT_VERSION,
+            "next_id": self._next_id,
+            "segments": [segment.id for segment in self._segments],
+            "live": live,
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._write_json(self.directory / "index.json", meta)
+        except Exception as e:
+            print(f"Error saving full-text index: {e}")
+
+    def _write_json(self, path: Path, data: dict):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp_path, path)
+
+    def _load(self):
+        try:
+            with open(self.directory / "index.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != FULLTEXT_VERSION:
+                return
+
+            segments = []
+            for seg_id in meta["segments"]:
+                with open(self._segment_path(seg_id), "r", encoding="utf-8") as f:
+                    segments.append(_Segment.from_json(json.load(f)))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Ignoring unreadable full-text index {self.directory}: {e}")
+            return
+
+        self._segments = segments
+        self._next_id = meta["next_id"]
+        self._buffer = self._new_segment()
+        self._live = {}
+        self._total_length = 0
+        for path, (seg_id, doc, mtime, size) in meta["live"].items():
+            segment = self._segment(seg_id)
+            if segment is None or doc >= len(segment.paths):
+                continue
+            self._live[path] = (seg_id, doc, mtime, size)
+            self._total_length += segment.lengths[doc]
+
+        # Segments written before an interrupted save are not referenced
+        listed = {self._segment_path(segment.id).name for segment in segments}
+        for stale in self.directory.glob("segment_*.json"):
+            if stale.name not in listed:
+                stale.unlink(missing_ok=True)
@@ -0,0 +1,116 @@
+import heapq
+import time
+from typing import Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Scoring constants, loosely following fzf's v1 algorithm
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8
+BONUS_CAMEL = 7
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+PENALTY_LENGTH = 0.05
+
+# Recently modified items get up to RECENCY_WEIGHT extra points, halving
+# every RECENCY_HALF_LIFE seconds
+RECENCY_WEIGHT = 8.0
+RECENCY_HALF_LIFE = 7 * 24 * 3600
+
+_SEPARATORS = set("/\\_-. ")
+
+
+def _char_bonus(text: str, position: int) -> int:
+    """Bonus for matching the character at ``position`` of ``text``"""
+    if position == 0:
+        return BONUS_BOUNDARY
+    previous, current = text[position - 1], text[position]
+    if previous in _SEPARATORS:
+        return BONUS_BOUNDARY
+    if previous.islower() and current.isupper():
+        return BONUS_CAMEL
+    if not previous.isdigit() and current.isdigit():
+        return BONUS_CAMEL
+    return 0
+
+
+def fuzzy_score(query: str, text: str) -> Optional[float]:
+    """Score ``text`` against ``query`` as a case-insensitive subsequence match.
+
+    Returns ``None`` when ``query`` is not a subsequence of ``text``. Like fzf,
+    the first occurrence of the subsequence is found with a forward scan and
+    then tightened with a backward scan, so ``"kf"`` prefers the ``k``/``f``
+    pair closest together. Matches on word boundaries (after ``/_-.``, or a
+    camelCase/digit transition) and consecutive runs score higher; gaps are
+    penalised.
+    """
+    if not query:
+        return 0.0
+
+    query_lower = query.lower()
+    text_lower = text.lower()
+
+    # Forward scan: find where the first full subsequence ends
+    end = -1
+    for char in query_lower:
+        end = text_lower.find(char, end + 1)
+        if end < 0:
+            return None
+
+    # Backward scan: find the latest start that still matches up to ``end``
+    start = end + 1
+    for char in reversed(query_lower):
+        start = text_lower.rfind(char, 0, start)
+
+    score = 0.0
+    q_index = 0
+    in_gap = False
+    run_bonus = 0
+    for t_index in range(start, end + 1):
+        if q_index < len(query_lower) and text_lower[t_index] == query_lower[q_index]:
+            bonus = _char_bonus(text, t_index)
+            if in_gap or q_index == 0:
+                run_bonus = bonus
+            else:
+                # Consecutive matches inherit the bonus of the run's first char
+                bonus = max(bonus, run_bonus, BONUS_CONSECUTIVE)
+            if q_index == 0:
+                bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+            score += SCORE_MATCH + bonus
+            in_gap = False
+            q_index += 1
+        else:
+            score += SCORE_GAP_EXTENSION if in_gap else SCORE_GAP_START
+            in_gap = True
+
+    return score - PENALTY_LENGTH * len(text)
+
+
+def recency_boost(mtime: Optional[float], now: Optional[float] = None) -> float:
+    """Extra score for recently modified items, decaying exponentially with age"""
+    if not mtime:
+        return 0.0
+    age = max(0.0, (now if now is not None else time.time()) - mtime)
+    return RECENCY_WEIGHT * 0.5 ** (age / RECENCY_HALF_LIFE)
+
+
+def top_k(scored: Iterable[Tuple[float, T]], k: int = 10) -> List[T]:
+    """Return the ``k`` best items from ``(score, item)`` pairs, best first.
+
+    Keeps a bounded min-heap of size ``k`` rather than sorting everything;
+    ties keep the order in which items were produced.
+    """
+    if k <= 0:
+        return []
+
+    heap: List[Tuple[float, int, T]] = []
+    for order, (score, item) in enumerate(scored):
+        entry = (score, -order, item)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    return [item for _, _, item in sorted(heap, key=lambda e: e[:2], reverse=True)]
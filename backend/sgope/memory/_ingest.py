@@ -0,0 +1,495 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from sgope.memory._analysis_cache import AnalysisCache
+from sgope.memory._metadata import generate_metadata
+from sgope.memory._summarize import needs_map_reduce, summarize_large
+
+# Bump when the add_knowledge prompts change so cached analyses are not reused
+ANALYSIS_TEMPLATE_VERSION = 1
+
+MAX_FILE_SIZE = 5 * 1024 * 1024
+MAX_TOTAL_SIZE = 20 * 1024 * 1024
+
+# Separates the user's message from the attachment listing the frontend appends
+_ATTACHED_FILES = "\n\nAttached Files:\n"
+
+_FILES_FILENAME_PROMPT = """Generate a short, descriptive filename (without extension) for saving this knowledge. 
+
+Content being saved:
+{content_preview}
+
+User message: {user_input}
+
+Requirements:
+- Maximum 2-3 words
+- Use underscore_case (no spaces, hyphens, or special characters)
+- Be descriptive and specific
+- No file extension needed
+
+Return ONLY the filename, nothing else."""
+
+_TEXT_FILENAME_PROMPT = """Generate a short, descriptive filename (without extension) for this text content:
+
+Content: {content_preview}
+
+Requirements:
+- Maximum 2-3 words  
+- Use underscore_case (no spaces, hyphens, or special characters)
+- Be descriptive and specific
+- No file extension needed
+
+Return ONLY the filename, nothing else."""
+
+_ANALYSIS_PROMPT = """Analyze this {file_ext} file and provide a comprehensive summary:
+
+File: {file_name} ({file_size_kb:.1f}KB)
+{body}
+
+Please provide:
+1. **File Type & Purpose**: What kind of file this is and its likely purpose
+2. **Key Content Summary**: Main topics, functions, or information contained
+3. **Structure Analysis**: How the content is organized (if applicable)
+4. **Notable Elements**: Important functions, classes, configurations, or data points
+5. **Potential Use Cases**: How this file might be referenced or used
+
+Format your response in clean markdown. Be thorough but concise."""
+
+_SUMMARY_PROMPT = """Please create a well-structured summary and expansion of this text content:
+
+Original text:
+{source_text}
+
+Please provide:
+1. A clear, organized summary
+2. Key points or insights extracted
+3. Any relevant context or implications
+
+Format the output in markdown for better readability. Keep it comprehensive but concise."""
+
+
+def _error(message: str) -> dict:
+    return {"action": "add_knowledge", "message": message, "status": "error"}
+
+
+def combine_files(file_analyses: List[dict], original_message: str = "") -> str:
+    """Knowledge entry for the attachments and their analyses"""
+    combined_content = ""
+
+    # Add user context
+    if original_message.strip():
+        combined_content += f"# User Context\n{original_message}\n\n"
+
+    # Add overall summary
+    total_files = len(file_analyses)
+    total_size_mb = sum(fa["size_kb"] for fa in file_analyses) / 1024
+    extensions = set(
+        fa["name"].split(".")[-1] for fa in file_analyses if "." in fa["name"]
+    )
+    combined_content += "# File Collection Summary\n\n"
+    combined_content += f"- **Total Files**: {total_files}\n"
+    combined_content += f"- **Total Size**: {total_size_mb:.2f}MB\n"
+    combined_content += f"- **File Types**: {', '.join(extensions)}\n\n"
+
+    # Add each file's detailed analysis
+    for i, fa in enumerate(file_analyses):
+        combined_content += f"{'=' * 80}\n"
+        combined_content += f"## File {i + 1}: {fa['name']} ({fa['size_kb']:.1f}KB)\n\n"
+        combined_content += f"{fa['analysis']}\n\n"
+        combined_content += f"### Original Content\n```\n{fa['content']}\n```\n\n"
+
+    combined_content += f"{'=' * 80}\n"
+    combined_content += (
+        f"*Knowledge base entry created with {total_files} files analyzed by AI*"
+    )
+    return combined_content
+
+
+class KnowledgeIngest:
+    """One run of the add_knowledge action.
+
+    ``run`` saves the raw input first under a provisional name, so it is on
+    disk and searchable even if the LLM is slow or offline, then analyses
+    it and names it concurrently and swaps the result in (see
+    ``replace_knowledge_file``). LLM results are cached in ``cache`` by
+    content, prompt version and model.
+    """
+
+    def __init__(
+        self,
+        handler,
+        llm,
+        cache: AnalysisCache,
+        user_input: str = "",
+        attachments: Optional[List[dict]] = None,
+        knowledge_filename: Optional[str] = None,
+        progress: Optional[Callable[..., None]] = None,
+    ):
+        self.handler = handler
+        self.llm = llm
+        self.cache = cache
+        self.model = llm.service_config.get_default_model()
+        self.user_input = user_input
+        self.knowledge_filename = knowledge_filename
+        self.progress = progress or (lambda step, **info: None)
+        # Only attachments whose content came along are analysed
+        self.file_attachments = [
+            att
+            for att in attachments or []
+            if att.get("type") == "file" and att.get("content")
+        ]
+        self.original_message = user_input.split(_ATTACHED_FILES)[0]
+        # Filename, summary and tags from the structured metadata call
+        self.metadata: Dict = {}
+        self.timings: Dict = {}
+
+    async def run(self) -> dict:
+        source = self.source_hash()
+        existing = self.handler.find_by_source(source)
+        if existing:
+            return {
+                "action": "add_knowledge",
+                "message": f"Already saved as {existing}",
+                "filename": existing,
+                "status": "success",
+            }
+
+        size_error = self.check_sizes()
+        if size_error:
+            return _error(size_error)
+
+        started = time.perf_counter()
+        raw_content = self.raw_content()
+        provisional_filename = self.user_filename() or f"{self.fallback_filename()}.txt"
+        save_started = time.perf_counter()
+        saved_filename = await self.handler.aadd_knowledge_file(
+            provisional_filename, raw_content, source=source, reuse=False
+        )
+        self.timings["save"] = round(time.perf_counter() - save_started, 3)
+        if not saved_filename:
+            return _error("Failed to save content")
+        self.progress("save", filename=saved_filename, seconds=self.timings["save"])
+
+        # Name the file while the content is being analysed
+        filename_task = asyncio.create_task(self.resolve_filename())
+        try:
+            if self.file_attachments:
+                content_to_save = await self.analyze_files()
+            else:
+                content_to_save = await self.summarize_note()
+            filename = await filename_task
+        except BaseException:
+            filename_task.cancel()
+            await asyncio.gather(filename_task, return_exceptions=True)
+            raise
+
+        # Enrich: swap in the analysed content under the generated name
+        if self.metadata.get("tags") and content_to_save != raw_content:
+            content_to_save += f"\n\n**Tags**: {', '.join(self.metadata['tags'])}"
+        actual_filename = saved_filename
+        if content_to_save != raw_content or filename != provisional_filename:
+            actual_filename = await self.timed(
+                "enrich",
+                self.handler.areplace_knowledge_file(
+                    saved_filename,
+                    content_to_save,
+                    None if filename == provisional_filename else filename,
+                ),
+            )
+        self.timings["total"] = round(time.perf_counter() - started, 3)
+
+        if not actual_filename:
+            return _error("Failed to save content")
+        kind = "Files" if self.file_attachments else "Note"
+        return {
+            "action": "add_knowledge",
+            "message": f"{kind} saved as {actual_filename}",
+            "filename": actual_filename,
+            "status": "success",
+            "summary": self.metadata.get("summary"),
+            "tags": self.metadata.get("tags", []),
+            "timings": self.timings,
+        }
+
+    def source_hash(self) -> str:
+        """Hash of the input, so identical input saved before is reused"""
+        source_hash = hashlib.sha256()
+        if self.file_attachments:
+            for att in self.file_attachments:
+                source_hash.update(att.get("content", "").encode("utf-8"))
+                source_hash.update(b"\0")
+        else:
+            source_hash.update(self.original_message.strip().encode("utf-8"))
+        return source_hash.hexdigest()
+
+    def check_sizes(self) -> Optional[str]:
+        """Error message if an attachment exceeds 5MB or all of them 20MB"""
+        total_size = 0
+        for att in self.file_attachments:
+            file_size = att.get("size", len(att.get("content", "").encode("utf-8")))
+            total_size += file_size
+            if file_size > MAX_FILE_SIZE:
+                return f"File '{att.get('name', 'unknown')}' exceeds 5MB limit"
+        if total_size > MAX_TOTAL_SIZE:
+            return (
+                f"Total files size {total_size / 1024 / 1024:.1f}MB exceeds 20MB limit"
+            )
+        return None
+
+    def raw_content(self) -> str:
+        """What is saved before any LLM call: the input with analyses pending"""
+        if not self.file_attachments:
+            return self.original_message.strip()
+        return combine_files(
+            [
+                {
+                    "name": att.get("name", f"file_{i + 1}"),
+                    "size_kb": len(att.get("content", "").encode("utf-8")) / 1024,
+                    "analysis": "_Analysis pending_",
+                    "content": att.get("content", ""),
+                }
+                for i, att in enumerate(self.file_attachments)
+            ],
+            self.original_message,
+        )
+
+    def fallback_filename(self) -> str:
+        """Name from the first words of the input, used when the LLM gives none"""
+        if self.user_input:
+            words = re.findall(r"\b[a-zA-Z]{3,}\b", self.user_input.lower())
+            return (
+                "_".join(words[:2])
+                if len(words) >= 2
+                else (words[0] if words else "note")
+            )
+        return "knowledge_file"
+
+    def user_filename(self) -> Optional[str]:
+        """The user-provided filename, sanitized, if any"""
+        if not self.knowledge_filename:
+            return None
+        sanitized_name = re.sub(r"[^\w\s.-]", "", self.knowledge_filename).strip()
+        sanitized_name = re.sub(r"\s+", "_", sanitized_name)
+        if "." not in sanitized_name:
+            return f"{sanitized_name}.txt"
+        return sanitized_name
+
+    async def resolve_filename(self) -> str:
+        return await self.timed("filename", self._resolve_filename())
+
+    async def _resolve_filename(self) -> str:
+        if self.knowledge_filename:
+            return self.user_filename()
+
+        try:
+            filename_base = await self.generate_filename()
+        except Exception as e:
+            print(f"Error generating filename with LLM: {e}")
+            filename_base = self.fallback_filename()
+        return f"{filename_base}.txt"
+
+    async def describe(self):
+        """Fill ``metadata`` with one structured-output LLM call (cached)"""
+        if self.file_attachments:
+            preview = "".join(
+                f"File: {att.get('name', 'unknown')}\n{att.get('content', '')[:600]}\n\n"
+                for att in self.file_attachments[:3]
+            )
+            if self.original_message.strip():
+                preview += f"User message: {self.original_message[:300]}"
+        else:
+            preview = self.original_message[:1500] or "text note"
+
+        cached = await self.cache_get("metadata", preview)
+        if cached is not None:
+            self.metadata.update(json.loads(cached))
+            return
+        result = await generate_metadata(preview, self.llm, self.model)
+        if result:
+            self.metadata.update(result)
+            await self.cache_put("metadata", preview, json.dumps(result))
+
+    async def generate_filename(self) -> str:
+        await self.describe()
+        if self.metadata.get("filename"):
+            return self.metadata["filename"]
+
+        # Backends without structured output: ask for just the filename
+        if self.file_attachments:
+            content_preview = "".join(
+                f"File: {att.get('name', 'unknown')}\nPreview: {att.get('content', '')[:200]}...\n\n"
+                for att in self.file_attachments[:2]
+            )
+            filename_prompt = _FILES_FILENAME_PROMPT.format(
+                content_preview=content_preview, user_input=self.user_input
+            )
+        else:
+            filename_prompt = _TEXT_FILENAME_PROMPT.format(
+                content_preview=self.user_input[:300] or "text note"
+            )
+
+        filename_content = await self.cache_get("filename", filename_prompt)
+        if filename_content is None:
+            filename_content = await self.complete(
+                filename_prompt, "filename", filename_prompt
+            )
+
+        filename = re.sub(r"[^a-z0-9_]", "", filename_content.strip().lower())
+        if len(filename) < 2:
+            filename = self.fallback_filename()
+        return filename
+
+    async def analyze_files(self) -> str:
+        """Analyse the attachments concurrently, bounded per LLM backend"""
+        file_timings = [0.0] * len(self.file_attachments)
+
+        async def analyze(i: int, att: dict) -> dict:
+            file_started = time.perf_counter()
+            analysis = await self.analyze_file(i, att)
+            file_timings[i] = round(time.perf_counter() - file_started, 3)
+            self.progress(
+                "file_analysis",
+                name=analysis["name"],
+                index=i + 1,
+                total=len(self.file_attachments),
+                seconds=file_timings[i],
+            )
+            return analysis
+
+        # gather keeps the results in attachment order
+        file_analyses = await self.timed(
+            "analysis",
+            asyncio.gather(
+                *(analyze(i, att) for i, att in enumerate(self.file_attachments))
+            ),
+        )
+        self.timings["files"] = file_timings
+        return combine_files(file_analyses, self.original_message)
+
+    async def analyze_file(self, i: int, att: dict) -> dict:
+        file_name = att.get("name", f"file_{i + 1}")
+        file_content = att.get("content", "")
+        file_size_kb = len(file_content.encode("utf-8")) / 1024
+        file_ext = file_name.split(".")[-1].lower() if "." in file_name else "txt"
+
+        fallback = f"Analysis of {file_name}"
+        # The prompt names the file, so the name (and with it the extension)
+        # is part of the cache key; the size follows from the content
+        cache_content = f"{file_name}\0{file_content}"
+        # Unchanged content was analysed before: no LLM call at all
+        analysis_result = await self.cache_get("file_analysis", cache_content)
+        if analysis_result is None:
+            analysis_result = ""
+            try:
+                if needs_map_reduce(file_content):
+                    # Too large for one prompt: summarize sections, then analyse those
+                    body = await summarize_large(
+                        file_content,
+                        file_name,
+                        self.llm,
+                        cache=self.cache,
+                        model=self.model,
+                    )
+                else:
+                    body = f"Content:\n{file_content}"
+
+                analysis_result = await self.complete(
+                    _ANALYSIS_PROMPT.format(
+                        file_ext=file_ext,
+                        file_name=file_name,
+                        file_size_kb=file_size_kb,
+                        body=body,
+                    ),
+                    "file_analysis",
+                    cache_content,
+                )
+            except Exception as e:
+                print(f"Error analyzing {file_name} with LLM: {e}")
+                fallback = f"File: {file_name}"
+
+        return {
+            "name": file_name,
+            "size_kb": file_size_kb,
+            "analysis": analysis_result.strip() or fallback,
+            "content": file_content,
+        }
+
+    async def summarize_note(self) -> str:
+        """The text input with an LLM summary, or as is if short or on error"""
+        original_text = self.original_message.strip()
+        # Only summarize if text is substantial
+        if len(original_text) <= 100:
+            return original_text
+
+        async def summarize() -> str:
+            summarized_content = await self.cache_get("note_summary", original_text)
+            if summarized_content is None:
+                if needs_map_reduce(original_text):
+                    # Too long for one prompt: summarize it section by section first
+                    source_text = await summarize_large(
+                        original_text,
+                        "note",
+                        self.llm,
+                        cache=self.cache,
+                        model=self.model,
+                    )
+                else:
+                    source_text = original_text
+                summarized_content = await self.complete(
+                    _SUMMARY_PROMPT.format(source_text=source_text),
+                    "note_summary",
+                    original_text,
+                )
+            return summarized_content.strip()
+
+        try:
+            summary = await self.timed("summary", summarize())
+        except Exception as e:
+            print(f"Error summarizing content with LLM: {e}")
+            return original_text
+        if not summary:
+            return original_text
+        return f"# User Input Summary\n\n## Original Text\n{original_text}\n\n## AI Summary & Analysis\n{summary}"
+
+    async def timed(self, step: str, coro):
+        """Await ``coro``, record its duration and report it as progress ``step``"""
+        step_started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.timings[step] = round(time.perf_counter() - step_started, 3)
+            self.progress(step, seconds=self.timings[step])
+
+    async def cache_get(self, kind: str, content: str) -> Optional[str]:
+        result = await asyncio.to_thread(
+            self.cache.get,
+            self.cache.key(kind, ANALYSIS_TEMPLATE_VERSION, self.model, content),
+        )
+        if result is not None:
+            self.timings["cache_hits"] = self.timings.get("cache_hits", 0) + 1
+        return result
+
+    async def cache_put(self, kind: str, content: str, result: str):
+        await asyncio.to_thread(
+            self.cache.put,
+            self.cache.key(kind, ANALYSIS_TEMPLATE_VERSION, self.model, content),
+            kind,
+            result,
+        )
+
+    async def complete(self, prompt: str, kind: str, content: str) -> str:
+        """LLM response to ``prompt``, cached as the ``kind`` result for ``content``"""
+        result = ""
+        async with self.llm.concurrency_limit():
+            async for chunk in self.llm.stream_chat(
+                [{"role": "user", "content": prompt}]
+            ):
+                if chunk.get("type") == "content":
+                    result += chunk.get("content", "")
+        if result.strip():
+            await self.cache_put(kind, content, result)
+        return result
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+JOBS_VERSION = 1
+_FINISHED = ("succeeded", "failed")
+
+# A job body: receives a ``progress(step, **info)`` callback, returns the result dict
+JobRunner = Callable[[Callable[..., None]], Awaitable[dict]]
+
+
+class JobQueue:
+    """Background queue for long-running actions such as add_knowledge.
+
+    ``submit`` records a job and returns immediately; ``workers`` tasks on
+    the event loop run queued jobs in order. A job is a dict with its
+    status (queued, running, succeeded, failed), the progress events it
+    reported and its result. State is written to ``path`` so finished jobs
+    can still be looked up after a restart; changes are coalesced into at
+    most one write per ``save_delay`` seconds, done off the event loop.
+    Jobs that were queued or running when the server stopped are marked
+    failed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        workers: int = 2,
+        history: int = 100,
+        save_delay: float = 0.5,
+    ):
+        self.path = path
+        self.workers = workers
+        self.history = history
+        self.save_delay = save_delay
+        self._jobs: Dict[str, dict] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._save_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._load()
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._interrupt()
+        if self._save_task is not None:
+            # Let the pending write land before the loop goes away
+            await self._save_task
+
+    def submit(self, action: str, run: JobRunner) -> dict:
+        """Queue ``run`` as a job for ``action`` and return the job"""
+        self.start()
+        job = {
+            "id": uuid.uuid4().hex,
+            "action": action,
+            "status": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "events": [],
+            "result": None,
+            "error": None,
+        }
+        self._jobs[job["id"]] = job
+        self._trim()
+        self._record(job, "queued")
+        self._queue.put_nowait((job["id"], run))
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def events(self, job_id: str) -> AsyncIterator[dict]:
+        """Progress events of a job: those so far, then live ones until it completes"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            for event in list(job["events"]):
+                yield event
+            if job["status"] in _FINISHED:
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event["step"] == "complete":
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    async def wait(self, job_id: str) -> Optional[dict]:
+        """Wait for a job to finish and return it"""
+        async for _ in self.events(job_id):
+            pass
+        return self.get(job_id)
+
+    def save(self):
+        """Write job state now, blocking the caller"""
+        self._write(self._dump())
+
+    def _dump(self) -> str:
+        state = {"version": JOBS_VERSION, "jobs": self._jobs}
+        return json.dumps(state, separators=(",", ":"), default=str)
+
+    def _write(self, data: str):
+        """Write serialized state atomically (temp file + rename)"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving job state {self.path}: {e}")
+
+    def _schedule_save(self):
+        """Mark state dirty; one background task writes it after ``save_delay``"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (startup): nothing to block, write directly
+            self.save()
+            return
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self):
+        # Changes recorded while sleeping or writing are picked up by the next round
+        while self._dirty:
+            await asyncio.sleep(self.save_delay)
+            self._dirty = False
+            # Serialized on the loop (the dicts are only mutated there), written in a thread
+            await asyncio.to_thread(self._write, self._dump())
+
+    def __len__(self):
+        return len(self._jobs)
+
+    async def _worker(self):
+        while True:
+            job_id, run = await self._queue.get()
+            try:
+                await self._run(job_id, run)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, run: JobRunner):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job["status"] = "running"
+        job["started"] = time.time()
+        self._record(job, "started")
+
+        def progress(step: str, **info):
+            self._record(job, step, **info)
+
+        try:
+            result = await run(progress)
+            error = result.get("error") or (
+                result.get("message") if result.get("status") == "error" else None
+            )
+        except Exception as e:
+            print(f"Job {job_id} ({job['action']}) failed: {e}")
+            result = {"action": job["action"], "error": str(e), "status": "error"}
+            error = str(e)
+
+        job["result"] = result
+        job["error"] = error
+        job["status"] = "failed" if error else "succeeded"
+        job["finished"] = time.time()
+        self._record(job, "complete", status=job["status"], result=result)
+
+    def _record(self, job: dict, step: str, **info):
+        """Append a progress event, schedule a save, and hand it to live subscribers"""
+        event = {"step": step, "time": time.time(), **info}
+        job["events"].append(event)
+        self._schedule_save()
+        for queue in self._subscribers.get(job["id"], ()):
+            queue.put_nowait(event)
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond ``history``"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job["status"] in _FINISHED),
+            key=lambda job: job["created"],
+        )
+        for job in finished[: max(0, len(finished) - self.history)]:
+            del self._jobs[job["id"]]
+
+    def _interrupt(self):
+        """Fail jobs that can no longer run (their coroutines are gone)"""
+        for job in self._jobs.values():
+            if job["status"] not in _FINISHED:
+                job["status"] = "failed"
+                job["error"] = "Interrupted by server shutdown"
+                job["finished"] = time.time()
+                self._record(job, "complete", status="failed", result=None)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Ignoring unreadable job state {self.path}: {e}")
+            return
+        if state.get("version") != JOBS_VERSION:
+            return
+        self._jobs = state.get("jobs", {})
+        self._interrupt()
+
+
+def default_job_queue() -> JobQueue:
+    """Queue persisted under data/memory, sized by ``JOB_WORKERS`` / ``JOB_HISTORY``"""
+    return JobQueue(
+        Path(__file__).parent.parent.parent / "data" / "memory" / "jobs.json",
+        workers=int(os.getenv("JOB_WORKERS", "2")),
+        history=int(os.getenv("JOB_HISTORY", "100")),
+    )
@@ -1,260 +1,981 @@
+import asyncio
+import os
+import threading
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import aiofiles
+import aiofiles.os
+
+from sgope.memory._blobs import BlobStore
+from sgope.memory._content_cache import ContentCache
+from sgope.memory._fulltext import FullTextIndex, make_snippet, tokenize
+from sgope.memory._fuzzy import fuzzy_score, recency_boost, top_k
+from sgope.memory._manifest import ScanManifest
+from sgope.memory._patching import (
+    PatchConflict,
+    apply_edits,
+    apply_unified_diff,
+    atomic_write_text,
+    content_hash,
+    utf16_edits,
+)
+from sgope.memory._ranged import RangeReader, parse_range_header
+from sgope.memory._scanner import DirectoryScanner
+from sgope.memory._search_index import SearchIndex
+from sgope.memory._store import KnowledgeStore
 from sgope.memory._types import Memory, Suggestion
+from sgope.memory._vectors import VectorIndex
+from sgope.memory._watcher import KnowledgeWatcher
+
+TEXT_EXTENSIONS = {
+    ".txt",
+    ".md",
+    ".py",
+    ".js",
+    ".ts",
+    ".json",
+    ".yaml",
+    ".yml",
+    ".xml",
+    ".html",
+    ".css",
+    ".sql",
+    ".sh",
+    ".bat",
+    ".cfg",
+    ".ini",
+    ".log",
+    ".csv",
+    ".tsv",
+    ".rst",
+    ".tex",
+}
+CONTENT_INDEX_MAX_BYTES = 1_000_000
+READ_MAX_CHARS = 10000
+
+
+def _item_record(item: Memory) -> list:
+    """``[path, type, size, mtime, inode]`` record of a ``Memory``"""
+    return [
+        item.file_path or item.folder_path or item.name,
+        item.type,
+        item.size,
+        item.updated_at.timestamp(),
+        item.metadata.get("inode"),
+    ]
+
+
+class _KnowledgeIndex:
+    """One generation of knowledge items (columnar store) and their search index"""
+
+    def __init__(self):
+        self.store = KnowledgeStore()
+        self.search_index = SearchIndex()
+        self.root_mtime: Optional[float] = None
+
+    def add_record(self, record: list) -> int:
+        """Add a ``[path, type, size, mtime, inode]`` record, replacing any item at path"""
+        path = record[0]
+        existing = self.store.find(path)
+        if existing is not None:
+            self.remove_doc(existing)
+
+        doc_id = self.store.append(*record)
+        self.search_index.add(
+            doc_id, self.store.names[doc_id], self.store.mtimes[doc_id]
+        )
+        return doc_id
+
+    def add(self, item: Memory) -> int:
+        return self.add_record(_item_record(item))
+
+    def replace_doc(self, doc_id: int, item: Memory):
+        """Overwrite the item at ``doc_id`` with ``item``, keeping its position"""
+        record = _item_record(item)
+        existing = self.store.find(record[0])
+        if existing is not None and existing != doc_id:
+            self._delete(existing)
+
+        self.store.update(doc_id, *record)
+        self.search_index.add(
+            doc_id, self.store.names[doc_id], self.store.mtimes[doc_id]
+        )
+        self._maybe_compact()
+
+    def remove_path(self, path: str):
+        """Remove the item at ``path`` and, for folders, everything below it"""
+        doc_id = self.store.find(path)
+        if doc_id is not None:
+            self._delete(doc_id)
+
+        for child in self.store.rows_under(path):
+            self._delete(child)
+        self._maybe_compact()
+
+    def remove_doc(self, doc_id: int):
+        self._delete(doc_id)
+        self._maybe_compact()
+
+    def _delete(self, doc_id: int):
+        self.store.delete(doc_id)
+        self.search_index.remove(doc_id)
+
+    def _maybe_compact(self):
+        """Copy live rows into a new store once deletions left too many tombstones.
+
+        Row ids are renumbered (in the same order), so callers must not hold
+        ids across a removal.
+        """
+        if not self.store.needs_compaction():
+            return
+        store, search_index = KnowledgeStore(), SearchIndex()
+        for row in self.store.rows():
+            doc_id = store.append(*self.store.record(row))
+            search_index.add(doc_id, store.names[doc_id], store.mtimes[doc_id])
+        self.store, self.search_index = store, search_index
+
+    def __len__(self):
+        return len(self.store)
 
 
 class KnowledgeFileHandler:
     """Knowledge files that can be used by the agent"""
 
-    def __init__(self):
-        self.memory: List[Memory] = []
-        self.data_path = (
+    def __init__(
+        self,
+        data_path: Optional[Path] = None,
+        max_depth: Optional[int] = None,
+        manifest_path: Optional[Path] = None,
+        fulltext_path: Optional[Path] = None,
+        vectors_path: Optional[Path] = None,
+        blobs_path: Optional[Path] = None,
+        max_file_size: Optional[int] = None,
+        scan_workers: Optional[int] = None,
+    ):
+        self._state = _KnowledgeIndex()
+        self._lock = threading.RLock()
+        self._patch_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._pending_changes: Optional[List[Path]] = None
+        self._watcher: Optional[KnowledgeWatcher] = None
+        self.data_path = data_path or (
             Path(__file__).parent.parent.parent / "data" / "memory" / "knowledge_files"
         )
-        self._load_from_directory()
+        self.base_path = self.data_path.parent.parent.parent
 
-    def _load_from_directory(self):
+        if max_depth is None:
+            max_depth = int(os.getenv("MEMORY_SCAN_DEPTH", "2"))
+        if max_file_size is None:
+            # 0 disables the cap
+            max_file_size = int(os.getenv("MEMORY_MAX_FILE_SIZE", "0"))
+        if scan_workers is None:
+            scan_workers = int(os.getenv("MEMORY_SCAN_WORKERS", "8"))
+        self.scanner = DirectoryScanner(
+            self.data_path,
+            self.base_path,
+            max_depth=max_depth,
+            max_file_size=max_file_size or None,
+            workers=scan_workers,
+        )
+        self.fulltext = FullTextIndex(
+            fulltext_path or self.data_path.parent / "fulltext"
+        )
+        self.vectors = VectorIndex(vectors_path or self.data_path.parent / "vectors")
+        self.content_cache = ContentCache(
+            int(os.getenv("MEMORY_CONTENT_CACHE_BYTES", str(32 * 1024 * 1024)))
+        )
+        self.range_reader = RangeReader()
+        self.blobs = BlobStore(blobs_path or self.data_path.parent / "blobs")
+        if self.blobs.linked:
+            # Files saved by an older version share their blob's inode
+            self.blobs.unlink_names(self.data_path)
+            self.blobs.save()
+        # Uploaded attachments are kept this long after their last use
+        self.attachment_retention = (
+            float(os.getenv("ATTACHMENT_RETENTION_DAYS", "7")) * 24 * 3600
+        )
+        self._content_indexes = [self.fulltext]
+        if self.vectors.enabled:
+            self._content_indexes.append(self.vectors)
+        self._manifest = ScanManifest(
+            manifest_path or self.data_path.parent / ".knowledge_manifest.json"
+        )
+        # Only names are loaded here so name search is served immediately;
+        # file contents are indexed by sync_content_indexes
+        self._load_from_directory(use_manifest=True, sync_contents=False)
+
+    @property
+    def max_depth(self) -> int:
+        return self.scanner.max_depth
+
+    def _load_from_directory(
+        self,
+        state: Optional[_KnowledgeIndex] = None,
+        use_manifest: bool = False,
+        sync_contents: bool = True,
+    ):
         """Load files from the knowledge_files directory"""
+        if state is None:
+            state = self._state
         try:
             if not self.data_path.exists():
                 print(f"knowledge_files directory not found: {self.data_path}")
                 return
 
-            self._scan_directory(self.data_path)
-            print(f"Loaded {len(self.memory)} items from knowledge_files")
+            self.scanner.reload_ignore()
+            manifest = (
+                self._manifest.load(
+                    self.data_path, self.max_depth, self.scanner.settings
+                )
+                if use_manifest
+                else None
+            )
+            if manifest is not None:
+                changed = self._restore_from_manifest(manifest, state)
+                print(f"Loaded {len(state)} items from knowledge_files (manifest)")
+            else:
+                state.root_mtime = self._dir_mtime(self.data_path)
+                for record in self.scanner.scan():
+                    state.add_record(record)
+                changed = True
+                print(f"Loaded {len(state)} items from knowledge_files")
+
+            if changed:
+                self._save_manifest(state)
+            if sync_contents:
+                self._sync_content_indexes(state)
 
         except Exception as e:
             print(f"Error loading knowledge_files: {e}")
             # No fallback, just leave memory empty
 
-    def _scan_directory(self, path: Path, max_depth: int = 2, current_depth: int = 0):
-        """Recursively scan directory for files"""
-        if current_depth >= max_depth:
-            return
-
+    def _dir_mtime(self, path: Path) -> Optional[float]:
         try:
-            for item in path.iterdir():
-                if item.name.startswith("."):
-                    continue
+            return path.stat().st_mtime
+        except OSError:
+            return None
 
-                if item.is_file():
-                    # Determine file type
-                    file_type = (
-                        "image"
-                        if item.suffix.lower()
-                        in [".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg"]
-                        else "file"
-                    )
+    def _restore_from_manifest(self, manifest: dict, state: _KnowledgeIndex) -> bool:
+        """Rebuild memory from the manifest, re-listing only directories that changed.
 
-                    memory_item = Memory(
-                        type=file_type,
-                        name=item.name,
-                        file_path=str(
-                            item.relative_to(self.data_path.parent.parent.parent)
-                        ),
-                        size=item.stat().st_size if item.exists() else None,
-                        metadata={
-                            "extension": item.suffix,
-                            "parent_dir": str(
-                                item.parent.relative_to(
-                                    self.data_path.parent.parent.parent
-                                )
-                            ),
-                            "is_hidden": item.name.startswith("."),
-                            "absolute_path": str(item),
-                        },
-                    )
-                    self.memory.append(memory_item)
-
-                elif item.is_dir():
-                    memory_item = Memory(
-                        type="folder",
-                        name=item.name,
-                        folder_path=str(
-                            item.relative_to(self.data_path.parent.parent.parent)
-                        ),
-                        metadata={
-                            "parent_dir": str(
-                                item.parent.relative_to(
-                                    self.data_path.parent.parent.parent
-                                )
-                            ),
-                            "is_hidden": item.name.startswith("."),
-                            "absolute_path": str(item),
-                        },
+        Returns True if any directory had to be re-listed.
+        """
+        children: Dict[str, List[list]] = {}
+        for record in manifest["items"]:
+            children.setdefault(os.path.dirname(record[0]), []).append(record)
+
+        return self._restore_directory(
+            self.data_path, 0, state, children, manifest["dirs"]
+        )
+
+    def _restore_directory(
+        self,
+        path: Path,
+        depth: int,
+        state: _KnowledgeIndex,
+        children: Dict[str, List[list]],
+        dirs: Dict[str, float],
+    ) -> bool:
+        if depth >= self.max_depth:
+            return False
+
+        key = str(path.relative_to(self.base_path))
+        mtime = self._dir_mtime(path)
+        if mtime is None:
+            return True
+        if depth == 0:
+            state.root_mtime = mtime
+
+        changed = False
+        if dirs.get(key) == mtime:
+            # Unchanged listing: the same children, but a file edited in place
+            # does not touch its directory, so files are re-stat()ed
+            for record in children.get(key, []):
+                if record[1] != "folder":
+                    try:
+                        stat = os.stat(self.base_path / record[0])
+                    except OSError:
+                        changed = True
+                        continue
+                    if [stat.st_size, stat.st_mtime] != record[2:4]:
+                        record = self.scanner.record(self.base_path / record[0])
+                        changed = True
+                        if record is None:
+                            continue
+                state.add_record(record)
+                if record[1] == "folder":
+                    changed |= self._restore_directory(
+                        self.base_path / record[0], depth + 1, state, children, dirs
                     )
-                    self.memory.append(memory_item)
-                    # Recursively scan subdirectories
-                    self._scan_directory(item, max_depth, current_depth + 1)
+            return changed
+
+        if depth > 0:
+            # Refresh the folder item itself so its new mtime gets recorded
+            record = self.scanner.record(path)
+            if record is not None:
+                state.add_record(record)
+
+        for record, folder in self.scanner.list_directory(str(path)):
+            state.add_record(record)
+            if folder is not None:
+                self._restore_directory(Path(folder), depth + 1, state, children, dirs)
+
+        return True
+
+    def _save_manifest(self, state: Optional[_KnowledgeIndex] = None):
+        if state is None:
+            state = self._state
+        with self._lock:
+            store = state.store
+            records = [store.record(row) for row in store.rows()]
+            dirs = {record[0]: record[3] for record in records if record[1] == "folder"}
+            if state.root_mtime is not None:
+                dirs[str(self.data_path.relative_to(self.base_path))] = state.root_mtime
+        self._manifest.save(
+            self.data_path, self.max_depth, self.scanner.settings, dirs, records
+        )
+
+    def save_manifest(self):
+        """Persist the current scan so the next start can skip unchanged directories"""
+        self._save_manifest()
+
+    def save_indexes(self):
+        """Persist the scan manifest, content indexes and blob index"""
+        self._save_manifest()
+        for index in self._content_indexes:
+            index.save()
+        self.blobs.prune(self.data_path, self.attachment_retention)
+
+    def sync_content_indexes(self):
+        """Bring the full-text and vector indexes in line with the loaded items.
 
-        except PermissionError:
-            pass  # Skip directories we can't access
+        Reads (and embeds) every new or changed file, so the server runs it
+        in the background on startup. Safe to call from a worker thread.
+        """
+        with self._refresh_lock:
+            try:
+                self._sync_content_indexes(self._state)
+            except Exception as e:
+                print(f"Error indexing knowledge file contents: {e}")
 
-    # _load_fallback_data removed: no fallback logic, memory stays empty if no files
+    def _sync_content_indexes(self, state: _KnowledgeIndex):
+        """Bring the content indexes in line with ``state``, reading only changed files"""
+        with self._lock:
+            store = state.store
+            records = [store.record(row) for row in store.rows()]
+        paths = {record[0] for record in records}
+        for index in self._content_indexes:
+            for path in index.paths():
+                if path not in paths:
+                    index.remove(path)
+        self._index_contents(records)
+        for index in self._content_indexes:
+            index.save()
 
-    def add_knowledge_file(self, filename: str, content: str) -> str:
-        """Add a new knowledge file to knowledge_files"""
+    def _index_contents(self, records: List[list]):
+        """Add the text files among ``records`` to the full-text and vector indexes"""
+        for path, item_type, size, mtime, _ in records:
+            if item_type != "file":
+                continue
+            if os.path.splitext(path)[1].lower() not in TEXT_EXTENSIONS:
+                continue
+            if size is None or size > CONTENT_INDEX_MAX_BYTES:
+                for index in self._content_indexes:
+                    index.remove(path)
+                continue
+
+            indexes = [
+                index
+                for index in self._content_indexes
+                if not index.is_current(path, mtime, size)
+            ]
+            if not indexes:
+                continue
+            try:
+                with open(
+                    self.base_path / path, "r", encoding="utf-8", errors="ignore"
+                ) as f:
+                    text = f.read()
+            except OSError:
+                continue
+
+            for index in indexes:
+                try:
+                    index.add(path, text, mtime, size)
+                except Exception as e:
+                    # e.g. the embedding model is unreachable; retried on next change
+                    print(f"Error indexing {path}: {e}")
+
+    def apply_change(self, path: Path):
+        """Re-sync a single created, modified, deleted or moved path with memory"""
+        with self._lock:
+            update = self._apply_metadata(Path(path))
+        # File contents are read outside the lock so searches are not blocked
+        if update is not None:
+            self._apply_contents(*update)
+
+    def _apply_metadata(self, path: Path) -> Optional[Tuple[str, Optional[List[list]]]]:
+        """Update the item records for ``path``; call with the lock held.
+
+        Returns ``(key, changed records)`` (None records for a removal) for
+        ``_apply_contents``, or None if ``path`` is not tracked.
+        """
         try:
-            # Simple duplicate handling
-            file_path = self.data_path / filename
-            counter = 2
+            relative = path.relative_to(self.data_path)
+        except ValueError:
+            return None
+
+        parts = relative.parts
+        if not parts or len(parts) > self.max_depth:
+            return None
+        if any(part.startswith(".") for part in parts):
+            return None
+
+        key = str(path.relative_to(self.base_path))
+        if self._pending_changes is not None:
+            # Replayed onto the new generation once the refresh swaps in
+            self._pending_changes.append(path)
+
+        record = self.scanner.record(path)
+        if record is None:
+            self._state.remove_path(key)
+            self._touch_parent(path)
+            return key, None
 
-            while file_path.exists():
-                name, ext = (
-                    filename.rsplit(".", 1) if "." in filename else (filename, "txt")
+        is_new = self._state.store.find(key) is None
+        self._state.add_record(record)
+        if is_new:
+            self._touch_parent(path)
+        changed = [record]
+        if record[1] == "folder" and is_new:
+            # A directory moved in brings its children without their own events
+            changed = self.scanner.scan(path, depth=len(parts))
+            for child in changed:
+                self._state.add_record(child)
+        return key, changed
+
+    def _apply_contents(self, key: str, changed: Optional[List[list]]):
+        """Bring the content indexes up to date after ``_apply_metadata``"""
+        if changed is None:
+            self.content_cache.invalidate(key)
+            for index in self._content_indexes:
+                index.remove_under(key)
+        else:
+            self._index_contents(changed)
+
+    def _touch_parent(self, path: Path):
+        """Record the new mtime of a directory whose listing just changed"""
+        parent = path.parent
+        if parent == self.data_path:
+            self._state.root_mtime = self._dir_mtime(parent)
+            return
+        record = self.scanner.record(parent)
+        if record is not None:
+            self._state.add_record(record)
+
+    def start_watching(self, poll_interval: float = 2.0):
+        """Apply filesystem changes to memory incrementally in the background"""
+        if self._watcher is None:
+            self._watcher = KnowledgeWatcher(self, poll_interval=poll_interval)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+
+    def add_knowledge_file(
+        self,
+        filename: str,
+        content: str,
+        source: Optional[str] = None,
+        reuse: bool = True,
+    ) -> str:
+        """Add a new knowledge file to knowledge_files.
+
+        Content is stored once in the blob store: if an unmodified knowledge
+        file with identical content exists, its name is returned instead of
+        writing a copy (unless ``reuse`` is False, e.g. for a file that will
+        be replaced later). ``source`` (digest of what the content was
+        generated from) is remembered for ``find_by_source``.
+        """
+        try:
+            digest = self.blobs.put(content.encode("utf-8"))
+            existing = self.blobs.find(digest, self.data_path) if reuse else None
+            if existing is not None:
+                filename = existing
+                print(f"Knowledge file already stored as: {filename}")
+            else:
+                file_path, filename = self.blobs.materialize(
+                    digest, self.data_path, filename
                 )
-                filename = f"{name}_{counter}.{ext}"
-                file_path = self.data_path / filename
-                counter += 1
+                # Add to memory
+                self.apply_change(file_path)
+                print(f"Added knowledge file: {filename}")
+
+            if source is not None:
+                self.blobs.bind_source(source, filename)
+            if existing is None or source is not None:
+                self.blobs.save()
+            return filename
+
+        except Exception as e:
+            print(f"Error adding knowledge file {filename}: {e}")
+            return ""
+
+    async def aadd_knowledge_file(
+        self,
+        filename: str,
+        content: str,
+        source: Optional[str] = None,
+        reuse: bool = True,
+    ) -> str:
+        """Async add_knowledge_file: hashing, file I/O and re-indexing run off the event loop"""
+        return await asyncio.to_thread(
+            self.add_knowledge_file, filename, content, source, reuse
+        )
+
+    def replace_knowledge_file(
+        self, name: str, content: str, filename: Optional[str] = None
+    ) -> str:
+        """Replace a file saved by add_knowledge_file with its final version.
+
+        Used to enrich a file saved under a provisional name: ``content`` is
+        swapped in and the file renamed to ``filename`` (or the next free
+        ``stem_N`` name) without it ever going missing. Returns the final
+        name; if the file was edited or deleted meanwhile it is left alone
+        and ``name`` is returned.
+        """
+        try:
+            if not self.blobs.current(name, self.data_path):
+                print(f"Knowledge file {name} changed since it was saved, keeping it")
+                return name
+            digest = self.blobs.put(content.encode("utf-8"))
+            file_path, new_name = self.blobs.replace(
+                name, digest, self.data_path, filename
+            )
+            self.blobs.save()
+            if new_name != name:
+                self.apply_change(self.data_path / name)
+            self.apply_change(file_path)
+            print(f"Updated knowledge file: {name} -> {new_name}")
+            return new_name
+
+        except Exception as e:
+            print(f"Error updating knowledge file {name}: {e}")
+            return name
 
-            # Ensure directory exists
-            file_path.parent.mkdir(parents=True, exist_ok=True)
+    async def areplace_knowledge_file(
+        self, name: str, content: str, filename: Optional[str] = None
+    ) -> str:
+        return await asyncio.to_thread(
+            self.replace_knowledge_file, name, content, filename
+        )
+
+    def find_by_source(self, source: str) -> Optional[str]:
+        """Name of the unmodified knowledge file generated from ``source``, if any"""
+        return self.blobs.find_source(source, self.data_path)
+
+    def add_attachment(self, data: bytes) -> Dict:
+        """Store an uploaded attachment; returns its ``id`` (SHA-256) and ``size``"""
+        digest = self.blobs.put(data)
+        self.register_attachment(digest)
+        return {"id": digest, "size": len(data)}
+
+    def register_attachment(self, digest: str):
+        """Record a blob written through ``blobs.writer()`` as an attachment"""
+        self.blobs.touch_attachment(digest)
+        self.blobs.save()
+
+    def attachment_info(self, attachment_id: str) -> Optional[Dict]:
+        if not self.blobs.has(attachment_id):
+            return None
+        return {
+            "id": attachment_id,
+            "size": self.blobs.path(attachment_id).stat().st_size,
+        }
 
-            # Write content to file
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(content)
+    async def aread_attachment(self, attachment_id: str) -> Optional[str]:
+        """Text of an uploaded attachment, or None if unknown"""
+        if not self.blobs.has(attachment_id):
+            return None
+        blob_path = self.blobs.path(attachment_id)
+        cache_key = f"blob:{attachment_id}"
+        try:
+            stat = await aiofiles.os.stat(blob_path)
+            content = self.content_cache.get(cache_key, stat)
+            if content is None:
+                async with aiofiles.open(blob_path, "rb") as f:
+                    content = (await f.read()).decode("utf-8", errors="replace")
+                self.content_cache.put(cache_key, stat, content)
+        except FileNotFoundError:
+            return None
+        self.blobs.touch_attachment(attachment_id)
+        return content
+
+    async def aresolve_attachments(
+        self, attachments: Optional[List[Dict]]
+    ) -> List[Dict]:
+        """Fill in ``content`` and ``size`` of attachments given by ``id``.
+
+        Attachments with inline content pass through unchanged; unknown ids
+        keep ``content`` empty and are flagged ``missing``.
+        """
+        resolved = []
+        for att in attachments or []:
+            attachment_id = att.get("id")
+            if attachment_id and not att.get("content"):
+                content = await self.aread_attachment(attachment_id)
+                att = dict(att)
+                if content is None:
+                    att["missing"] = True
+                else:
+                    att["content"] = content
+                    att.setdefault("type", "file")
+                    att.setdefault(
+                        "size", self.blobs.path(attachment_id).stat().st_size
+                    )
+            resolved.append(att)
+        return resolved
 
-            # Add to memory
-            memory_item = Memory(
+    def search(self, query: str, limit: int = 10) -> List[Suggestion]:
+        """Search for files/folders matching the query, best fuzzy matches first"""
+        with self._lock:
+            state = self._state
+            if query:
+                doc_ids = top_k(self._score_candidates(state, query), limit)
+            else:
+                doc_ids = state.search_index.search(query, limit)
+
+            # Only the returned hits are materialized
+            store = state.store
+            hits = [
+                (
+                    store.names[doc_id],
+                    store.item_type(doc_id),
+                    store.path(doc_id),
+                    store.size(doc_id),
+                )
+                for doc_id in doc_ids
+            ]
+
+        suggestions = []
+        for name, item_type, path, size in hits:
+            suggestion = Suggestion(
+                id=f"file_{len(suggestions)}",
+                label=name,
+                description=f"{item_type.title()}: {path}",
                 type="file",
-                name=filename,
-                file_path=str(
-                    file_path.relative_to(self.data_path.parent.parent.parent)
-                ),
-                size=len(content.encode("utf-8")),
                 metadata={
-                    "extension": file_path.suffix,
-                    "parent_dir": str(
-                        file_path.parent.relative_to(
-                            self.data_path.parent.parent.parent
-                        )
-                    ),
-                    "is_hidden": filename.startswith("."),
-                    "absolute_path": str(file_path),
+                    "type": item_type,
+                    "path": path,
+                    "size": size,
                 },
             )
-            self.memory.append(memory_item)
+            suggestions.append(suggestion)
 
-            print(f"Added knowledge file: {filename}")
-            return filename
+        return suggestions
 
-        except Exception as e:
-            print(f"Error adding knowledge file {filename}: {e}")
-            return ""
+    def _score_candidates(self, state: _KnowledgeIndex, query: str):
+        """Yield ``(score, doc_id)`` for indexed candidates matching ``query``"""
+        now = time.time()
+        names = state.store.names
+        mtimes = state.store.mtimes
+        for doc_id in state.search_index.candidates(query):
+            score = fuzzy_score(query, names[doc_id])
+            if score is not None:
+                yield score + recency_boost(mtimes[doc_id], now), doc_id
+
+    def search_content(self, query: str, limit: int = 10) -> List[Suggestion]:
+        """Search inside file contents (BM25).
 
-    def search(self, query: str) -> List[Suggestion]:
-        """Search for files/folders matching the query"""
-        query_lower = query.lower()
+        The description of each suggestion is a snippet around the matches;
+        ``metadata["matches"]`` holds ``[start, end]`` offsets into it and
+        ``metadata["snippet_offset"]`` its position in the file.
+        """
+        terms = set(tokenize(query))
         suggestions = []
+        for path, score in self.fulltext.search(query, limit):
+            with self._lock:
+                store = self._state.store
+                row = store.find(path)
+                if row is None:
+                    continue
+                name, size = store.names[row], store.size(row)
+
+            try:
+                with open(
+                    self.base_path / path, "r", encoding="utf-8", errors="ignore"
+                ) as f:
+                    text = f.read(CONTENT_INDEX_MAX_BYTES)
+            except OSError:
+                continue
+            snippet, offset, matches = make_snippet(text, terms)
 
-        for item in self.memory:
-            if query_lower in item.name.lower():
-                suggestion = Suggestion(
+            suggestions.append(
+                Suggestion(
                     id=f"file_{len(suggestions)}",
-                    label=item.name,
-                    description=f"{item.type.title()}: {item.file_path or item.folder_path}",
+                    label=name,
+                    description=snippet,
                     type="file",
                     metadata={
-                        "type": item.type,
-                        "path": item.file_path or item.folder_path,
-                        "size": item.size,
+                        "type": "file",
+                        "path": path,
+                        "size": size,
+                        "score": round(score, 4),
+                        "snippet_offset": offset,
+                        "matches": matches,
                     },
                 )
-                suggestions.append(suggestion)
+            )
+
+        return suggestions
+
+    def retrieve(
+        self, query: str, k: int = 5, paths: Optional[Iterable[str]] = None
+    ) -> List[Dict]:
+        """Knowledge chunks semantically closest to ``query``, with their text.
 
-        return suggestions[:10]  # Limit to 10 suggestions
+        ``paths`` restricts retrieval to the chunks of those files.
+        """
+        try:
+            hits = self.vectors.search(query, k, paths)
+        except Exception as e:
+            print(f"Error retrieving chunks: {e}")
+            return []
+
+        texts: Dict[str, Optional[str]] = {}
+        chunks = []
+        for path, start, end, score in hits:
+            if path not in texts:
+                try:
+                    with open(
+                        self.base_path / path, "r", encoding="utf-8", errors="ignore"
+                    ) as f:
+                        texts[path] = f.read()
+                except OSError:
+                    texts[path] = None
+            text = texts[path]
+            if text is None:
+                continue
+            chunks.append(
+                {
+                    "path": path,
+                    "name": os.path.basename(path),
+                    "start": start,
+                    "end": end,
+                    "score": round(score, 4),
+                    "text": text[start:end],
+                }
+            )
+        return chunks
+
+    @property
+    def memory(self) -> List[Memory]:
+        """All memory items in insertion order (materialized on every access)"""
+        with self._lock:
+            store = self._state.store
+            return [store.materialize(row, self.base_path) for row in store.rows()]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of items per type"""
+        with self._lock:
+            return self._state.store.counts()
 
     def add(self, item: Memory):
-        self.memory.append(item)
+        """Add an item, replacing any existing item with the same path"""
+        with self._lock:
+            self._state.add(item)
+            path = item.file_path or item.folder_path
+            if path and self._pending_changes is not None:
+                self._pending_changes.append(self.base_path / path)
+
+    def remove_path(self, path: str):
+        """Remove the item at ``path`` and, for folders, everything below it"""
+        with self._lock:
+            self._state.remove_path(path)
 
     def get(self, index: int) -> Memory:
-        return self.memory[index]
+        return self[index]
 
     def find_by_name(self, name: str) -> Optional[Memory]:
         """Find memory item by name"""
-        for item in self.memory:
-            if item.name == name:
-                return item
+        with self._lock:
+            store = self._state.store
+            rows = store.find_name(name)
+            if rows:
+                return store.materialize(rows[0], self.base_path)
+        return None
+
+    def find_by_path(self, path: str) -> Optional[Memory]:
+        """Find memory item by its path relative to the backend root"""
+        if path.startswith("./"):
+            path = path[2:]
+        with self._lock:
+            store = self._state.store
+            row = store.find(os.path.normpath(path))
+            if row is not None:
+                return store.materialize(row, self.base_path)
         return None
 
+    def find_many(self, names: Iterable[str]) -> Dict[str, Optional[Memory]]:
+        """Resolve several names at once, e.g. all ``@`` references of a message"""
+        with self._lock:
+            store = self._state.store
+            found: Dict[str, Optional[Memory]] = {}
+            for name in names:
+                if name in found:
+                    continue
+                rows = store.find_name(name)
+                found[name] = (
+                    store.materialize(rows[0], self.base_path) if rows else None
+                )
+        return found
+
     def read_file_content(self, file_path: str) -> Optional[str]:
         """Read content of a file from memory"""
         try:
-            # Convert relative path to absolute path
-            if file_path.startswith("./"):
-                file_path = file_path[2:]
-
-            full_path = Path(__file__).parent.parent.parent / file_path
+            full_path, cache_key = self._resolve(file_path)
 
-            if not full_path.exists():
+            try:
+                stat = full_path.stat()
+            except FileNotFoundError:
                 return None
 
             # Check if it's a text file (avoid reading binary files)
-            text_extensions = {
-                ".txt",
-                ".md",
-                ".py",
-                ".js",
-                ".ts",
-                ".json",
-                ".yaml",
-                ".yml",
-                ".xml",
-                ".html",
-                ".css",
-                ".sql",
-                ".sh",
-                ".bat",
-                ".cfg",
-                ".ini",
-                ".log",
-                ".csv",
-                ".tsv",
-                ".rst",
-                ".tex",
-            }
-
-            if full_path.suffix.lower() not in text_extensions:
+            if full_path.suffix.lower() not in TEXT_EXTENSIONS:
                 return f"[Binary file: {full_path.name}]"
 
+            content = self.content_cache.get(cache_key, stat)
+            if content is not None:
+                return content
+
+            # Only read as much as is returned
             with open(full_path, "r", encoding="utf-8") as f:
-                content = f.read()
+                content = self._truncate(f.read(READ_MAX_CHARS + 1))
 
-            # Limit content size to avoid overwhelming the context
-            max_size = 10000  # 10KB limit
-            if len(content) > max_size:
-                content = content[:max_size] + "\n[... content truncated ...]"
+            self.content_cache.put(cache_key, stat, content)
+            return content
+        except Exception as e:
+            print(f"Error reading file {file_path}: {e}")
+            return None
+
+    async def aread_file_content(self, file_path: str) -> Optional[str]:
+        """Async read_file_content: file I/O runs off the event loop"""
+        try:
+            full_path, cache_key = self._resolve(file_path)
 
+            try:
+                stat = await aiofiles.os.stat(full_path)
+            except FileNotFoundError:
+                return None
+
+            if full_path.suffix.lower() not in TEXT_EXTENSIONS:
+                return f"[Binary file: {full_path.name}]"
+
+            content = self.content_cache.get(cache_key, stat)
+            if content is not None:
+                return content
+
+            async with aiofiles.open(full_path, "r", encoding="utf-8") as f:
+                content = self._truncate(await f.read(READ_MAX_CHARS + 1))
+
+            self.content_cache.put(cache_key, stat, content)
             return content
         except Exception as e:
             print(f"Error reading file {file_path}: {e}")
             return None
 
+    def read_file_range(
+        self,
+        file_path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        line: Optional[int] = None,
+        lines: int = 100,
+    ) -> Optional[Dict]:
+        """Read part of a knowledge file by byte offset or, if ``line`` is given, by lines.
+
+        Backed by mmap, so large files are never loaded whole. Returns None if
+        the file does not exist.
+        """
+        full_path = self._knowledge_file(file_path)
+        if full_path is None:
+            return None
+        if line is not None:
+            result = self.range_reader.read_lines(full_path, line, lines)
+        else:
+            result = self.range_reader.read_text(full_path, offset, length)
+        result["path"] = file_path
+        return result
+
+    def read_file_bytes(self, file_path: str, range_header: str):
+        """``(data, start, end, size)`` for an HTTP ``Range`` header, or None if missing.
+
+        Raises ValueError if the range cannot be satisfied.
+        """
+        full_path = self._knowledge_file(file_path)
+        if full_path is None:
+            return None
+        start, end = parse_range_header(range_header, full_path.stat().st_size)
+        data, size = self.range_reader.read_bytes(full_path, start, end)
+        return data, start, start + len(data), size
+
+    def _knowledge_file(self, file_path: str) -> Optional[Path]:
+        """Absolute path of a regular file inside knowledge_files, else None"""
+        full_path, _ = self._resolve(file_path)
+        try:
+            full_path = full_path.resolve()
+            full_path.relative_to(self.data_path.resolve())
+        except (OSError, ValueError):
+            return None
+        return full_path if full_path.is_file() else None
+
+    def _resolve(self, file_path: str):
+        """Absolute path and cache key for a path relative to the backend root"""
+        # Convert relative path to absolute path
+        if file_path.startswith("./"):
+            file_path = file_path[2:]
+        return self.base_path / file_path, os.path.normpath(file_path)
+
+    def _truncate(self, content: str) -> str:
+        # Limit content size to avoid overwhelming the context
+        if len(content) > READ_MAX_CHARS:
+            content = content[:READ_MAX_CHARS] + "\n[... content truncated ...]"
+        return content
+
     def write_file_content(self, file_path: str, content: str) -> bool:
         """Write content to a file in memory"""
         try:
-            # Convert relative path to absolute path
-            if file_path.startswith("./"):
-                file_path = file_path[2:]
-
-            full_path = Path(__file__).parent.parent.parent / file_path
+            full_path, _ = self._resolve(file_path)
 
             if not full_path.exists():
                 print(f"File not found for writing: {full_path}")
                 return False
 
-            # Ensure directory exists
-            full_path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_text(full_path, content)
+
+            # Update the memory item's size and mtime
+            self.apply_change(full_path)
 
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            print(f"Successfully wrote content to {file_path}")
+            return True
+        except Exception as e:
+            print(f"Error writing to file {file_path}: {e}")
+            return False
 
-            # Update the memory item's size (optional, but good for consistency)
-            for item in self.memory:
-                if item.file_path == file_path:
-                    item.size = len(content.encode("utf-8"))
-                    break
+    async def awrite_file_content(self, file_path: str, content: str) -> bool:
+        """Async write_file_content: file I/O and re-indexing run off the event loop"""
+        try:
+            full_path, _ = self._resolve(file_path)
+
+            if not await aiofiles.os.path.exists(full_path):
+                print(f"File not found for writing: {full_path}")
+                return False
+
+            await asyncio.to_thread(self._write_text, full_path, content)
+            await asyncio.to_thread(self.apply_change, full_path)
 
             print(f"Successfully wrote content to {file_path}")
             return True
@@ -262,35 +983,116 @@ class KnowledgeFileHandler:
             print(f"Error writing to file {file_path}: {e}")
             return False
 
+    def _write_text(self, full_path: Path, content: str):
+        # Same lock as patches, so a full write cannot land inside a patch's read-modify-write
+        with self._patch_lock:
+            atomic_write_text(full_path, content)
+
+    def patch_file_content(
+        self,
+        file_path: str,
+        edits: Optional[List[Tuple[int, int, str]]] = None,
+        diff: Optional[str] = None,
+        base_hash: Optional[str] = None,
+        utf16: bool = False,
+    ) -> Optional[Dict]:
+        """Apply ``(offset, length, replacement)`` edits or a unified diff to a file.
+
+        Only the changes travel from the client; the new content is written
+        atomically. Edit offsets and lengths are code points, or UTF-16 code
+        units (JavaScript string indices) with ``utf16``. If ``base_hash``
+        (SHA-256 of the content the edits were made against) is given and the
+        file no longer matches, PatchConflict is raised. Raises PatchError for
+        edits or diffs that do not apply and returns None if the file does not
+        exist.
+        """
+        full_path = self._knowledge_file(file_path)
+        if full_path is None:
+            return None
+
+        # Serialise read-modify-write so concurrent patches are not lost
+        with self._patch_lock:
+            with open(full_path, "r", encoding="utf-8", newline="") as f:
+                content = f.read()
+            if base_hash is not None and content_hash(content) != base_hash:
+                raise PatchConflict(f"{file_path} changed since it was read")
+
+            if diff is not None:
+                content = apply_unified_diff(content, diff)
+            else:
+                if utf16:
+                    edits = utf16_edits(content, edits or [])
+                content = apply_edits(content, edits or [])
+            atomic_write_text(full_path, content)
+
+        self.apply_change(full_path)
+        return {
+            "path": file_path,
+            "size": full_path.stat().st_size,
+            "hash": content_hash(content),
+        }
+
+    def _doc_id_at(self, index: int) -> int:
+        return list(self._state.store.rows())[index]
+
     def clear(self):
         """Clear all memory items"""
-        self.memory = []
+        with self._lock:
+            self._state = _KnowledgeIndex()
 
     def refresh(self):
-        """Refresh the directory scan"""
-        self.clear()
-        self._load_from_directory()
+        """Rescan the directory into a new index and swap it in atomically.
+
+        The scan runs without holding the lock, so searches keep being served
+        from the current generation until the new one is complete. Changes
+        applied by the watcher meanwhile are replayed onto the new generation.
+        Safe to call from a worker thread; concurrent refreshes are serialized.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                self._pending_changes = []
+
+            try:
+                state = _KnowledgeIndex()
+                self._load_from_directory(state)
+            finally:
+                with self._lock:
+                    pending, self._pending_changes = self._pending_changes, None
+
+            with self._lock:
+                self._state = state
+                updates = [self._apply_metadata(Path(path)) for path in pending]
+            # Contents (file reads, BM25, embeddings) are indexed outside the lock
+            for update in updates:
+                if update is not None:
+                    self._apply_contents(*update)
 
     def __str__(self):
         return str(self.memory)
 
     def __repr__(self):
-        return f"[KnowledgeFileHandler]: ({len(self.memory)} items)"
+        return f"[KnowledgeFileHandler]: ({len(self._state)} items)"
 
     def __len__(self):
-        return len(self.memory)
+        return len(self._state)
 
     def __getitem__(self, index: int):
-        return self.memory[index]
+        with self._lock:
+            return self._state.store.materialize(self._doc_id_at(index), self.base_path)
 
     def __setitem__(self, index: int, value: Memory):
-        self.memory[index] = value
+        with self._lock:
+            self._state.replace_doc(self._doc_id_at(index), value)
 
     def __delitem__(self, index: int):
-        del self.memory[index]
+        with self._lock:
+            self._state.remove_doc(self._doc_id_at(index))
 
     def __iter__(self):
         return iter(self.memory)
 
     def __contains__(self, item: Memory):
-        return item in self.memory
+        # Materialized items are rebuilt on each access, so compare by path
+        path = item.file_path or item.folder_path or item.name
+        with self._lock:
+            return self._state.store.find(os.path.normpath(path)) is not None
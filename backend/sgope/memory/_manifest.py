@@ -0,0 +1,68 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_VERSION = 2
+
+
+class ScanManifest:
+    """Compact on-disk record of the last knowledge directory scan.
+
+    Stores one ``[path, type, size, mtime, inode]`` record per item plus the
+    mtime of every scanned directory, so a cold start only has to re-list
+    directories whose mtime moved and can rebuild everything else from disk
+    without touching the files themselves.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(
+        self, root: Path, max_depth: int, settings: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Return the saved manifest, or None if missing, stale or unreadable"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable scan manifest {self.path}: {e}")
+            return None
+
+        if (
+            manifest.get("version") != MANIFEST_VERSION
+            or manifest.get("root") != str(root)
+            or manifest.get("max_depth") != max_depth
+            or manifest.get("settings") != settings
+        ):
+            return None
+        return manifest
+
+    def save(
+        self,
+        root: Path,
+        max_depth: int,
+        settings: Dict[str, Any],
+        dirs: Dict[str, float],
+        records: List[list],
+    ):
+        """Write the manifest atomically (temp file + rename)"""
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "root": str(root),
+            "max_depth": max_depth,
+            "settings": settings,
+            "dirs": dirs,
+            "items": records,
+        }
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(manifest, separators=(",", ":")))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving scan manifest {self.path}: {e}")
@@ -0,0 +1,72 @@
+import os
+import re
+from typing import Dict, Optional
+
+# Filename, summary and tags of a knowledge entry, returned by one LLM call
+METADATA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "filename": {"type": "string"},
+        "summary": {"type": "string"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["filename", "summary", "tags"],
+    "additionalProperties": False,
+}
+
+_METADATA_PROMPT = """Describe this content for a knowledge base. Respond with JSON only:
+- "filename": 2-3 descriptive words in snake_case, no extension
+- "summary": one sentence (at most 30 words) on what it is about
+- "tags": 3-5 short lowercase keywords
+
+{preview}"""
+
+
+def metadata_max_tokens() -> int:
+    """Output cap of the metadata call; the JSON is a few dozen tokens"""
+    return int(os.getenv("METADATA_MAX_TOKENS", "200"))
+
+
+def clean_filename(text: str) -> str:
+    """Lowercase snake_case filename stem from LLM output ('' if nothing usable)"""
+    filename = text.strip().lower().replace(" ", "_").replace("-", "_")
+    filename = re.sub(r"[^a-z0-9_]", "", filename)
+    filename = re.sub(r"__+", "_", filename).strip("_")
+    return filename if len(filename) >= 2 else ""
+
+
+async def generate_metadata(
+    preview: str, llm, model: Optional[str] = None
+) -> Optional[Dict]:
+    """Filename, summary and tags for ``preview`` from one structured-output call.
+
+    Returns None when the backend has no structured output or the response
+    has no usable filename, so callers can fall back to a plain prompt.
+    """
+    async with llm.concurrency_limit(model):
+        result = await llm.complete_json(
+            [{"role": "user", "content": _METADATA_PROMPT.format(preview=preview)}],
+            METADATA_SCHEMA,
+            model=model,
+            max_tokens=metadata_max_tokens(),
+        )
+    if not result:
+        return None
+
+    filename = clean_filename(str(result.get("filename", "")))
+    if not filename:
+        return None
+    tags = result.get("tags")
+    tags = [
+        tag
+        for tag in (
+            re.sub(r"[^a-z0-9_ -]", "", str(tag).strip().lower())
+            for tag in (tags if isinstance(tags, list) else [])
+        )
+        if tag
+    ]
+    return {
+        "filename": filename,
+        "summary": str(result.get("summary", "")).strip(),
+        "tags": list(dict.fromkeys(tags))[:5],
+    }
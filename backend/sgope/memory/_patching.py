@@ -0,0 +1,167 @@
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """An edit list or diff that does not apply to the current content"""
+
+
+class PatchConflict(PatchError):
+    """The file changed since the client read it"""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def apply_edits(text: str, edits: Iterable[Tuple[int, int, str]]) -> str:
+    """Apply ``(offset, length, replacement)`` edits to ``text``.
+
+    Offsets are character offsets into the original text; edits must not
+    overlap and are applied as if simultaneously.
+    """
+    parts: List[str] = []
+    position = 0
+    for offset, length, replacement in sorted(edits, key=lambda edit: edit[0]):
+        if offset < position or length < 0 or offset + length > len(text):
+            raise PatchError(f"Edit at {offset} (length {length}) is out of range")
+        parts.append(text[position:offset])
+        parts.append(replacement)
+        position = offset + length
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def utf16_edits(
+    text: str, edits: Iterable[Tuple[int, int, str]]
+) -> List[Tuple[int, int, str]]:
+    """Convert UTF-16 offsets (JavaScript string indices) to ``apply_edits`` ones.
+
+    The two only differ after characters outside the BMP (e.g. emoji), which
+    are two code units in UTF-16 but one code point in Python.
+    """
+    edits = list(edits)
+    if len(text.encode("utf-16-le")) == 2 * len(text):
+        return edits
+    for offset, length, _ in edits:
+        if offset < 0 or length < 0:
+            raise PatchError(f"Edit at {offset} (length {length}) is out of range")
+
+    targets = sorted(
+        {offset for offset, _, _ in edits}
+        | {offset + length for offset, length, _ in edits}
+    )
+    positions = {}
+    units = 0
+    target = 0
+    for index, char in enumerate(text):
+        while target < len(targets) and targets[target] <= units:
+            if targets[target] < units:
+                raise PatchError(f"Offset {targets[target]} splits a surrogate pair")
+            positions[targets[target]] = index
+            target += 1
+        units += 2 if ord(char) > 0xFFFF else 1
+    for offset in targets[target:]:
+        if offset != units:
+            raise PatchError(f"Offset {offset} is out of range")
+        positions[offset] = len(text)
+
+    return [
+        (positions[offset], positions[offset + length] - positions[offset], replacement)
+        for offset, length, replacement in edits
+    ]
+
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """Apply a unified diff (``diff -u`` / ``git diff`` output for one file)"""
+    lines = text.splitlines(keepends=True)
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    diff_lines = diff.splitlines()
+    output: List[str] = []
+    position = 0
+    i = 0
+    hunks = 0
+
+    while i < len(diff_lines):
+        match = _HUNK_RE.match(diff_lines[i])
+        i += 1
+        if not match:
+            continue  # file headers and anything between hunks
+        hunks += 1
+
+        old_start, old_count = int(match.group(1)), int(match.group(2) or 1)
+        new_count = int(match.group(4) or 1)
+        # A hunk without old lines inserts after line old_start
+        start = old_start if old_count == 0 else old_start - 1
+        if start < position or start > len(lines):
+            raise PatchError(f"Hunk at line {old_start} is out of order or range")
+        output.extend(lines[position:start])
+        position = start
+
+        while old_count > 0 or new_count > 0:
+            if i >= len(diff_lines):
+                raise PatchError("Diff ended in the middle of a hunk")
+            line = diff_lines[i]
+            i += 1
+            tag, body = line[:1], line[1:]
+            if tag == "\\":
+                continue  # "\ No newline at end of file" on the old side
+            if tag in (" ", "-", ""):
+                if position >= len(lines) or lines[position].rstrip("\r\n") != body:
+                    raise PatchConflict(
+                        f"Diff does not match the file at line {position + 1}"
+                    )
+                if tag != "-":
+                    output.append(lines[position])
+                    new_count -= 1
+                position += 1
+                old_count -= 1
+            elif tag == "+":
+                output.append(body + newline)
+                new_count -= 1
+            else:
+                raise PatchError(f"Unexpected diff line: {line!r}")
+
+        # Trailing marker applies to the last line of the hunk
+        if i < len(diff_lines) and diff_lines[i].startswith("\\"):
+            if diff_lines[i - 1].startswith("+") and output:
+                output[-1] = output[-1].rstrip("\r\n")
+            i += 1
+
+    if not hunks:
+        raise PatchError("Diff contains no hunks")
+    output.extend(lines[position:])
+    return "".join(output)
+
+
+def atomic_write_text(path: Path, content: str):
+    """Replace ``path`` with ``content`` via a temp file and rename.
+
+    Readers see either the old or the new file, never a partial write. The
+    temp file is hidden (dot-prefixed) so the scanner and watcher skip it.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,186 @@
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RANGE_MAX_BYTES = 1024 * 1024
+RANGE_DEFAULT_BYTES = 64 * 1024
+LINE_STRIDE = 256
+_SCAN_CHUNK = 16 * 1024 * 1024
+
+
+def parse_range_header(header: str, size: int) -> Tuple[int, int]:
+    """``(start, end)`` (end exclusive) for a single ``bytes=`` range.
+
+    Raises ValueError for malformed, multi-part or unsatisfiable ranges.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(f"Unsupported range: {header}")
+
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+    if start >= size or start >= end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+
+class LineIndex:
+    """Byte offset of every ``LINE_STRIDE``-th line start of a file.
+
+    Keeps the index small (a few KB for millions of lines); the offset of
+    any other line is found by scanning forward at most ``LINE_STRIDE - 1``
+    newlines from the nearest checkpoint.
+    """
+
+    def __init__(self, mm: mmap.mmap, size: int):
+        self.checkpoints = array("Q", [0])
+        newlines = 0
+        for chunk_start in range(0, size, _SCAN_CHUNK):
+            positions = self._newlines(mm[chunk_start : chunk_start + _SCAN_CHUNK])
+            # Newline number newlines + i + 1 completes a stride
+            first = LINE_STRIDE - 1 - newlines % LINE_STRIDE
+            for position in positions[first::LINE_STRIDE]:
+                self.checkpoints.append(chunk_start + int(position) + 1)
+            newlines += len(positions)
+
+        ends_with_newline = size > 0 and mm[size - 1 : size] == b"\n"
+        self.total_lines = newlines + (0 if ends_with_newline or size == 0 else 1)
+
+    @staticmethod
+    def _newlines(chunk: bytes):
+        if np is not None:
+            return np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)
+        positions = []
+        position = chunk.find(b"\n")
+        while position != -1:
+            positions.append(position)
+            position = chunk.find(b"\n", position + 1)
+        return positions
+
+    def offset(self, mm: mmap.mmap, line: int, size: int) -> int:
+        """Byte offset where ``line`` (0-based) starts, or ``size`` past the end"""
+        if line >= self.total_lines:
+            return size
+        position = self.checkpoints[line // LINE_STRIDE]
+        for _ in range(line % LINE_STRIDE):
+            position = mm.find(b"\n", position) + 1
+        return position
+
+
+class RangeReader:
+    """Ranged reads of large files through ``mmap``.
+
+    Only the requested pages are touched, so paging through a multi-hundred
+    MB log never loads it into memory. Line indexes are cached per file and
+    rebuilt when its ``(mtime_ns, size, inode)`` changes.
+    """
+
+    def __init__(self, max_indexes: int = 8):
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, Tuple[Tuple[int, int, int], LineIndex]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def read_bytes(self, path: Path, start: int, end: int) -> Tuple[bytes, int]:
+        """Raw bytes ``[start, end)`` (capped at RANGE_MAX_BYTES) and the file size"""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            end = min(end, size, start + RANGE_MAX_BYTES)
+            if size == 0 or start >= end:
+                return b"", size
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[start:end], size
+
+    def read_text(
+        self, path: Path, offset: int = 0, length: Optional[int] = None
+    ) -> Dict:
+        """Decoded text of about ``length`` bytes from ``offset``.
+
+        The range is moved to UTF-8 character boundaries; ``end`` in the
+        result is the offset to continue from.
+        """
+        length = min(length or RANGE_DEFAULT_BYTES, RANGE_MAX_BYTES)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start, end = min(offset, size), min(offset + length, size)
+            if size == 0 or start >= end:
+                return self._result("", start, start, size)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = self._char_boundary(mm, start, size)
+                end = max(start, self._char_boundary(mm, end, size))
+                text = mm[start:end].decode("utf-8", errors="replace")
+        return self._result(text, start, end, size)
+
+    def read_lines(self, path: Path, line: int = 0, count: int = 100) -> Dict:
+        """Lines ``[line, line + count)`` (capped at RANGE_MAX_BYTES)"""
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            if size == 0:
+                result = self._result("", 0, 0, 0)
+                result.update(line=0, lines=0, total_lines=0)
+                return result
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index = self._line_index(str(path), mm, stat)
+                start = index.offset(mm, line, size)
+                end = index.offset(mm, line + count, size)
+                lines = max(0, min(count, index.total_lines - line))
+                if end - start > RANGE_MAX_BYTES:
+                    # Too long: stop at the last full line that fits
+                    cut = mm.rfind(b"\n", start, start + RANGE_MAX_BYTES)
+                    end = cut + 1 if cut != -1 else start + RANGE_MAX_BYTES
+                    lines = mm[start:end].count(b"\n")
+                text = mm[start:end].decode("utf-8", errors="replace")
+
+        result = self._result(text, start, end, size)
+        result.update(line=line, lines=lines, total_lines=index.total_lines)
+        return result
+
+    def _line_index(self, key: str, mm: mmap.mmap, stat: os.stat_result) -> LineIndex:
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == version:
+                self._indexes.move_to_end(key)
+                return cached[1]
+
+        index = LineIndex(mm, stat.st_size)
+        with self._lock:
+            self._indexes[key] = (version, index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    @staticmethod
+    def _char_boundary(mm: mmap.mmap, position: int, size: int) -> int:
+        """Move ``position`` back to the start of a UTF-8 character"""
+        floor = max(0, position - 3)
+        while position > floor and position < size and mm[position] & 0xC0 == 0x80:
+            position -= 1
+        return position
+
+    @staticmethod
+    def _result(text: str, start: int, end: int, size: int) -> Dict:
+        return {
+            "content": text,
+            "start": start,
+            "end": end,
+            "size": size,
+            "eof": end >= size,
+        }
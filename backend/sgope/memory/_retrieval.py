@@ -0,0 +1,145 @@
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Tokens of retrieved context per model family (longest matching prefix wins)
+MODEL_CONTEXT_BUDGETS = {
+    "gpt-4.1": 8000,
+    "gpt-4o": 6000,
+    "gpt-4": 4000,
+    "gpt-3.5": 2000,
+    "o1": 6000,
+    "o3": 6000,
+    "o4": 6000,
+    "claude": 8000,
+    "gemini": 8000,
+    "llama3": 2000,
+    "qwen": 4000,
+    "deepseek": 4000,
+    "mistral": 2000,
+    "gemma": 2000,
+    "phi": 1500,
+}
+DEFAULT_CONTEXT_BUDGET = 2000
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def context_budget(model: Optional[str]) -> int:
+    """Token budget for retrieved context; ``RAG_TOKEN_BUDGET`` overrides the table"""
+    override = os.getenv("RAG_TOKEN_BUDGET")
+    if override:
+        return int(override)
+
+    name = (model or "").lower()
+    best = None
+    for prefix in MODEL_CONTEXT_BUDGETS:
+        if name.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return MODEL_CONTEXT_BUDGETS[best] if best else DEFAULT_CONTEXT_BUDGET
+
+
+def assemble_context(
+    handler,
+    query: str,
+    budget: int,
+    pinned_paths: Optional[Iterable[str]] = None,
+    k: int = 20,
+    min_score: Optional[float] = None,
+) -> Tuple[str, List[Dict]]:
+    """Pick the most relevant knowledge chunks for ``query`` within ``budget`` tokens.
+
+    Chunks of ``pinned_paths`` (files the user referenced) are considered
+    before the rest of the knowledge base, which only contributes chunks
+    scoring at least ``min_score`` (``RAG_MIN_SCORE``). Overlapping or adjacent chunks of
+    the same file are merged so shared text is only paid for once, and
+    identical text from different files is included once.
+
+    Returns the context block to append to the prompt and the sources used.
+    """
+    if min_score is None:
+        min_score = float(os.getenv("RAG_MIN_SCORE", "0.1"))
+    pinned = list(pinned_paths or [])
+    candidates = handler.retrieve(query, k, paths=pinned) if pinned else []
+    candidates += [
+        chunk for chunk in handler.retrieve(query, k) if chunk["score"] >= min_score
+    ]
+
+    # path -> merged [start, end, text, score] spans
+    spans: Dict[str, List[list]] = {}
+    seen_texts = set()
+    used = 0
+    for chunk in candidates:
+        text = chunk["text"]
+        if text in seen_texts:
+            continue
+
+        merged = _merge_span(spans.get(chunk["path"], []), chunk)
+        cost = sum(estimate_tokens(span[2]) for span in merged) - sum(
+            estimate_tokens(span[2]) for span in spans.get(chunk["path"], [])
+        )
+        if used + cost > budget:
+            continue
+
+        spans[chunk["path"]] = merged
+        seen_texts.add(text)
+        used += cost
+
+    if not spans:
+        return "", []
+
+    sources = []
+    sections = []
+    for path, file_spans in spans.items():
+        name = os.path.basename(path)
+        for start, end, text, score in file_spans:
+            sources.append(
+                {
+                    "path": path,
+                    "name": name,
+                    "start": start,
+                    "end": end,
+                    "score": score,
+                    "tokens": estimate_tokens(text),
+                }
+            )
+            sections.append(
+                f"[{len(sections) + 1}] {name} (chars {start}-{end})\n"
+                f"{'-' * 40}\n{text.strip()}\n{'-' * 40}"
+            )
+
+    context = (
+        f"\n\nRelevant Knowledge:\n{'=' * 50}\n"
+        + "\n\n".join(sections)
+        + f"\n{'=' * 50}"
+    )
+    return context, sources
+
+
+def _merge_span(spans: List[list], chunk: Dict) -> List[list]:
+    """``spans`` (sorted, disjoint) with ``chunk`` merged in"""
+    start, end, text, score = (
+        chunk["start"],
+        chunk["end"],
+        chunk["text"],
+        chunk["score"],
+    )
+    merged = []
+    for span in spans:
+        if span[1] < start or end < span[0]:
+            merged.append(span)
+            continue
+        # Overlapping or touching: stitch the texts together by offset
+        if span[0] < start:
+            text = span[2][: start - span[0]] + text
+            start = span[0]
+        if span[1] > end:
+            text = text + span[2][end - span[0] :]
+            end = span[1]
+        score = max(score, span[3])
+    merged.append([start, end, text, score])
+    merged.sort(key=lambda span: span[0])
+    return merged
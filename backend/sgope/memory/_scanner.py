@@ -0,0 +1,204 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from pathlib import Path
+from stat import S_ISDIR
+from typing import Any, Dict, List, Optional, Tuple
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg"}
+IGNORE_FILENAME = ".sgopeignore"
+
+
+class IgnoreRules:
+    """Glob patterns read from a ``.sgopeignore`` file.
+
+    One pattern per line, ``#`` starts a comment. Patterns without a slash
+    match an entry's name at any depth (``*.log``, ``node_modules``); patterns
+    containing a slash match the path relative to the scanned root
+    (``archive/2023/*``). A trailing slash restricts a pattern to directories.
+    """
+
+    def __init__(self, patterns: Optional[List[str]] = None):
+        self.patterns: List[str] = []
+        self._name_patterns: List[Tuple[str, bool]] = []
+        self._path_patterns: List[Tuple[str, bool]] = []
+        for pattern in patterns or []:
+            self.add(pattern)
+
+    @classmethod
+    def load(cls, root: Path) -> "IgnoreRules":
+        """Read ``root/.sgopeignore`` if present"""
+        try:
+            with open(root / IGNORE_FILENAME, "r", encoding="utf-8") as f:
+                return cls(f.read().splitlines())
+        except FileNotFoundError:
+            return cls()
+        except Exception as e:
+            print(f"Error reading {root / IGNORE_FILENAME}: {e}")
+            return cls()
+
+    def add(self, pattern: str):
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith("#"):
+            return
+        self.patterns.append(pattern)
+
+        dir_only = pattern.endswith("/")
+        pattern = pattern.strip("/")
+        if "/" in pattern:
+            self._path_patterns.append((pattern, dir_only))
+        else:
+            self._name_patterns.append((pattern, dir_only))
+
+    def match(self, relative_path: str, name: str, is_dir: bool) -> bool:
+        for pattern, dir_only in self._name_patterns:
+            if (is_dir or not dir_only) and fnmatchcase(name, pattern):
+                return True
+        if self._path_patterns:
+            relative_path = relative_path.replace(os.sep, "/")
+            for pattern, dir_only in self._path_patterns:
+                if (is_dir or not dir_only) and fnmatchcase(relative_path, pattern):
+                    return True
+        return False
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+
+class DirectoryScanner:
+    """Walk the knowledge directory into ``[path, type, size, mtime, inode]`` records.
+
+    Built on ``os.scandir`` so each entry costs at most one ``stat()`` (and
+    none for the directory check), and each level of subdirectories is
+    listed concurrently on a thread pool, since listing is I/O bound and
+    releases the GIL. Hidden entries, ``.sgopeignore`` matches and files
+    above ``max_file_size`` are skipped. Paths in records are relative to
+    ``base_path``.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        base_path: Path,
+        max_depth: int = 2,
+        max_file_size: Optional[int] = None,
+        workers: int = 8,
+    ):
+        self.root = root
+        self.base_path = base_path
+        self.max_depth = max_depth
+        self.max_file_size = max_file_size
+        self.workers = max(1, workers)
+        self.ignore = IgnoreRules()
+        self._root_prefix = str(root) + os.sep
+        self._base_prefix = str(base_path) + os.sep
+
+    def reload_ignore(self):
+        """Re-read ``.sgopeignore`` from the root"""
+        self.ignore = IgnoreRules.load(self.root)
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        """Options that change the scan result, for invalidating saved scans"""
+        return {
+            "max_file_size": self.max_file_size,
+            "ignore": self.ignore.patterns,
+        }
+
+    def scan(self, path: Optional[Path] = None, depth: int = 0) -> List[list]:
+        """Records for everything below ``path`` (at ``depth``) down to max_depth"""
+        level = [str(path or self.root)]
+        records: List[list] = []
+        pool: Optional[ThreadPoolExecutor] = None
+
+        try:
+            while level and depth < self.max_depth:
+                if len(level) == 1 or self.workers == 1:
+                    listings = [self.list_directory(directory) for directory in level]
+                else:
+                    if pool is None:
+                        pool = ThreadPoolExecutor(max_workers=self.workers)
+                    listings = pool.map(self.list_directory, level)
+
+                next_level: List[str] = []
+                for listing in listings:
+                    for record, absolute in listing:
+                        records.append(record)
+                        if absolute is not None:
+                            next_level.append(absolute)
+                level = next_level
+                depth += 1
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        return records
+
+    def list_directory(self, directory: str) -> List[Tuple[list, Optional[str]]]:
+        """One level of ``directory`` as ``(record, absolute path if folder)`` pairs"""
+        results: List[Tuple[list, Optional[str]]] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    record = self._entry_record(entry)
+                    if record is not None:
+                        folder = entry.path if record[1] == "folder" else None
+                        results.append((record, folder))
+        except OSError:
+            pass  # Skip directories we can't access
+        return results
+
+    def record(self, path: Path) -> Optional[list]:
+        """Record for a single path, or None if it is missing or excluded"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if self.ignore and self._ancestor_ignored(str(path)):
+            return None
+        return self._make_record(str(path), path.name, stat, S_ISDIR(stat.st_mode))
+
+    def _ancestor_ignored(self, absolute: str) -> bool:
+        """Whether a directory between the root and ``absolute`` is ignored"""
+        relative = _relative(absolute, self._root_prefix)
+        parent = os.path.dirname(relative)
+        while parent:
+            if self.ignore.match(parent, os.path.basename(parent), True):
+                return True
+            parent = os.path.dirname(parent)
+        return False
+
+    def _entry_record(self, entry: os.DirEntry) -> Optional[list]:
+        if entry.name.startswith("."):
+            return None
+        try:
+            is_dir = entry.is_dir()
+            stat = entry.stat()
+        except OSError:
+            return None
+        return self._make_record(entry.path, entry.name, stat, is_dir)
+
+    def _make_record(
+        self, absolute: str, name: str, stat: os.stat_result, is_dir: bool
+    ) -> Optional[list]:
+        if self.ignore and self.ignore.match(
+            _relative(absolute, self._root_prefix), name, is_dir
+        ):
+            return None
+
+        path = _relative(absolute, self._base_prefix)
+        if is_dir:
+            return [path, "folder", None, stat.st_mtime, stat.st_ino]
+
+        if self.max_file_size is not None and stat.st_size > self.max_file_size:
+            return None
+
+        extension = os.path.splitext(name)[1].lower()
+        file_type = "image" if extension in IMAGE_EXTENSIONS else "file"
+        return [path, file_type, stat.st_size, stat.st_mtime, stat.st_ino]
+
+
+def _relative(absolute: str, prefix: str) -> str:
+    if absolute.startswith(prefix):
+        return absolute[len(prefix) :]
+    return os.path.relpath(absolute, prefix)
@@ -0,0 +1,262 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Set
+
+
+class _SortedTable:
+    """``(key, id)`` pairs kept in key order for binary search.
+
+    Additions wait in a pending map until the next lookup: a few are
+    inserted in place with ``bisect``, a bulk load is merged with one sort.
+    """
+
+    def __init__(self):
+        self.keys: List = []
+        self.ids: List[int] = []
+        self._pending: Dict[int, object] = {}
+
+    def add(self, doc_id: int, key):
+        self._pending[doc_id] = key
+
+    def remove(self, doc_id: int, key):
+        if self._pending.pop(doc_id, None) is not None:
+            return
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == doc_id:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def ensure_sorted(self):
+        pending = self._pending
+        if not pending:
+            return
+        if len(pending) <= max(64, len(self.keys) // 16):
+            # A few changes: insert each in place instead of re-sorting
+            for doc_id, key in pending.items():
+                position = bisect_right(self.keys, key)
+                self.keys.insert(position, key)
+                self.ids.insert(position, doc_id)
+        else:
+            pairs = sorted(
+                [*zip(self.keys, self.ids)]
+                + [(key, doc_id) for doc_id, key in pending.items()]
+            )
+            self.keys = [key for key, _ in pairs]
+            self.ids = [doc_id for _, doc_id in pairs]
+        self._pending = {}
+
+
+class SearchIndex:
+    """Name index for knowledge items: a sorted prefix table plus n-gram postings.
+
+    The prefix table is a flattened trie (lowercased names kept in sorted
+    order) so prefix lookups are a binary search followed by a short scan.
+    Substring lookups use postings of 1-, 2- and 3-grams; each posting list
+    is an ``array`` of document ids in insertion order, so a walk can stop
+    as soon as ``limit`` hits are found. A second table keeps ids newest first for recency-ordered lookups.
+    Removed ids are skipped lazily and compacted once they pile up.
+    """
+
+    GRAM_SIZE = 3
+    # Per-tier bounds on the ids handed to fuzzy ranking
+    CANDIDATE_LIMIT = 256
+    RECENT_LIMIT = 64
+    RECENT_SCAN = 2048
+
+    def __init__(self):
+        self._names: Dict[int, str] = {}
+        self._mtimes: Dict[int, float] = {}
+        self._by_name = _SortedTable()
+        self._by_recency = _SortedTable()
+        self._postings: Dict[str, array] = {}
+        self._dead = 0
+
+    def add(self, doc_id: int, name: str, mtime: float = 0.0):
+        """Index ``name`` under ``doc_id``.
+
+        New ids must be added in ascending order. Re-adding an existing id
+        only appends the grams its new name gains; entries for grams it lost
+        go stale and are skipped until the next compaction.
+        """
+        old_key = self._unindex(doc_id)
+
+        key = name.lower()
+        self._names[doc_id] = key
+        self._mtimes[doc_id] = mtime
+
+        # Placed into the sorted tables on the next lookup
+        self._by_name.add(doc_id, key)
+        self._by_recency.add(doc_id, -mtime)
+
+        grams = self._grams(key)
+        indexed = self._grams(old_key) if old_key is not None else set()
+        for gram in grams - indexed:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("I")
+            posting.append(doc_id)
+
+        if indexed - grams:
+            self._dead += 1
+            self._maybe_compact()
+
+    def remove(self, doc_id: int):
+        """Drop ``doc_id`` from the index"""
+        if self._unindex(doc_id) is not None:
+            # Postings are cleaned up lazily
+            self._dead += 1
+            self._maybe_compact()
+
+    def _unindex(self, doc_id: int) -> Optional[str]:
+        """Drop ``doc_id`` from the sorted tables and return its old name key"""
+        key = self._names.pop(doc_id, None)
+        if key is not None:
+            self._by_name.remove(doc_id, key)
+            self._by_recency.remove(doc_id, -self._mtimes.pop(doc_id))
+        return key
+
+    def _maybe_compact(self):
+        # Rebuild the postings once most entries are stale
+        if self._dead > 1024 and self._dead > len(self._names):
+            self._compact()
+
+    def prefix(self, query: str, limit: int = 10) -> Iterator[int]:
+        """Yield ids whose name starts with ``query`` in name order"""
+        key = query.lower()
+        table = self._by_name
+        table.ensure_sorted()
+        position = bisect_left(table.keys, key)
+        found = 0
+        while position < len(table.keys) and found < limit:
+            if not table.keys[position].startswith(key):
+                break
+            yield table.ids[position]
+            found += 1
+            position += 1
+
+    def substring(self, query: str, limit: int = 10) -> Iterator[int]:
+        """Yield ids whose name contains ``query`` in insertion order"""
+        key = query.lower()
+        if not key:
+            for found, doc_id in enumerate(self._names):
+                if found >= limit:
+                    return
+                yield doc_id
+            return
+
+        grams = (
+            [key]
+            if len(key) <= self.GRAM_SIZE
+            else {
+                key[i : i + self.GRAM_SIZE]
+                for i in range(len(key) - self.GRAM_SIZE + 1)
+            }
+        )
+        postings = [self._postings.get(gram) for gram in grams]
+        if any(posting is None for posting in postings):
+            return
+
+        # Walk the shortest posting list and verify each candidate directly;
+        # a renamed id can appear in a posting more than once
+        shortest = min(postings, key=len)
+        found: Set[int] = set()
+        for doc_id in shortest:
+            name = self._names.get(doc_id)
+            if name is None or key not in name or doc_id in found:
+                continue
+            yield doc_id
+            found.add(doc_id)
+            if len(found) >= limit:
+                return
+
+    def recent(self, query: str, limit: int = 10) -> Iterator[int]:
+        """Yield ids whose name contains ``query`` as a subsequence, newest first.
+
+        Only the ``RECENT_SCAN`` newest names are looked at, so abbreviations
+        like "mtng" find recently touched items without a full scan.
+        """
+        key = query.lower()
+        table = self._by_recency
+        table.ensure_sorted()
+
+        # Let the regex engine do the subsequence test: "abc" -> "a.*?b.*?c"
+        pattern = re.compile(".*?".join(re.escape(char) for char in key), re.DOTALL)
+        names = self._names
+        found = 0
+        for doc_id in table.ids[: self.RECENT_SCAN]:
+            if found >= limit:
+                return
+            if pattern.search(names[doc_id]):
+                yield doc_id
+                found += 1
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """Return up to ``limit`` ids: prefix matches first, then other substring hits"""
+        results: List[int] = list(self.prefix(query, limit))
+        if len(results) < limit:
+            seen: Set[int] = set(results)
+            for doc_id in self.substring(query, limit + len(seen)):
+                if doc_id not in seen:
+                    results.append(doc_id)
+                    if len(results) >= limit:
+                        break
+        return results
+
+    def candidates(self, query: str) -> Iterator[int]:
+        """Yield a bounded set of ids worth fuzzy-scoring for ``query``.
+
+        Tiers come best first: up to ``CANDIDATE_LIMIT`` prefix hits, then as
+        many substring hits, then up to ``RECENT_LIMIT`` recent names that
+        contain ``query`` as a subsequence. Every tier stops early, so the
+        cost is independent of how many names match.
+        """
+        key = query.lower()
+        seen: Set[int] = set()
+
+        for tier in (
+            self.prefix(key, self.CANDIDATE_LIMIT),
+            self.substring(key, self.CANDIDATE_LIMIT),
+            self.recent(key, self.RECENT_LIMIT),
+        ):
+            for doc_id in tier:
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                yield doc_id
+
+    def clear(self):
+        self._names = {}
+        self._mtimes = {}
+        self._by_name = _SortedTable()
+        self._by_recency = _SortedTable()
+        self._postings = {}
+        self._dead = 0
+
+    def _grams(self, key: str) -> Set[str]:
+        length = len(key)
+        return {
+            key[i : i + size]
+            for size in range(1, self.GRAM_SIZE + 1)
+            for i in range(length - size + 1)
+        }
+
+    def _compact(self):
+        self._postings = {}
+        for doc_id in sorted(self._names):
+            key = self._names[doc_id]
+            for gram in self._grams(key):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    posting = self._postings[gram] = array("I")
+                posting.append(doc_id)
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, doc_id: int):
+        return doc_id in self._names
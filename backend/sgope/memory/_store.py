@@ -0,0 +1,233 @@
+import os
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from sgope.memory._types import Memory
+
+ITEM_TYPES = ("file", "image", "folder", "text", "url")
+_TYPE_CODES = {item_type: code for code, item_type in enumerate(ITEM_TYPES)}
+
+# Rebuild once this many rows are tombstones and they make up this share of rows
+COMPACT_MIN_TOMBSTONES = 1024
+COMPACT_RATIO = 0.5
+
+
+class KnowledgeStore:
+    """Columnar storage for knowledge items.
+
+    Each item is a row spread over parallel arrays (name, parent directory,
+    type, size, mtime, inode) instead of a pydantic ``Memory`` with its own
+    dicts and datetimes. Parent directories are interned once and shared by
+    all their children, and full ``Memory`` objects are only built by
+    ``materialize`` for the rows a caller actually returns.
+
+    Row ids are never reused: deleting a row leaves a tombstone, which keeps
+    ids ascending for the search index. Once tombstones pile up
+    (``needs_compaction``) the owner copies the live rows into a new store.
+    """
+
+    def __init__(self):
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._children: Dict[int, Dict[str, int]] = {}
+        # name -> row, or a list of rows when several directories share a name
+        self._by_name: Dict[str, Union[int, List[int]]] = {}
+        self.names: List[Optional[str]] = []
+        self.parents = array("I")
+        self.kinds = bytearray()
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        self.inodes = array("Q")
+        self._live = 0
+
+    def append(
+        self,
+        path: str,
+        item_type: str,
+        size: Optional[int],
+        mtime: float,
+        inode: Optional[int] = None,
+    ) -> int:
+        """Add a row for ``path`` (relative to the backend root) and return its id"""
+        parent, name = os.path.split(path)
+        dir_id = self._intern_dir(parent)
+
+        row = len(self.names)
+        self.names.append(name)
+        self.parents.append(dir_id)
+        self.kinds.append(_TYPE_CODES[item_type])
+        self.sizes.append(-1 if size is None else size)
+        self.mtimes.append(mtime)
+        self.inodes.append(inode or 0)
+        self._link(row)
+        self._live += 1
+        return row
+
+    def update(
+        self,
+        row: int,
+        path: str,
+        item_type: str,
+        size: Optional[int],
+        mtime: float,
+        inode: Optional[int] = None,
+    ):
+        """Overwrite live row ``row`` in place, keeping its id and position"""
+        parent, name = os.path.split(path)
+        self._unlink(row)
+        self.names[row] = name
+        self.parents[row] = self._intern_dir(parent)
+        self.kinds[row] = _TYPE_CODES[item_type]
+        self.sizes[row] = -1 if size is None else size
+        self.mtimes[row] = mtime
+        self.inodes[row] = inode or 0
+        self._link(row)
+
+    def delete(self, row: int):
+        if self.names[row] is None:
+            return
+        self._unlink(row)
+        self.names[row] = None
+        self._live -= 1
+
+    @property
+    def tombstones(self) -> int:
+        return len(self.names) - self._live
+
+    def needs_compaction(self) -> bool:
+        tombstones = self.tombstones
+        return (
+            tombstones >= COMPACT_MIN_TOMBSTONES
+            and tombstones >= COMPACT_RATIO * len(self.names)
+        )
+
+    def _link(self, row: int):
+        """Register a row in the by-directory and by-name lookups"""
+        name = self.names[row]
+        self._children.setdefault(self.parents[row], {})[name] = row
+        rows = self._by_name.get(name)
+        if rows is None:
+            self._by_name[name] = row
+        elif isinstance(rows, list):
+            rows.append(row)
+            rows.sort()
+        else:
+            self._by_name[name] = sorted([rows, row])
+
+    def _unlink(self, row: int):
+        name = self.names[row]
+        children = self._children.get(self.parents[row])
+        if children is not None and children.get(name) == row:
+            del children[name]
+        rows = self._by_name.get(name)
+        if isinstance(rows, list):
+            rows.remove(row)
+            if len(rows) == 1:
+                self._by_name[name] = rows[0]
+        elif rows == row:
+            del self._by_name[name]
+
+    def find(self, path: str) -> Optional[int]:
+        """Row id of the live item at ``path``, if any"""
+        parent, name = os.path.split(path)
+        dir_id = self._dir_ids.get(parent)
+        if dir_id is None:
+            return None
+        return self._children.get(dir_id, {}).get(name)
+
+    def find_name(self, name: str) -> List[int]:
+        """Row ids of live items called ``name``, oldest first"""
+        rows = self._by_name.get(name)
+        if rows is None:
+            return []
+        return list(rows) if isinstance(rows, list) else [rows]
+
+    def rows_under(self, path: str) -> List[int]:
+        """Row ids of every live item strictly below directory ``path``"""
+        prefix = path.rstrip("/\\") + os.sep
+        rows: List[int] = []
+        for dir_id, directory in enumerate(self._dirs):
+            if directory == path or directory.startswith(prefix):
+                rows.extend(self._children.get(dir_id, {}).values())
+        return rows
+
+    def rows(self) -> Iterator[int]:
+        """Live row ids in insertion order"""
+        for row, name in enumerate(self.names):
+            if name is not None:
+                yield row
+
+    def is_live(self, row: int) -> bool:
+        return 0 <= row < len(self.names) and self.names[row] is not None
+
+    def path(self, row: int) -> str:
+        return os.path.join(self._dirs[self.parents[row]], self.names[row])
+
+    def parent(self, row: int) -> str:
+        return self._dirs[self.parents[row]]
+
+    def item_type(self, row: int) -> str:
+        return ITEM_TYPES[self.kinds[row]]
+
+    def size(self, row: int) -> Optional[int]:
+        size = self.sizes[row]
+        return None if size < 0 else size
+
+    def record(self, row: int) -> list:
+        """``[path, type, size, mtime, inode]`` for the manifest"""
+        return [
+            self.path(row),
+            self.item_type(row),
+            self.size(row),
+            self.mtimes[row],
+            self.inodes[row] or None,
+        ]
+
+    def materialize(self, row: int, base_path: Path) -> Memory:
+        """Build a full ``Memory`` for one row"""
+        name = self.names[row]
+        parent = self.parent(row)
+        path = os.path.join(parent, name)
+        item_type = self.item_type(row)
+        metadata = {
+            "parent_dir": parent,
+            "is_hidden": name.startswith("."),
+            "absolute_path": str(base_path / path),
+            "inode": self.inodes[row] or None,
+        }
+
+        if item_type == "folder":
+            return Memory(
+                type="folder",
+                name=name,
+                folder_path=path,
+                updated_at=datetime.fromtimestamp(self.mtimes[row]),
+                metadata=metadata,
+            )
+        return Memory(
+            type=item_type,
+            name=name,
+            file_path=path,
+            updated_at=datetime.fromtimestamp(self.mtimes[row]),
+            size=self.size(row),
+            metadata={"extension": os.path.splitext(name)[1], **metadata},
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """Number of live items per type"""
+        counts = {item_type: 0 for item_type in ITEM_TYPES}
+        for row in self.rows():
+            counts[ITEM_TYPES[self.kinds[row]]] += 1
+        return counts
+
+    def _intern_dir(self, directory: str) -> int:
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_ids[directory] = len(self._dirs)
+            self._dirs.append(directory)
+        return dir_id
+
+    def __len__(self):
+        return self._live
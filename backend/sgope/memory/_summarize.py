@@ -0,0 +1,171 @@
+import asyncio
+import os
+import re
+from typing import List, Optional
+
+from sgope.memory._retrieval import CHARS_PER_TOKEN, estimate_tokens
+
+# Bump when the prompts below change so cached section summaries are not reused
+SUMMARY_TEMPLATE_VERSION = 1
+
+# Structural split points, coarsest first
+_SEPARATORS = [
+    re.compile(r"\n(?=#{1,6} )"),  # markdown headings
+    re.compile(r"\n(?=(?:class|def|async def|function|func|fn|export) )"),
+    re.compile(r"\n[ \t]*\n"),  # paragraphs
+    re.compile(r"\n"),  # lines
+]
+
+
+def chunk_tokens() -> int:
+    """Largest piece of content (in tokens) sent in one summarization prompt"""
+    return int(os.getenv("SUMMARY_CHUNK_TOKENS", "2000"))
+
+
+def token_budget() -> int:
+    """Total content tokens one file may send to the map step"""
+    return int(os.getenv("SUMMARY_TOKEN_BUDGET", "32000"))
+
+
+def split_sections(text: str, max_chars: int) -> List[str]:
+    """Split ``text`` into chunks of at most ``max_chars``, preferring structure.
+
+    Each chunk ends at the last markdown heading, top-level definition,
+    paragraph or line break (coarsest first) in the second half of its
+    window, and only cuts mid-line when a single line is too long.
+    """
+    chunks = []
+    start = 0
+    while len(text) - start > max_chars:
+        window = text[start : start + max_chars]
+        cut = _last_break(window, max_chars // 2) or max_chars
+        chunks.append(window[:cut])
+        start += cut
+    if start < len(text):
+        chunks.append(text[start:])
+    return chunks
+
+
+def _last_break(window: str, min_cut: int) -> int:
+    for separator in _SEPARATORS:
+        cut = 0
+        for match in separator.finditer(window, min_cut):
+            cut = match.end()
+        if cut:
+            return cut
+    return 0
+
+
+def _pack(pieces: List[str], max_chars: int) -> List[str]:
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def needs_map_reduce(text: str, max_tokens: Optional[int] = None) -> bool:
+    return estimate_tokens(text) > (max_tokens or chunk_tokens())
+
+
+async def summarize_large(
+    text: str,
+    name: str,
+    llm,
+    max_tokens: Optional[int] = None,
+    budget: Optional[int] = None,
+    cache=None,
+    model: Optional[str] = None,
+) -> str:
+    """Condense a file too large for one prompt into section summaries.
+
+    Map: every chunk is summarized concurrently (bounded by the backend's
+    concurrency limit). Reduce: the summaries are merged in groups until
+    they fit in one prompt. If the file holds more than ``budget`` tokens,
+    chunks are sampled evenly across it, always keeping the first and last.
+    With an AnalysisCache, unchanged sections are not summarized again.
+    """
+    max_chars = (max_tokens or chunk_tokens()) * CHARS_PER_TOKEN
+    budget = budget or token_budget()
+    chunks = await asyncio.to_thread(split_sections, text, max_chars)
+    total = len(chunks)
+
+    max_chunks = max(2, budget * CHARS_PER_TOKEN // max_chars)
+    if total > max_chunks:
+        picked = sorted(
+            {round(i * (total - 1) / (max_chunks - 1)) for i in range(max_chunks)}
+        )
+    else:
+        picked = list(range(total))
+
+    partials = await asyncio.gather(
+        *(
+            _complete(
+                llm,
+                cache,
+                ("section_summary", model, chunks[i]),
+                f"""Summarize part {i + 1} of {total} of the file {name} in at most 120 words.
+Keep the names of functions, classes, keys, people and figures it mentions.
+
+{chunks[i]}""",
+            )
+            for i in picked
+        )
+    )
+    partials = [
+        f"[Part {i + 1}/{total}] {summary.strip()}"
+        for i, summary in zip(picked, partials)
+        if summary.strip()
+    ]
+
+    # Reduce until the summaries fit in one prompt
+    while sum(len(partial) for partial in partials) > max_chars and len(partials) > 1:
+        groups = _pack([partial + "\n\n" for partial in partials], max_chars)
+        if len(groups) == len(partials):
+            break
+        partials = list(
+            await asyncio.gather(
+                *(
+                    _complete(
+                        llm,
+                        cache,
+                        ("section_merge", model, group),
+                        f"""Combine these consecutive section summaries of the file {name} into one summary of at most 200 words, keeping the key names and facts.
+
+{group}""",
+                    )
+                    for group in groups
+                )
+            )
+        )
+
+    header = f"Summaries of {len(picked)} of {total} sections"
+    return header + ":\n\n" + "\n\n".join(partials)[:max_chars]
+
+
+async def _complete(llm, cache, cache_key: tuple, prompt: str) -> str:
+    """Full text of one (non-streamed to the user) LLM response"""
+    kind, model, content = cache_key
+    key = None
+    if cache is not None:
+        key = cache.key(kind, SUMMARY_TEMPLATE_VERSION, model, content)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+
+    result = ""
+    try:
+        async with llm.concurrency_limit():
+            async for chunk in llm.stream_chat([{"role": "user", "content": prompt}]):
+                if chunk.get("type") == "content":
+                    result += chunk.get("content", "")
+    except Exception as e:
+        print(f"Error summarizing with LLM: {e}")
+    if key is not None and result.strip():
+        await asyncio.to_thread(cache.put, key, kind, result)
+    return result
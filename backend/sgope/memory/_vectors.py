@@ -0,0 +1,375 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sgope.memory._fulltext import tokenize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from ollama import Client
+except ImportError:
+    Client = None
+
+_numpy_warned = False
+
+
+def _warn_numpy_missing():
+    """Log once per process that the vector index (and RAG on top of it) is off"""
+    global _numpy_warned
+    if not _numpy_warned:
+        _numpy_warned = True
+        print(
+            "NumPy not installed, semantic retrieval and RAG context are disabled "
+            "(install the project dependencies, e.g. `uv sync`)"
+        )
+
+
+VECTORS_VERSION = 1
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+
+
+def chunk_text(
+    text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP
+) -> List[Tuple[int, int]]:
+    """Split ``text`` into ``(start, end)`` windows of about ``size`` characters.
+
+    Windows end at a paragraph or line break, or else at whitespace, when
+    one falls in the second half of the window, and consecutive windows
+    overlap by up to ``overlap`` characters.
+    """
+    chunks: List[Tuple[int, int]] = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(length, start + size)
+        if end < length:
+            for separator in ("\n\n", "\n", " "):
+                cut = text.rfind(separator, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        if text[start:end].strip():
+            chunks.append((start, end))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of word unigrams and bigrams.
+
+    Feature counts are damped to ``1 + log(count)`` so boilerplate repeated
+    throughout a chunk does not drown out the words a query is looking for.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = Counter(tokens)
+            features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+            for feature, count in features.items():
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                weight = 1.0 + math.log(count)
+                matrix[i, (value >> 1) % self.dim] += weight if value & 1 else -weight
+        return matrix
+
+
+class OllamaEmbedder:
+    """Embeddings from an Ollama embedding model (e.g. ``nomic-embed-text``)"""
+
+    def __init__(self, model: str, host: Optional[str] = None):
+        self.model = model
+        self.name = f"ollama-{model}"
+        trust_env_setting = os.getenv("OLLAMA_TRUST_ENV", "False").lower() == "true"
+        verify_ssl_setting = os.getenv("OLLAMA_VERIFY_SSL", "False").lower() == "true"
+        self.client = Client(
+            host=host or os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+            trust_env=trust_env_setting,
+            verify=verify_ssl_setting,
+        )
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        response = self.client.embed(model=self.model, input=texts)
+        return np.asarray(response["embeddings"], dtype=np.float32)
+
+
+def get_embedder():
+    """Ollama embedder if ``EMBEDDING_MODEL`` is set, else the hashing fallback"""
+    model = os.getenv("EMBEDDING_MODEL", "")
+    if model and Client is not None:
+        return OllamaEmbedder(model)
+    return HashingEmbedder()
+
+
+class VectorIndex:
+    """Chunk embeddings of knowledge files in a NumPy matrix for cosine top-k.
+
+    Rows are L2-normalized so a single matrix product scores a query (or a
+    batch of queries) against every chunk. Rows of deleted chunks are put on
+    a free list and reused. Re-indexing a file only embeds chunks whose text
+    hash is not already in the index; unchanged chunks keep their vectors.
+    Disabled (empty results) when NumPy is not installed.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        embedder=None,
+        batch_size: int = 32,
+    ):
+        self.directory = directory
+        self.enabled = np is not None
+        self.embedder = embedder or (get_embedder() if self.enabled else None)
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._matrix = None
+        # row -> (path, start, end, chunk hash), None for free rows
+        self._chunks: List[Optional[Tuple[str, int, int, str]]] = []
+        self._free: List[int] = []
+        self._by_path: Dict[str, List[int]] = {}
+        self._by_hash: Dict[str, int] = {}
+        # path -> (mtime, size) of the indexed version
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._dirty = False
+        if not self.enabled:
+            _warn_numpy_missing()
+        elif directory is not None:
+            self._load()
+
+    def is_current(self, path: str, mtime: float, size: int) -> bool:
+        return self._versions.get(path) == (mtime, size)
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._versions)
+
+    def add(self, path: str, text: str, mtime: float, size: int):
+        """Chunk and embed ``path``, reusing vectors of unchanged chunks"""
+        if not self.enabled:
+            return
+        spans = chunk_text(text)
+        hashes = [self._hash(text[start:end]) for start, end in spans]
+
+        with self._lock:
+            missing = {
+                digest: text[start:end]
+                for (start, end), digest in zip(spans, hashes)
+                if digest not in self._by_hash
+            }
+        vectors = self._embed(list(missing.values()))
+        new_vectors = dict(zip(missing, vectors))
+
+        with self._lock:
+            # Copy reused vectors before this file's old rows are freed
+            for (start, end), digest in zip(spans, hashes):
+                if digest in new_vectors:
+                    continue
+                row = self._by_hash.get(digest)
+                if row is not None:
+                    new_vectors[digest] = self._matrix[row].copy()
+                else:
+                    # Dropped by a concurrent update since the first check
+                    new_vectors[digest] = self._embed([text[start:end]])[0]
+
+            self._forget(path)
+            self._by_path[path] = [
+                self._put(new_vectors[digest], (path, start, end, digest))
+                for (start, end), digest in zip(spans, hashes)
+            ]
+            self._versions[path] = (mtime, size)
+            self._dirty = True
+
+    def remove(self, path: str):
+        with self._lock:
+            if self._forget(path):
+                self._dirty = True
+
+    def remove_under(self, path: str):
+        """Remove ``path`` and every file below it"""
+        prefix = path.rstrip("/\\") + os.sep
+        with self._lock:
+            for indexed in [p for p in self._versions if p.startswith(prefix)]:
+                self._forget(indexed)
+            self._forget(path)
+            self._dirty = True
+
+    def search(
+        self, query: str, k: int = 5, paths: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, int, int, float]]:
+        """``(path, start, end, score)`` of the ``k`` chunks closest to ``query``"""
+        return self.search_many([query], k, paths)[0]
+
+    def search_many(
+        self, queries: List[str], k: int = 5, paths: Optional[Iterable[str]] = None
+    ) -> List[List[Tuple[str, int, int, float]]]:
+        """Top-k chunks for several queries with one matrix product.
+
+        ``paths`` restricts the search to the chunks of those files.
+        """
+        if not self.enabled or not queries:
+            return [[] for _ in queries]
+        query_vectors = self._embed(queries)
+
+        with self._lock:
+            if paths is not None:
+                rows = np.array(
+                    [row for path in paths for row in self._by_path.get(path, [])],
+                    dtype=np.int64,
+                )
+            else:
+                live = np.ones(len(self._chunks), dtype=bool)
+                live[self._free] = False
+                rows = np.flatnonzero(live)
+            if not len(rows):
+                return [[] for _ in queries]
+
+            scores = query_vectors @ self._matrix[rows].T
+            k = min(k, len(rows))
+            results = []
+            for row_scores in scores:
+                top = np.argpartition(-row_scores, k - 1)[:k]
+                top = top[np.argsort(-row_scores[top])]
+                results.append(
+                    [(*self._chunks[rows[i]][:3], float(row_scores[i])) for i in top]
+                )
+        return results
+
+    def save(self):
+        """Persist vectors and chunk metadata if anything changed"""
+        if not self.enabled or self.directory is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            count = len(self._chunks)
+            meta = {
+                "version": VECTORS_VERSION,
+                "embedder": self.embedder.name,
+                "chunks": self._chunks,
+                "versions": self._versions,
+            }
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                matrix_path = self.directory / "vectors.npy"
+                tmp_path = self.directory / "vectors.tmp.npy"
+                matrix = self._matrix[:count] if self._matrix is not None else None
+                np.save(tmp_path, matrix if matrix is not None else np.zeros((0, 0)))
+                os.replace(tmp_path, matrix_path)
+
+                meta_path = self.directory / "chunks.json"
+                tmp_path = meta_path.with_name(meta_path.name + ".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(meta, separators=(",", ":")))
+                os.replace(tmp_path, meta_path)
+                self._dirty = False
+            except Exception as e:
+                print(f"Error saving vector index: {e}")
+
+    def __len__(self):
+        return len(self._chunks) - len(self._free)
+
+    def __contains__(self, path: str):
+        return path in self._by_path
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha1(
+            f"{self.embedder.name}\0{text}".encode(), usedforsecurity=False
+        ).hexdigest()
+
+    def _embed(self, texts: List[str]) -> "np.ndarray":
+        """Embed in batches and L2-normalize"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        matrix = np.concatenate(
+            [
+                self.embedder.embed(texts[i : i + self.batch_size])
+                for i in range(0, len(texts), self.batch_size)
+            ]
+        )
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _put(self, vector, chunk: Tuple[str, int, int, str]) -> int:
+        if self._free:
+            row = self._free.pop()
+            self._chunks[row] = chunk
+        else:
+            row = len(self._chunks)
+            self._chunks.append(chunk)
+            self._reserve(row + 1, len(vector))
+        self._matrix[row] = vector
+        self._by_hash[chunk[3]] = row
+        return row
+
+    def _reserve(self, rows: int, dim: int):
+        """Grow the matrix geometrically so appends stay amortized O(1)"""
+        if self._matrix is None:
+            self._matrix = np.zeros((max(rows, 64), dim), dtype=np.float32)
+        elif rows > len(self._matrix):
+            grown = np.zeros((max(rows, len(self._matrix) * 2), dim), dtype=np.float32)
+            grown[: len(self._matrix)] = self._matrix
+            self._matrix = grown
+
+    def _forget(self, path: str) -> bool:
+        rows = self._by_path.pop(path, None)
+        self._versions.pop(path, None)
+        if rows is None:
+            return False
+        for row in rows:
+            digest = self._chunks[row][3]
+            if self._by_hash.get(digest) == row:
+                del self._by_hash[digest]
+            self._chunks[row] = None
+            self._matrix[row] = 0.0
+            self._free.append(row)
+        return True
+
+    def _load(self):
+        try:
+            with open(self.directory / "chunks.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if (
+                meta.get("version") != VECTORS_VERSION
+                or meta.get("embedder") != self.embedder.name
+            ):
+                return
+            matrix = np.load(self.directory / "vectors.npy")
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Ignoring unreadable vector index {self.directory}: {e}")
+            return
+
+        chunks = [tuple(chunk) if chunk else None for chunk in meta["chunks"]]
+        if len(chunks) != len(matrix) and chunks:
+            return
+
+        self._chunks = chunks
+        self._matrix = matrix.astype(np.float32) if chunks else None
+        self._versions = {
+            path: tuple(version) for path, version in meta["versions"].items()
+        }
+        for row, chunk in enumerate(chunks):
+            if chunk is None:
+                self._free.append(row)
+                continue
+            self._by_path.setdefault(chunk[0], []).append(row)
+            self._by_hash[chunk[3]] = row
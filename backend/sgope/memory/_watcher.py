@@ -0,0 +1,97 @@
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+try:
+    from watchfiles import watch
+except ImportError:
+    watch = None
+
+
+class KnowledgeWatcher:
+    """Keep a KnowledgeFileHandler in sync with its directory as files change.
+
+    Uses ``watchfiles`` (inotify/FSEvents/ReadDirectoryChangesW under the
+    hood) when it is installed, and otherwise falls back to polling a
+    ``(mtime, size)`` snapshot of the tree taken with the handler's scanner.
+    Either way every changed path is handed to ``handler.apply_change`` so
+    only the touched items are re-indexed.
+    """
+
+    def __init__(self, handler, poll_interval: float = 2.0):
+        self.handler = handler
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def backend(self) -> str:
+        return "watchfiles" if watch else "polling"
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start watching in a daemon thread"""
+        if self.is_running():
+            return
+
+        self._stop_event.clear()
+        target = self._run_watchfiles if watch else self._run_polling
+        self._thread = threading.Thread(
+            target=target, name="knowledge-watcher", daemon=True
+        )
+        self._thread.start()
+        print(f"Watching {self.handler.data_path} for changes ({self.backend})")
+
+    def stop(self):
+        """Stop the watcher thread and wait for it to exit"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run_watchfiles(self):
+        data_path = self.handler.data_path
+        try:
+            data_path.mkdir(parents=True, exist_ok=True)
+            for changes in watch(
+                data_path,
+                stop_event=self._stop_event,
+                rust_timeout=int(self.poll_interval * 1000),
+                yield_on_timeout=False,
+            ):
+                for path in sorted({path for _, path in changes}):
+                    self._apply(Path(path))
+        except Exception as e:
+            if self._stop_event.is_set():
+                return
+            print(f"File watcher failed ({e}), falling back to polling")
+            self._run_polling()
+
+    def _run_polling(self):
+        snapshot = self._snapshot()
+        while not self._stop_event.wait(self.poll_interval):
+            current = self._snapshot()
+            changed: Set[str] = {
+                path
+                for path in snapshot.keys() | current.keys()
+                if snapshot.get(path) != current.get(path)
+            }
+            for path in sorted(changed):
+                self._apply(Path(path))
+            snapshot = current
+
+    def _snapshot(self) -> Dict[str, Tuple[float, Optional[int]]]:
+        """Map every indexable path under the root to ``(mtime, size)``"""
+        base_path = self.handler.base_path
+        return {
+            str(base_path / path): (mtime, size)
+            for path, _, size, mtime, _ in self.handler.scanner.scan()
+        }
+
+    def _apply(self, path: Path):
+        try:
+            self.handler.apply_change(path)
+        except Exception as e:
+            print(f"Error applying change for {path}: {e}")
@@ -1,18 +1,47 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from sgope.memory import job_queue, knowledge_file_handler
 from sgope.server.routes import router
 from sgope.server.sse import sse_router
 from sgope.server.websocket import websocket_router
 from sgope.mcp_bridge import router as mcp_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services for the lifetime of the app"""
+    # Name search works already; file contents are indexed in the background
+    content_sync = asyncio.create_task(
+        asyncio.to_thread(knowledge_file_handler.sync_content_indexes)
+    )
+    watch_enabled = os.getenv("MEMORY_WATCH", "True").lower() == "true"
+    if watch_enabled:
+        poll_interval = float(os.getenv("MEMORY_WATCH_INTERVAL", "2.0"))
+        knowledge_file_handler.start_watching(poll_interval=poll_interval)
+    job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        knowledge_file_handler.stop_watching()
+        if not content_sync.done():
+            # The worker thread cannot be interrupted; let it finish and save
+            await content_sync
+        knowledge_file_handler.save_indexes()
+
+
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application"""
     app = FastAPI(
         title="sgope API",
         description="Real-time file and action suggestion API with SSE streaming",
-        version="0.1.0"
+        version="0.1.0",
+        lifespan=lifespan,
     )
     
     # Add CORS middleware
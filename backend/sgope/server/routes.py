@@ -1,10 +1,23 @@
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import mimetypes
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from python_multipart.multipart import parse_options_header
+from typing import Dict, Any, List, Optional
 
 from sgope.llm import llm_manager
-from sgope.memory import action_handler, knowledge_file_handler
+from sgope.memory import (
+    PatchConflict,
+    PatchError,
+    action_handler,
+    clean_filename,
+    generate_metadata,
+    job_queue,
+    knowledge_file_handler,
+)
 from sgope.mcp_bridge import router as mcp_router
+from sgope.server.uploads import ATTACHMENT_MAX_TOTAL_BYTES, MultipartUpload, UploadTooLarge
 
 router = APIRouter()
 
@@ -31,14 +44,35 @@ class SetDefaultModelRequest(BaseModel):
     model: str
 
 
+class AttachmentUploadRequest(BaseModel):
+    name: str
+    content: str
+
+
+class TextEdit(BaseModel):
+    # Offsets and lengths are UTF-16 code units, i.e. JavaScript string indices
+    offset: int  # offset into the current content
+    length: int = 0  # code units to replace
+    replacement: str = ""
+
+
 class UpdateFileContentRequest(BaseModel):
     path: str
-    content: str
+    content: Optional[str] = None  # full replacement
+    edits: Optional[List[TextEdit]] = None  # or a list of edits
+    diff: Optional[str] = None  # or a unified diff
+    base_hash: Optional[str] = None  # SHA-256 of the content edits/diff were made against
 
 
 @router.post("/generate-filename")
 async def generate_filename(request: FilenameRequest):
-    """Generate a filename from content previews using an LLM"""
+    """Generate a filename (plus summary and tags) from content previews using an LLM"""
+    # One short structured-output call returns all three fields
+    metadata = await generate_metadata(request.previews, llm_manager)
+    if metadata:
+        return metadata
+
+    # Backends without structured output: ask for just the filename
     prompt = f"""Based on the following file previews, generate a single, short, descriptive, snake_case filename.
 The filename should not include an extension.
 Return ONLY the filename and nothing else. Be concise.
@@ -53,23 +87,25 @@ Previews:
         if chunk.get("type") == "content":
             filename_content += chunk.get("content", "")
 
-    import re
-
-    filename = filename_content.strip().lower().replace(" ", "_")
-    filename = re.sub(r"[^a-z0-9_]", "", filename)
-    filename = re.sub(r"__+", "_", filename)
-
-    if not filename:
-        filename = "knowledge_file"
+    filename = clean_filename(filename_content) or "knowledge_file"
 
-    return {"filename": filename}
+    return {"filename": filename, "summary": "", "tags": []}
 
 
 @router.get("/files")
-async def get_file_suggestions(q: str = Query("", description="Search query")):
+async def get_file_suggestions(
+    q: str = Query("", description="Search query"),
+    mode: str = Query("name", description="Match file names ('name') or contents ('content')"),
+):
     """Get file suggestions for autocomplete"""
+    if mode not in ("name", "content"):
+        raise HTTPException(status_code=400, detail="mode must be 'name' or 'content'")
     try:
-        suggestions = knowledge_file_handler.search(q)
+        if mode == "content":
+            # Snippets are read from disk, so keep that off the event loop
+            suggestions = await asyncio.to_thread(knowledge_file_handler.search_content, q)
+        else:
+            suggestions = await asyncio.to_thread(knowledge_file_handler.search, q)
         return [suggestion.model_dump() for suggestion in suggestions]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching files: {str(e)}")
@@ -79,7 +115,7 @@ async def get_file_suggestions(q: str = Query("", description="Search query")):
 async def get_file_content(path: str = Query(..., description="File path")):
     """Get file content by path"""
     try:
-        content = knowledge_file_handler.read_file_content(path)
+        content = await knowledge_file_handler.aread_file_content(path)
         if content is None:
             raise HTTPException(status_code=404, detail="File not found")
         return content
@@ -87,16 +123,129 @@ async def get_file_content(path: str = Query(..., description="File path")):
         raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
 
 
+@router.get("/files/range")
+async def get_file_range(
+    request: Request,
+    path: str = Query(..., description="File path"),
+    offset: int = Query(0, ge=0, description="Byte offset to start reading at"),
+    length: Optional[int] = Query(None, ge=1, description="Number of bytes to read"),
+    line: Optional[int] = Query(None, ge=0, description="Line to start reading at (0-based); overrides offset"),
+    lines: int = Query(100, ge=1, le=100000, description="Number of lines to read"),
+):
+    """Read part of a (large) file by byte or line offsets, or via a Range header"""
+    try:
+        range_header = request.headers.get("range")
+        if range_header:
+            try:
+                result = await asyncio.to_thread(knowledge_file_handler.read_file_bytes, path, range_header)
+            except ValueError as e:
+                raise HTTPException(status_code=416, detail=str(e))
+            if result is None:
+                raise HTTPException(status_code=404, detail="File not found")
+
+            data, start, end, size = result
+            return Response(
+                content=data,
+                status_code=206,
+                media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                headers={
+                    "Content-Range": f"bytes {start}-{end - 1}/{size}",
+                    "Accept-Ranges": "bytes",
+                },
+            )
+
+        result = await asyncio.to_thread(knowledge_file_handler.read_file_range, path, offset, length, line, lines)
+        if result is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
+
+
 @router.post("/files/content")
 async def update_file_content(request: UpdateFileContentRequest):
-    """Update file content by path"""
+    """Update file content by path, with the full content, a list of edits or a unified diff"""
+    given = [field for field in ("content", "edits", "diff") if getattr(request, field) is not None]
+    if len(given) != 1:
+        raise HTTPException(status_code=400, detail="Provide exactly one of content, edits or diff")
+
     try:
-        knowledge_file_handler.write_file_content(request.path, request.content)
-        return {"message": "File updated successfully"}
+        if request.content is not None:
+            await knowledge_file_handler.awrite_file_content(request.path, request.content)
+            return {"message": "File updated successfully"}
+
+        edits = [(edit.offset, edit.length, edit.replacement) for edit in request.edits or []]
+        try:
+            result = await asyncio.to_thread(
+                knowledge_file_handler.patch_file_content,
+                request.path,
+                edits,
+                request.diff,
+                request.base_hash,
+                utf16=True,
+            )
+        except PatchConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except PatchError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if result is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return {"message": "File updated successfully", **result}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating file: {str(e)}")
 
 
+@router.post("/attachments")
+async def upload_attachment(request: AttachmentUploadRequest):
+    """Store an attachment once; chat and action requests then reference it by id"""
+    try:
+        attachment = await asyncio.to_thread(
+            knowledge_file_handler.add_attachment, request.content.encode("utf-8")
+        )
+        return {"name": request.name, **attachment}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error storing attachment: {str(e)}")
+
+
+@router.post("/attachments/upload")
+async def upload_attachment_files(request: Request):
+    """Stream multipart/form-data file uploads to disk; returns an id per file"""
+    _, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data with a boundary")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > ATTACHMENT_MAX_TOTAL_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {ATTACHMENT_MAX_TOTAL_BYTES // (1024 * 1024)}MB total limit")
+
+    upload = MultipartUpload(knowledge_file_handler, boundary)
+    try:
+        # Parsing and disk writes run off the event loop, one network chunk at a time
+        async for chunk in request.stream():
+            await asyncio.to_thread(upload.write, chunk)
+        files = await asyncio.to_thread(upload.finish)
+        return {"attachments": files}
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error uploading attachments: {str(e)}")
+    finally:
+        upload.abort()
+
+
+@router.get("/attachments/{attachment_id}")
+async def get_attachment(attachment_id: str):
+    """Check whether an attachment (by SHA-256 id) is already stored"""
+    attachment = await asyncio.to_thread(knowledge_file_handler.attachment_info, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return attachment
+
+
 @router.get("/actions")
 async def get_action_suggestions(q: str = Query("", description="Search query")):
     """Get action suggestions for autocomplete"""
@@ -114,11 +263,13 @@ async def get_stats():
     """Get system statistics"""
     try:
         # Get memory stats
+        counts = knowledge_file_handler.counts()
         memory_stats = {
-            "total_items": len(knowledge_file_handler.memory),
-            "files": len([item for item in knowledge_file_handler.memory if item.type == "file"]),
-            "folders": len([item for item in knowledge_file_handler.memory if item.type == "folder"]),
-            "images": len([item for item in knowledge_file_handler.memory if item.type == "image"]),
+            "total_items": len(knowledge_file_handler),
+            "files": counts["file"],
+            "folders": counts["folder"],
+            "images": counts["image"],
+            "content_cache": knowledge_file_handler.content_cache.stats(),
         }
         
         # Get LLM stats using available methods
@@ -139,7 +290,10 @@ async def get_stats():
         
         return {
             "short_term_memory": memory_stats,
-            "long_term_memory": {"total_actions": len(action_handler)},
+            "long_term_memory": {
+                "total_actions": len(action_handler),
+                "analysis_cache": await asyncio.to_thread(action_handler.analysis_cache.stats),
+            },
             "llm_services": llm_stats
         }
     except Exception as e:
@@ -150,7 +304,8 @@ async def get_stats():
 async def refresh_memory():
     """Refresh memory systems"""
     try:
-        knowledge_file_handler.refresh()
+        # Rescan in a worker thread; searches keep using the current index meanwhile
+        await asyncio.to_thread(knowledge_file_handler.refresh)
         return {
             "message": "Memory refreshed successfully",
             "stats": {
@@ -201,12 +356,18 @@ async def refresh_models():
 
 
 @router.post("/actions/execute")
-async def execute_action(request_data: dict):
-    """Execute a specific action"""
+async def execute_action(request_data: dict, response: Response):
+    """Queue a specific action as a background job.
+
+    Returns the queued job at once (follow it via /api/jobs/{id}); with
+    ``wait: true`` the response is the action's result instead.
+    """
     try:
         action_id = request_data.get("action_id")
         user_input = request_data.get("user_input", "")
-        attachments = request_data.get("attachments", [])
+        attachments = await knowledge_file_handler.aresolve_attachments(
+            request_data.get("attachments", [])
+        )
 
         if not action_id:
             raise HTTPException(status_code=400, detail="action_id is required")
@@ -233,14 +394,32 @@ async def execute_action(request_data: dict):
                     + f"\n{'=' * 50}"
                 )
 
-        # Execute the action
-        result = action_handler.execute_action(action_id, full_input)
-        return result
-
+        # Execute the action in the background
+        job = job_queue.submit(
+            action_id,
+            lambda progress: action_handler.execute_action(action_id, full_input, progress=progress),
+        )
+        if request_data.get("wait"):
+            job = await job_queue.wait(job["id"])
+            return job["result"]
+        response.status_code = 202
+        return job
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error executing action: {str(e)}")
 
 
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """State, progress events and result of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -1,14 +1,15 @@
 import asyncio
 import json
+import os
 from datetime import datetime
 from typing import AsyncGenerator, Dict
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
 # Import the LLM manager and memory
 from sgope.llm import llm_manager
-from sgope.memory import knowledge_file_handler
+from sgope.memory import assemble_context, context_budget, job_queue, knowledge_file_handler
 
 sse_router = APIRouter()
 
@@ -22,19 +23,22 @@ async def generate_chat_stream(
     model: str = None,
     stream_id: str = None,
     selected_action: str = None,
-    knowledge_filename: str = None
+    knowledge_filename: str = None,
+    use_knowledge: bool = False
 ) -> AsyncGenerator[str, None]:
     """Generate streaming chat response using real LLM services"""
+    # Retrieval needs the vector index (NumPy)
+    use_knowledge = use_knowledge and knowledge_file_handler.vectors.enabled
     
     try:
+        # Attachments uploaded earlier are referenced by id; read them from the blob store
+        attachments = await knowledge_file_handler.aresolve_attachments(attachments)
+
         # Check if an action should be executed first
         if selected_action:
             # Import here to avoid circular imports
             from sgope.memory import action_handler
 
-            # Send action execution start event
-            yield f"data: {json.dumps({'type': 'action_start', 'action': selected_action, 'timestamp': datetime.now().isoformat()})}\n\n"
-            
             # Prepare user input with attachments if present (same as routes.py)
             full_input = message
             if attachments:
@@ -51,16 +55,36 @@ async def generate_chat_stream(
                 if attachment_contents:
                     full_input += f"\n\nAttached Files:\n{'=' * 50}\n" + "\n\n".join(attachment_contents) + f"\n{'=' * 50}"
             
-            # Execute the action with processed input (consistent with routes.py)
-            action_result = action_handler.execute_action(
-                selected_action, 
-                full_input, 
-                attachments=attachments,
-                knowledge_filename=knowledge_filename
+            # Run the action as a background job: it keeps going if this stream
+            # is stopped or disconnects, and can be followed via /api/jobs/{id}
+            job = job_queue.submit(
+                selected_action,
+                lambda progress: action_handler.execute_action(
+                    selected_action,
+                    full_input,
+                    attachments=attachments,
+                    knowledge_filename=knowledge_filename,
+                    progress=progress
+                ),
             )
-            
-            # Send action completion event
-            yield f"data: {json.dumps({'type': 'action_complete', 'action': selected_action, 'result': action_result, 'timestamp': datetime.now().isoformat()})}\n\n"
+
+            # Send action execution start event
+            yield f"data: {json.dumps({'type': 'action_start', 'action': selected_action, 'job_id': job['id'], 'timestamp': datetime.now().isoformat()})}\n\n"
+
+            # Forward the job's progress until it completes
+            action_result = {'action': selected_action, 'message': 'Action did not complete', 'status': 'error'}
+            async for event in job_queue.events(job['id']):
+                if stream_id and not active_streams.get(stream_id, True):
+                    yield f"data: {json.dumps({'type': 'cancelled', 'message': 'Stopped following the action; it continues in the background.', 'job_id': job['id']})}\n\n"
+                    return
+                if event['step'] == 'complete':
+                    action_result = dict(event.get('result') or action_result)
+                    break
+                yield f"data: {json.dumps({'type': 'action_progress', 'action': selected_action, 'job_id': job['id'], **event, 'timestamp': datetime.now().isoformat()})}\n\n"
+
+            # Send action completion event, with how long each step took
+            timings = action_result.pop('timings', None)
+            yield f"data: {json.dumps({'type': 'action_complete', 'action': selected_action, 'job_id': job['id'], 'result': action_result, 'timings': timings, 'timestamp': datetime.now().isoformat()})}\n\n"
             
             # For add_knowledge, use LLM to summarize and generate filename
             if selected_action == "add_knowledge":
@@ -94,10 +118,17 @@ async def generate_chat_stream(
         else:
             # Normal chat flow - prepare messages for LLM
             messages = [{"role": "user", "content": message}]
+            # Referenced knowledge files contribute relevant excerpts instead of their full text
+            pinned_paths = []
             
             # Add attachment information and content to context if present
             if attachments:
                 attachment_contents = []
+                # Resolve every attachment without inline content in one pass
+                memory_items = knowledge_file_handler.find_many(
+                    att.get('name', 'unknown') for att in attachments
+                    if att.get('type', 'file') == 'file' and not att.get('content')
+                )
                 for att in attachments:
                     att_name = att.get('name', 'unknown')
                     att_type = att.get('type', 'file')
@@ -111,9 +142,12 @@ async def generate_chat_stream(
                             attachment_contents.append(f"File: {att_name}{size_info}\n{'-' * 40}\n{att_content}\n{'-' * 40}")
                         else:
                             # Try to read file content from memory as fallback
-                            memory_item = knowledge_file_handler.find_by_name(att_name)
-                            if memory_item and memory_item.file_path:
-                                file_content = knowledge_file_handler.read_file_content(memory_item.file_path)
+                            memory_item = memory_items.get(att_name)
+                            if use_knowledge and memory_item and memory_item.file_path in knowledge_file_handler.vectors:
+                                pinned_paths.append(memory_item.file_path)
+                                attachment_contents.append(f"File: {att_name} (from memory, relevant excerpts under Relevant Knowledge)")
+                            elif memory_item and memory_item.file_path:
+                                file_content = await knowledge_file_handler.aread_file_content(memory_item.file_path)
                                 if file_content:
                                     attachment_contents.append(f"File: {att_name} (from memory)\n{'-' * 40}\n{file_content}\n{'-' * 40}")
                                 else:
@@ -126,6 +160,15 @@ async def generate_chat_stream(
                 if attachment_contents:
                     attachment_info = f"\n\nUploaded Files:\n{'=' * 50}\n" + "\n\n".join(attachment_contents) + f"\n{'=' * 50}"
                     messages[0]["content"] += attachment_info
+            
+            if use_knowledge:
+                budget = context_budget(model)
+                context, sources = await asyncio.to_thread(
+                    assemble_context, knowledge_file_handler, message, budget, pinned_paths
+                )
+                messages[0]["content"] += context
+                used_tokens = sum(source["tokens"] for source in sources)
+                yield f"data: {json.dumps({'type': 'context_sources', 'sources': sources, 'tokens': used_tokens, 'budget': budget, 'timestamp': datetime.now().isoformat()})}\n\n"
         
         # Stream from LLM manager
         async for chunk in llm_manager.stream_chat(messages, model, stream_id):
@@ -167,13 +210,14 @@ async def stream_chat(request: Request):
         stream_id = body.get("stream_id", f"stream_{datetime.now().timestamp()}")
         selected_action = body.get("selected_action")
         knowledge_filename = body.get("knowledge_filename")
+        use_knowledge = body.get("use_knowledge", os.getenv("RAG_ENABLED", "False").lower() == "true")
         
         # Track this stream
         active_streams[stream_id] = True
         
         # Return streaming response
         return StreamingResponse(
-            generate_chat_stream(message, attachments, model, stream_id, selected_action, knowledge_filename),
+            generate_chat_stream(message, attachments, model, stream_id, selected_action, knowledge_filename, use_knowledge),
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
@@ -191,6 +235,23 @@ async def stream_chat(request: Request):
         )
 
 
+@sse_router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """SSE stream of a background job's progress events, ending when it completes"""
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    async def generate() -> AsyncGenerator[str, None]:
+        async for event in job_queue.events(job_id):
+            yield f"data: {json.dumps({'type': 'job_progress', 'job_id': job_id, **event})}\n\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    )
+
+
 @sse_router.post("/chat/stop")
 async def stop_chat_stream(request: Request):
     """Stop a streaming chat session"""
@@ -0,0 +1,135 @@
+from typing import Dict, List, Optional
+
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+# Same limits add_knowledge applies to attachments
+ATTACHMENT_MAX_FILE_BYTES = 5 * 1024 * 1024
+ATTACHMENT_MAX_TOTAL_BYTES = 20 * 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class MultipartUpload:
+    """Streams the file parts of a multipart/form-data body into the blob store.
+
+    Feed the raw body with ``write`` as it arrives: each file part goes to
+    disk chunk by chunk and is hashed on the way, and the size limits are
+    checked per chunk, so an oversized upload is rejected as soon as it
+    crosses a limit instead of after it has been buffered.
+    """
+
+    def __init__(
+        self,
+        handler,
+        boundary: bytes,
+        max_file_bytes: int = ATTACHMENT_MAX_FILE_BYTES,
+        max_total_bytes: int = ATTACHMENT_MAX_TOTAL_BYTES,
+    ):
+        self.handler = handler
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.files: List[Dict] = []
+        self.total = 0
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._name: Optional[str] = None
+        self._content_type: Optional[str] = None
+        self._writer = None
+        # Blobs this upload added, discarded unless the upload finishes
+        self._created: List[str] = []
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def write(self, chunk: bytes):
+        self._parser.write(chunk)
+
+    def finish(self) -> List[Dict]:
+        """Finish parsing and register the uploaded files as attachments"""
+        self._parser.finalize()
+        for upload in self.files:
+            self.handler.register_attachment(upload["id"])
+        self._created = []
+        return self.files
+
+    def abort(self):
+        """Discard the open part and any part committed before a failure"""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+        for digest in self._created:
+            self.handler.blobs.discard(digest)
+        self._created = []
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = b""
+        self._value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(
+            self._headers.get(b"content-disposition", b"")
+        )
+        filename = options.get(b"filename")
+        if filename is None:
+            # Plain form fields carry no attachment content
+            return
+        self._name = filename.decode("utf-8", errors="replace")
+        self._content_type = (
+            self._headers.get(b"content-type", b"").decode("latin-1") or None
+        )
+        self._writer = self.handler.blobs.writer()
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._writer is None:
+            return
+        size = end - start
+        if self._writer.size + size > self.max_file_bytes:
+            raise UploadTooLarge(
+                f"File '{self._name}' exceeds {self.max_file_bytes // (1024 * 1024)}MB limit"
+            )
+        if self.total + self._writer.size + size > self.max_total_bytes:
+            raise UploadTooLarge(
+                f"Upload exceeds {self.max_total_bytes // (1024 * 1024)}MB total limit"
+            )
+        self._writer.write(data[start:end])
+
+    def _on_part_end(self):
+        if self._writer is None:
+            return
+        size = self._writer.size
+        digest = self._writer.commit()
+        if self._writer.created:
+            self._created.append(digest)
+        self._writer = None
+        self.total += size
+        self.files.append(
+            {
+                "name": self._name,
+                "id": digest,
+                "size": size,
+                "content_type": self._content_type,
+            }
+        )
@@ -1,17 +1,13 @@
+import asyncio
 import json
 from typing import List
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
-from sgope.memory._actions import ActionHandler
-from sgope.memory._knowledge_files import KnowledgeFileHandler
+from sgope.memory import action_handler, knowledge_file_handler
 
 websocket_router = APIRouter()
 
-# Initialize memory instances
-knowledge_file_handler = KnowledgeFileHandler()
-action_handler = ActionHandler()
-
 # Store active WebSocket connections
 active_connections: List[WebSocket] = []
 
@@ -51,12 +47,19 @@ async def websocket_suggestions(websocket: WebSocket):
                 message = json.loads(data)
                 query_type = message.get("type")  # "files" or "actions"
                 query = message.get("query", "")
+                mode = message.get("mode", "name")  # "name" or "content"
 
                 if query_type == "files":
-                    suggestions = knowledge_file_handler.search(query)
+                    if mode == "content":
+                        suggestions = await asyncio.to_thread(
+                            knowledge_file_handler.search_content, query
+                        )
+                    else:
+                        suggestions = await asyncio.to_thread(knowledge_file_handler.search, query)
                     response = {
                         "type": "files",
                         "query": query,
+                        "mode": mode,
                         "suggestions": [
                             {
                                 "id": suggestion.id,
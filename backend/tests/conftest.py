@@ -0,0 +1,78 @@
+import contextlib
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sgope.memory import KnowledgeFileHandler
+from sgope.server import routes
+
+
+class FakeLLM:
+    """Stands in for llm_manager: canned replies, every prompt recorded.
+
+    ``reply`` is a string or a ``prompt -> str`` function; ``metadata`` is
+    what ``complete_json`` returns (None: no structured output).
+    """
+
+    def __init__(self, reply="summary", metadata=None):
+        self.reply = reply
+        self.metadata = metadata
+        self.prompts = []
+        self.service_config = SimpleNamespace(get_default_model=lambda: "fake-model")
+
+    def concurrency_limit(self, model=None):
+        return contextlib.nullcontext()
+
+    async def stream_chat(self, messages, *args, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        reply = self.reply(prompt) if callable(self.reply) else self.reply
+        yield {"type": "content", "content": reply}
+
+    async def complete_json(self, messages, schema, model=None, max_tokens=256):
+        self.prompts.append(messages[-1]["content"])
+        return self.metadata
+
+
+@pytest.fixture
+def fake_llm():
+    return FakeLLM
+
+
+@pytest.fixture
+def make_handler(tmp_path):
+    """Build a KnowledgeFileHandler over files written to a temporary directory.
+
+    ``files`` is a list of names (each file holds its own name) or a
+    name -> content mapping; ``mtimes`` optionally maps names to mtimes.
+    """
+    data_path = tmp_path / "data" / "memory" / "knowledge_files"
+
+    def make(files=(), mtimes=None):
+        data_path.mkdir(parents=True, exist_ok=True)
+        contents = files if isinstance(files, dict) else {name: name for name in files}
+        for name, content in contents.items():
+            path = data_path / name
+            path.write_text(content)
+            if mtimes and name in mtimes:
+                os.utime(path, (mtimes[name], mtimes[name]))
+        return KnowledgeFileHandler(data_path=data_path)
+
+    return make
+
+
+@pytest.fixture
+def make_client(make_handler, monkeypatch):
+    """A TestClient for the /api routes, backed by a handler from ``make_handler``"""
+
+    def make(files=(), mtimes=None):
+        handler = make_handler(files, mtimes)
+        monkeypatch.setattr(routes, "knowledge_file_handler", handler)
+        app = FastAPI()
+        app.include_router(routes.router, prefix="/api")
+        return TestClient(app), handler
+
+    return make
@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+from sgope.memory import _analysis_cache
+from sgope.memory._analysis_cache import AnalysisCache
+from sgope.memory._ingest import KnowledgeIngest
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, monkeypatch, max_bytes=1024, max_age=3600):
+    clock = Clock()
+    monkeypatch.setattr(_analysis_cache, "time", SimpleNamespace(time=clock))
+    return AnalysisCache(tmp_path / "cache.db", max_bytes, max_age), clock
+
+
+def test_hit_requires_same_kind_version_model_and_content(tmp_path, monkeypatch):
+    cache, _ = make_cache(tmp_path, monkeypatch)
+    key = cache.key("file_analysis", 1, "model-a", "content")
+    cache.put(key, "file_analysis", "analysis")
+
+    assert cache.get(key) == "analysis"
+    assert cache.get(cache.key("file_analysis", 1, "model-b", "content")) is None
+    assert cache.get(cache.key("file_analysis", 2, "model-a", "content")) is None
+    assert cache.get(cache.key("note_summary", 1, "model-a", "content")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, max_bytes=10)
+    for name in ("a", "b"):
+        clock.now += 1
+        cache.put(name, "kind", name * 4)
+    clock.now += 1
+    cache.get("a")
+
+    clock.now += 1
+    cache.put("c", "kind", "cccc")
+
+    assert cache.get("a") == "aaaa"
+    assert cache.get("b") is None
+    assert cache.get("c") == "cccc"
+    assert cache.stats()["bytes"] == 8
+
+
+def test_unused_entries_expire(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, max_age=60)
+    cache.put("key", "kind", "result")
+
+    clock.now += 61
+
+    assert cache.get("key") is None
+
+
+def test_file_analysis_is_cached_per_name_and_content(tmp_path, fake_llm):
+    llm = fake_llm(reply="analysis")
+    cache = AnalysisCache(tmp_path / "cache.db", 1024 * 1024, 3600)
+
+    def analyze(name):
+        ingest = KnowledgeIngest(None, llm, cache)
+        return asyncio.run(ingest.analyze_file(0, {"name": name, "content": "x = 1"}))
+
+    analyze("a.py")
+    analyze("a.py")
+    analyze("b.txt")
+
+    assert len(llm.prompts) == 2
+    assert "File: b.txt" in llm.prompts[1]
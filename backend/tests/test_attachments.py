@@ -0,0 +1,50 @@
+import asyncio
+
+from sgope.memory._blobs import blob_digest
+
+
+def test_attachments_given_by_id_are_resolved(make_handler):
+    handler = make_handler()
+    stored = handler.add_attachment("hello attachment".encode())
+    unknown = blob_digest(b"never uploaded")
+
+    resolved = asyncio.run(
+        handler.aresolve_attachments(
+            [
+                {"id": stored["id"], "name": "hello.txt"},
+                {"id": unknown, "name": "lost.txt"},
+                {"name": "inline.txt", "content": "inline text"},
+            ]
+        )
+    )
+
+    assert resolved[0]["content"] == "hello attachment"
+    assert resolved[0]["size"] == stored["size"]
+    assert resolved[0]["type"] == "file"
+    assert resolved[1]["missing"] is True
+    assert not resolved[1].get("content")
+    assert resolved[2] == {"name": "inline.txt", "content": "inline text"}
+
+
+def test_resolving_an_attachment_keeps_it_from_pruning(make_handler):
+    handler = make_handler()
+    attachment_id = handler.add_attachment(b"in use")["id"]
+    handler.blobs._attachments[attachment_id] = 0
+
+    asyncio.run(handler.aresolve_attachments([{"id": attachment_id}]))
+    handler.blobs.prune(handler.data_path, attachment_retention=60)
+
+    assert handler.blobs.has(attachment_id)
+
+
+def test_attachment_lookup_endpoint(make_client):
+    client, handler = make_client()
+    attachment = handler.add_attachment(b"payload")
+
+    found = client.get(f"/api/attachments/{attachment['id']}")
+    missing = client.get(f"/api/attachments/{blob_digest(b'other')}")
+    malformed = client.get("/api/attachments/not-a-digest")
+
+    assert found.json() == {"id": attachment["id"], "size": 7}
+    assert missing.status_code == 404
+    assert malformed.status_code == 404
@@ -0,0 +1,71 @@
+import time
+
+from sgope.memory._blobs import blob_digest
+
+
+def test_identical_content_is_stored_once(make_handler):
+    handler = make_handler()
+
+    first = handler.add_knowledge_file("notes.md", "same text")
+    again = handler.add_knowledge_file("other.md", "same text")
+    copy = handler.add_knowledge_file("notes.md", "same text", reuse=False)
+
+    assert first == again == "notes.md"
+    assert copy == "notes_2.md"
+    assert len(handler.blobs) == 1
+    assert (handler.data_path / copy).read_text() == "same text"
+
+
+def test_editing_a_file_in_place_leaves_its_blob_alone(make_handler):
+    handler = make_handler()
+    name = handler.add_knowledge_file("notes.md", "original")
+    digest = blob_digest(b"original")
+
+    with open(handler.data_path / name, "w") as f:
+        f.write("edited in place")
+
+    assert handler.blobs.get(digest) == b"original"
+    assert not handler.blobs.current(name, handler.data_path)
+    # The edited file no longer counts as a copy of the original content
+    assert handler.add_knowledge_file("notes.md", "original") == "notes_2.md"
+
+
+def test_replace_renames_and_swaps_content(make_handler):
+    handler = make_handler()
+    draft = handler.add_knowledge_file("draft.md", "draft", reuse=False)
+
+    final = handler.replace_knowledge_file(draft, "final text", "final.md")
+
+    assert final == "final.md"
+    assert not (handler.data_path / draft).exists()
+    assert (handler.data_path / final).read_text() == "final text"
+    assert handler.find_by_name("final.md") is not None
+    assert handler.find_by_name(draft) is None
+
+
+def test_replace_keeps_a_file_edited_meanwhile(make_handler):
+    handler = make_handler()
+    draft = handler.add_knowledge_file("draft.md", "draft", reuse=False)
+    (handler.data_path / draft).write_text("user edit")
+
+    assert handler.replace_knowledge_file(draft, "final", "final.md") == draft
+    assert (handler.data_path / draft).read_text() == "user edit"
+
+
+def test_prune_drops_unused_blobs_and_expired_attachments(make_handler):
+    handler = make_handler()
+    name = handler.add_knowledge_file("kept.md", "kept")
+    handler.add_knowledge_file("gone.md", "gone")
+    (handler.data_path / "gone.md").unlink()
+    fresh = handler.add_attachment(b"fresh attachment")["id"]
+    stale = handler.add_attachment(b"stale attachment")["id"]
+    handler.blobs._attachments[stale] = time.time() - 3600
+
+    removed = handler.blobs.prune(handler.data_path, attachment_retention=60)
+
+    assert removed == 2
+    assert handler.blobs.has(blob_digest(b"kept"))
+    assert handler.blobs.has(fresh)
+    assert not handler.blobs.has(stale)
+    assert not handler.blobs.has(blob_digest(b"gone"))
+    assert (handler.data_path / name).read_text() == "kept"
@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+openai = pytest.importorskip("openai")
+ollama = pytest.importorskip("ollama")
+
+from sgope.llm._ollama import OllamaService  # noqa: E402
+from sgope.llm._openai import OpenAIService  # noqa: E402
+
+REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+def rejected(status=400):
+    return openai.APIStatusError(
+        "response_format is not supported",
+        response=httpx.Response(status, request=REQUEST),
+        body=None,
+    )
+
+
+class FakeCompletions:
+    """``chat.completions.create`` failing with ``errors`` in turn, then answering"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+        message = SimpleNamespace(content='{"filename": "notes"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def openai_service(completions):
+    service = OpenAIService(api_key="test")
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service
+
+
+def formats(completions):
+    return [call["response_format"]["type"] for call in completions.calls]
+
+
+def complete(service, model="gpt-4o", max_tokens=200):
+    return asyncio.run(
+        service.complete_json(
+            [{"role": "user", "content": "hi"}], {}, model, max_tokens
+        )
+    )
+
+
+def test_openai_falls_back_to_json_mode_and_remembers_it():
+    completions = FakeCompletions(rejected())
+    service = openai_service(completions)
+
+    assert complete(service) == '{"filename": "notes"}'
+    assert complete(service) == '{"filename": "notes"}'
+    assert formats(completions) == ["json_schema", "json_object", "json_object"]
+
+
+def test_openai_transient_errors_do_not_downgrade_the_model():
+    completions = FakeCompletions(
+        openai.APITimeoutError(request=REQUEST), rejected(status=503)
+    )
+    service = openai_service(completions)
+
+    assert complete(service) is None
+    assert complete(service) is None
+    assert complete(service) == '{"filename": "notes"}'
+    assert formats(completions) == ["json_schema"] * 3
+
+
+def test_openai_model_refusing_every_format_is_skipped_for_a_while():
+    completions = FakeCompletions(rejected(), rejected(status=422))
+    service = openai_service(completions)
+
+    assert complete(service) is None
+    assert complete(service) is None
+    assert len(completions.calls) == 2
+
+
+def test_openai_reasoning_models_get_room_to_think():
+    completions = FakeCompletions()
+    service = openai_service(completions)
+
+    complete(service, model="o3-mini", max_tokens=200)
+    complete(service, model="gpt-4o", max_tokens=200)
+
+    assert completions.calls[0]["max_completion_tokens"] >= 4096
+    assert completions.calls[1]["max_completion_tokens"] == 200
+
+
+class FakeOllama:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.formats = []
+
+    async def chat(self, **kwargs):
+        self.formats.append(kwargs["format"])
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"message": {"content": '{"filename": "notes"}'}}
+
+
+def ollama_service(client):
+    service = OllamaService()
+    service.async_client = client
+    return service
+
+
+def test_ollama_falls_back_to_json_only_when_the_schema_is_refused():
+    client = FakeOllama(ollama.ResponseError("invalid format", 400))
+    service = ollama_service(client)
+
+    assert complete(service, model="llama3.2") == '{"filename": "notes"}'
+    assert complete(service, model="llama3.2") == '{"filename": "notes"}'
+    assert client.formats == [{}, "json", "json"]
+
+
+def test_ollama_timeouts_do_not_downgrade_the_model():
+    client = FakeOllama(httpx.ReadTimeout("timed out"))
+    service = ollama_service(client)
+
+    assert complete(service, model="llama3.2") is None
+    assert complete(service, model="llama3.2") == '{"filename": "notes"}'
+    assert client.formats == [{}, {}]
@@ -0,0 +1,46 @@
+from sgope.memory._fulltext import FullTextIndex
+
+
+def paths(index, query):
+    return [path for path, _ in index.search(query)]
+
+
+def test_readded_document_replaces_its_old_version(tmp_path):
+    index = FullTextIndex(tmp_path, buffer_size=2)
+    index.add("a.md", "apple banana", 1.0, 12)
+    index.add("b.md", "cherry", 1.0, 6)  # fills the buffer: flushed to a segment
+    index.add("a.md", "durian", 2.0, 6)
+
+    assert paths(index, "apple") == []
+    assert paths(index, "durian") == ["a.md"]
+    assert index.is_current("a.md", 2.0, 6)
+    assert not index.is_current("a.md", 1.0, 12)
+
+
+def test_removed_document_no_longer_matches(tmp_path):
+    index = FullTextIndex(tmp_path)
+    index.add("a.md", "apple", 1.0, 5)
+    index.add("b.md", "apple pie", 1.0, 9)
+
+    index.remove("a.md")
+
+    assert paths(index, "apple") == ["b.md"]
+    assert len(index) == 1
+
+
+def test_merge_keeps_live_documents_and_drops_stale_ones(tmp_path):
+    index = FullTextIndex(tmp_path, buffer_size=1, max_segments=2, merge_factor=2)
+    for i in range(5):
+        index.add(f"doc_{i}.md", f"common word_{i}", 1.0, 10)
+    index.add("doc_0.md", "replaced", 2.0, 8)
+    index.remove("doc_1.md")
+    index.save()
+
+    assert len(index._segments) <= 2
+    assert sorted(paths(index, "common")) == ["doc_2.md", "doc_3.md", "doc_4.md"]
+    assert paths(index, "replaced") == ["doc_0.md"]
+    assert len(list(tmp_path.glob("segment_*.json"))) == len(index._segments)
+
+    reloaded = FullTextIndex(tmp_path)
+    assert sorted(paths(reloaded, "common")) == ["doc_2.md", "doc_3.md", "doc_4.md"]
+    assert reloaded.is_current("doc_0.md", 2.0, 8)
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from sgope.memory._analysis_cache import AnalysisCache
+from sgope.memory._ingest import KnowledgeIngest
+
+NOTE = "Quarterly planning meeting: " + "we agreed on the roadmap and budget. " * 5
+METADATA = {
+    "filename": "Quarterly Plan",
+    "summary": "Planning notes",
+    "tags": ["planning", "budget"],
+}
+
+
+@pytest.fixture
+def ingest(make_handler, fake_llm, tmp_path):
+    handler = make_handler()
+    cache = AnalysisCache(tmp_path / "cache.db", 1024 * 1024, 3600)
+
+    def make(llm, **kwargs):
+        events = []
+
+        def progress(step, **info):
+            if step == "save":
+                # The raw input is on disk before any LLM result is in
+                saved = (handler.data_path / info["filename"]).read_text()
+                events.append((step, info["filename"], saved))
+            else:
+                events.append((step, None, None))
+
+        run = KnowledgeIngest(handler, llm, cache, progress=progress, **kwargs)
+        return asyncio.run(run.run()), events
+
+    make.handler = handler
+    return make
+
+
+def test_note_is_saved_first_then_enriched_and_renamed(ingest, fake_llm):
+    llm = fake_llm(reply="An AI summary.", metadata=METADATA)
+
+    result, events = ingest(llm, user_input=NOTE)
+
+    step, provisional, saved = events[0]
+    assert (step, saved) == ("save", NOTE.strip())
+    assert result["status"] == "success"
+    assert result["filename"] == "quarterly_plan.txt"
+    assert result["tags"] == ["planning", "budget"]
+    data_path = ingest.handler.data_path
+    assert not (data_path / provisional).exists()
+    final = (data_path / "quarterly_plan.txt").read_text()
+    assert "An AI summary." in final
+    assert "**Tags**: planning, budget" in final
+    assert ingest.handler.find_by_name("quarterly_plan.txt") is not None
+
+
+def test_saved_input_survives_an_unreachable_llm(ingest, fake_llm):
+    def unreachable(prompt):
+        raise ConnectionError("LLM offline")
+
+    result, events = ingest(fake_llm(reply=unreachable), user_input=NOTE)
+
+    _, provisional, _ = events[0]
+    assert result["status"] == "success"
+    assert result["filename"] == provisional
+    assert (ingest.handler.data_path / provisional).read_text() == NOTE.strip()
+
+
+def test_same_input_is_not_saved_twice(ingest, fake_llm):
+    llm = fake_llm(reply="An AI summary.", metadata=METADATA)
+    first, _ = ingest(llm, user_input=NOTE)
+    prompts = len(llm.prompts)
+
+    again, events = ingest(llm, user_input=NOTE)
+
+    assert again["filename"] == first["filename"]
+    assert again["message"].startswith("Already saved as")
+    assert events == []
+    assert len(llm.prompts) == prompts
+
+
+def test_attachments_are_analysed_and_swapped_in(ingest, fake_llm):
+    llm = fake_llm(
+        reply=lambda prompt: "Config analysis." if "config.json" in prompt else "x",
+        metadata=METADATA,
+    )
+    attachments = [
+        {"type": "file", "name": "config.json", "content": '{"debug": true}'}
+    ]
+
+    result, events = ingest(llm, user_input="save this", attachments=attachments)
+
+    _, _, saved = events[0]
+    assert "_Analysis pending_" in saved
+    final = (ingest.handler.data_path / result["filename"]).read_text()
+    assert "Config analysis." in final
+    assert "_Analysis pending_" not in final
+    assert "file_analysis" in [step for step, _, _ in events]
@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sgope.memory import JobQueue
+from sgope.server import sse
+
+
+def steps(events):
+    return [event["step"] for event in events]
+
+
+async def succeed(progress):
+    progress("analysis", index=1)
+    return {"status": "success", "message": "done"}
+
+
+async def fail(progress):
+    raise RuntimeError("boom")
+
+
+def test_job_runs_through_its_states(tmp_path):
+    async def main():
+        queue = JobQueue(tmp_path / "jobs.json", save_delay=0)
+        job = queue.submit("add_knowledge", succeed)
+        assert job["status"] == "queued"
+        finished = await queue.wait(job["id"])
+        await queue.stop()
+        return finished
+
+    job = asyncio.run(main())
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["message"] == "done"
+    assert steps(job["events"]) == ["queued", "started", "analysis", "complete"]
+    assert job["started"] <= job["finished"]
+
+
+def test_failing_job_records_the_error(tmp_path):
+    async def main():
+        queue = JobQueue(tmp_path / "jobs.json", save_delay=0)
+        job = await queue.wait(queue.submit("add_knowledge", fail)["id"])
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+
+
+def test_state_survives_a_restart_and_interrupted_jobs_fail(tmp_path):
+    path = tmp_path / "jobs.json"
+    release = None
+
+    async def blocked(progress):
+        await release.wait()
+        return {"status": "success"}
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        queue = JobQueue(path, save_delay=0)
+        done = await queue.wait(queue.submit("add_knowledge", succeed)["id"])
+        pending = queue.submit("add_knowledge", blocked)
+        await asyncio.sleep(0)
+        queue.save()
+        return done["id"], pending["id"]
+
+    done_id, pending_id = asyncio.run(main())
+    reloaded = JobQueue(path)
+
+    assert reloaded.get(done_id)["status"] == "succeeded"
+    assert reloaded.get(pending_id)["status"] == "failed"
+    assert reloaded.get(pending_id)["error"] == "Interrupted by server shutdown"
+
+
+def test_event_stream_follows_a_running_job(tmp_path, monkeypatch):
+    async def main():
+        queue = JobQueue(tmp_path / "jobs.json", save_delay=0)
+        monkeypatch.setattr(sse, "job_queue", queue)
+        release = asyncio.Event()
+
+        async def slow(progress):
+            progress("save", filename="notes.txt")
+            await release.wait()
+            progress("enrich")
+            return {"status": "success"}
+
+        job = queue.submit("add_knowledge", slow)
+        response = await sse.stream_job_events(job["id"])
+        received = []
+        async for line in response.body_iterator:
+            event = json.loads(line.removeprefix("data: "))
+            received.append(event)
+            if event["step"] == "save":
+                release.set()
+        await queue.stop()
+        return received
+
+    received = asyncio.run(main())
+
+    assert steps(received) == ["queued", "started", "save", "enrich", "complete"]
+    assert received[-1]["status"] == "succeeded"
+    assert all(event["type"] == "job_progress" for event in received)
+
+
+def test_event_stream_replays_a_finished_job(tmp_path, monkeypatch):
+    queue = JobQueue(tmp_path / "jobs.json", save_delay=0)
+
+    async def main():
+        job = await queue.wait(queue.submit("add_knowledge", succeed)["id"])
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+    monkeypatch.setattr(sse, "job_queue", queue)
+    app = FastAPI()
+    app.include_router(sse.sse_router, prefix="/api")
+    client = TestClient(app)
+
+    response = client.get(f"/api/jobs/{job['id']}/events")
+    events = [
+        json.loads(line.removeprefix("data: "))
+        for line in response.text.split("\n\n")
+        if line
+    ]
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert steps(events) == steps(job["events"])
+    assert client.get("/api/jobs/unknown/events").status_code == 404
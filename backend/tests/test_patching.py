@@ -0,0 +1,9 @@
+from sgope.memory._patching import apply_edits, utf16_edits
+
+
+def test_utf16_offsets_after_astral_characters():
+    text = "a😀b😀c"
+    # JavaScript sees each emoji as two code units, so "b" is at index 3
+    edits = utf16_edits(text, [(3, 1, "X"), (6, 1, "Y")])
+
+    assert apply_edits(text, edits) == "a😀X😀Y"
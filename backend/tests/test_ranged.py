@@ -0,0 +1,55 @@
+PATH = "data/memory/knowledge_files/log.txt"
+TEXT = "".join(f"line {i}\n" for i in range(1000))
+
+
+def test_range_by_byte_offset(make_client):
+    client, _ = make_client({"log.txt": TEXT})
+
+    result = client.get(
+        "/api/files/range", params={"path": PATH, "offset": 7, "length": 14}
+    ).json()
+
+    assert result["content"] == TEXT[7:21]
+    assert (result["start"], result["end"], result["size"]) == (7, 21, len(TEXT))
+    assert not result["eof"]
+
+
+def test_range_by_line(make_client):
+    client, _ = make_client({"log.txt": TEXT})
+
+    result = client.get(
+        "/api/files/range", params={"path": PATH, "line": 500, "lines": 3}
+    ).json()
+
+    assert result["content"] == "line 500\nline 501\nline 502\n"
+    assert result["start"] == TEXT.index("line 500\n")
+
+
+def test_range_header_returns_partial_content(make_client):
+    client, _ = make_client({"log.txt": TEXT})
+
+    response = client.get(
+        "/api/files/range", params={"path": PATH}, headers={"Range": "bytes=-9"}
+    )
+
+    assert response.status_code == 206
+    assert response.content == b"line 999\n"
+    assert response.headers["content-range"] == (
+        f"bytes {len(TEXT) - 9}-{len(TEXT) - 1}/{len(TEXT)}"
+    )
+
+
+def test_range_errors(make_client):
+    client, _ = make_client({"log.txt": TEXT})
+
+    missing = client.get(
+        "/api/files/range", params={"path": "data/memory/knowledge_files/nope.txt"}
+    )
+    unsatisfiable = client.get(
+        "/api/files/range",
+        params={"path": PATH},
+        headers={"Range": f"bytes={len(TEXT) + 10}-"},
+    )
+
+    assert missing.status_code == 404
+    assert unsatisfiable.status_code == 416
@@ -0,0 +1,92 @@
+import pytest
+
+from sgope.memory import assemble_context, context_budget
+
+
+class FakeHandler:
+    """Serves fixed chunks in place of KnowledgeFileHandler.retrieve"""
+
+    def __init__(self, chunks, pinned=()):
+        self.chunks = chunks
+        self.pinned = list(pinned)
+
+    def retrieve(self, query, k, paths=None):
+        if paths is not None:
+            return [chunk for chunk in self.pinned if chunk["path"] in paths][:k]
+        return self.chunks[:k]
+
+
+def chunk(path, start, text, score):
+    return {
+        "path": path,
+        "start": start,
+        "end": start + len(text),
+        "text": text,
+        "score": score,
+    }
+
+
+def test_context_stays_within_the_token_budget():
+    # 40 characters is about 10 tokens each
+    chunks = [chunk(f"f{i}.md", 0, "x" * 39 + str(i), 0.9 - i / 100) for i in range(5)]
+
+    _, sources = assemble_context(FakeHandler(chunks), "q", budget=25)
+
+    assert [source["path"] for source in sources] == ["f0.md", "f1.md"]
+    assert sum(source["tokens"] for source in sources) <= 25
+
+
+def test_overlapping_chunks_are_merged_and_paid_for_once():
+    text = "abcdefghij" * 8
+    chunks = [
+        chunk("a.md", 0, text[:60], 0.9),
+        chunk("a.md", 40, text[40:80], 0.8),
+    ]
+
+    context, sources = assemble_context(FakeHandler(chunks), "q", budget=20)
+
+    assert len(sources) == 1
+    assert (sources[0]["start"], sources[0]["end"]) == (0, 80)
+    assert sources[0]["tokens"] == 20
+    assert text in context
+
+
+def test_pinned_files_come_first_and_weak_matches_are_dropped():
+    handler = FakeHandler(
+        [chunk("strong.md", 0, "strong", 0.9), chunk("weak.md", 0, "weak", 0.05)],
+        pinned=[chunk("pinned.md", 0, "pinned", 0.01)],
+    )
+
+    _, sources = assemble_context(
+        handler, "q", budget=100, pinned_paths=["pinned.md"], min_score=0.1
+    )
+
+    assert [source["path"] for source in sources] == ["pinned.md", "strong.md"]
+
+
+def test_context_budget_uses_longest_model_prefix(monkeypatch):
+    monkeypatch.delenv("RAG_TOKEN_BUDGET", raising=False)
+    assert context_budget("gpt-4.1-mini") == 8000
+    assert context_budget("gpt-4-turbo") == 4000
+    assert context_budget("unknown-model") == 2000
+
+    monkeypatch.setenv("RAG_TOKEN_BUDGET", "123")
+    assert context_budget("gpt-4.1-mini") == 123
+
+
+def test_handler_context_after_background_index_build(make_handler, monkeypatch):
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    handler = make_handler(
+        {
+            "garden.md": "Tomatoes need sun and regular watering in the garden.",
+            "taxes.md": "File the tax return before the April deadline.",
+        }
+    )
+    if not handler.vectors.enabled:
+        pytest.skip("NumPy not installed")
+    assert handler.retrieve("tomatoes watering") == []
+
+    handler.sync_content_indexes()
+    _, sources = assemble_context(handler, "tomatoes watering", budget=100)
+
+    assert sources[0]["name"] == "garden.md"
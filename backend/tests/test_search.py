@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from sgope.memory._search_index import SearchIndex
+
+
+def labels(handler, query, limit=10):
+    return [suggestion.label for suggestion in handler.search(query, limit)]
+
+
+def test_subsequence_match_beats_many_substring_hits(make_handler):
+    # "mn" is a substring of every column_* name, but only a subsequence of
+    # meeting_notes.md, whose matches sit on word boundaries
+    names = [f"column_{i}.md" for i in range(30)] + ["meeting_notes.md"]
+    handler = make_handler(names)
+
+    assert labels(handler, "mn")[0] == "meeting_notes.md"
+
+
+def test_recent_file_ranks_above_many_older_prefix_hits(make_handler):
+    year_ago = time.time() - 365 * 24 * 3600
+    old = [f"a_old_{i:03d}.md" for i in range(300)]
+    handler = make_handler(old + ["az_recent.md"], {name: year_ago for name in old})
+
+    assert labels(handler, "a")[0] == "az_recent.md"
+
+
+def test_reindexing_a_name_does_not_rebuild_postings(monkeypatch):
+    index = SearchIndex()
+    for doc_id, name in enumerate(["alpha.md", "beta.md", "gamma.md"]):
+        index.add(doc_id, name)
+    monkeypatch.setattr(
+        index, "_compact", lambda: pytest.fail("reindex compacted the index")
+    )
+
+    index.add(0, "zeta.md")
+    index.add(0, "alphabet.md")
+
+    assert list(index.substring("alpha", 10)) == [0]
+    assert list(index.substring("eta", 10)) == [1]
+    assert sorted(index.candidates("bet")) == [0, 1]
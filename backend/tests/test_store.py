@@ -0,0 +1,39 @@
+from sgope.memory._store import COMPACT_MIN_TOMBSTONES, KnowledgeStore
+
+
+def test_contains_compares_by_path(make_handler):
+    handler = make_handler(["a.md", "b.md"])
+
+    assert handler[0] in handler
+    handler.remove_path(handler[0].file_path)
+    assert len(handler) == 1
+    assert all(item in handler for item in handler)
+
+
+def test_setitem_keeps_position(make_handler):
+    handler = make_handler(["a.md", "b.md", "c.md"])
+    order = [entry.name for entry in handler]
+    item = handler[1].model_copy(
+        update={"name": "z.md", "file_path": handler[1].file_path[:-4] + "z.md"}
+    )
+
+    handler[1] = item
+
+    assert [entry.name for entry in handler] == [order[0], "z.md", order[2]]
+    assert [s.label for s in handler.search("z")] == ["z.md"]
+    assert handler.find_by_name(order[1]) is None
+
+
+def test_store_compacts_once_tombstones_pile_up(make_handler):
+    names = [f"note_{i}.md" for i in range(COMPACT_MIN_TOMBSTONES * 2)]
+    handler = make_handler(names)
+    order = [item.file_path for item in handler]
+
+    for path in order[:-10]:
+        handler.remove_path(path)
+
+    store: KnowledgeStore = handler._state.store
+    assert store.tombstones < COMPACT_MIN_TOMBSTONES
+    assert [item.file_path for item in handler] == order[-10:]
+    name = handler[-1].name
+    assert [s.label for s in handler.search(name)][0] == name
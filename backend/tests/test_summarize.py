@@ -0,0 +1,46 @@
+import asyncio
+
+from sgope.memory._retrieval import CHARS_PER_TOKEN
+from sgope.memory._summarize import needs_map_reduce, split_sections, summarize_large
+
+
+def test_map_reduce_only_above_the_chunk_threshold():
+    limit = 100 * CHARS_PER_TOKEN
+
+    assert not needs_map_reduce("x" * limit, max_tokens=100)
+    assert needs_map_reduce("x" * (limit + CHARS_PER_TOKEN), max_tokens=100)
+
+
+def test_sections_split_at_headings_within_the_size_limit():
+    text = "".join(f"# Part {i}\n" + "words here\n" * 8 for i in range(6))
+
+    sections = split_sections(text, 200)
+
+    assert "".join(sections) == text
+    assert all(len(section) <= 200 for section in sections)
+    assert all(section.startswith("# Part") for section in sections)
+
+
+def test_each_section_is_summarized_once(fake_llm):
+    llm = fake_llm(reply="section summary")
+    text = "\n\n".join(f"paragraph {i} " + "filler " * 30 for i in range(8))
+
+    result = asyncio.run(summarize_large(text, "notes.md", llm, max_tokens=100))
+
+    total = len(split_sections(text, 100 * CHARS_PER_TOKEN))
+    assert len(llm.prompts) == total > 1
+    assert result.startswith(f"Summaries of {total} of {total} sections")
+
+
+def test_budget_samples_sections_keeping_first_and_last(fake_llm):
+    llm = fake_llm(reply="s")
+    text = "\n".join(f"line {i:04d} " + "x" * 30 for i in range(400))
+
+    result = asyncio.run(
+        summarize_large(text, "big.log", llm, max_tokens=50, budget=200)
+    )
+
+    total = len(split_sections(text, 50 * CHARS_PER_TOKEN))
+    assert len(llm.prompts) == 4 < total
+    assert f"[Part 1/{total}]" in result
+    assert f"[Part {total}/{total}]" in result
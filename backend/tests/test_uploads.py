@@ -0,0 +1,92 @@
+import pytest
+
+from sgope.memory._blobs import blob_digest
+from sgope.server.uploads import MultipartUpload, UploadTooLarge
+
+BOUNDARY = b"test-boundary"
+
+
+def multipart(*parts):
+    """A multipart/form-data body of ``(filename, data)`` file parts"""
+    body = b""
+    for filename, data in parts:
+        body += (
+            b"--" + BOUNDARY + b"\r\n"
+            b'Content-Disposition: form-data; name="files"; filename="'
+            + filename.encode()
+            + b'"\r\nContent-Type: text/plain\r\n\r\n'
+            + data
+            + b"\r\n"
+        )
+    return body + b"--" + BOUNDARY + b"--\r\n"
+
+
+def feed(upload, body, chunk_size=7):
+    for i in range(0, len(body), chunk_size):
+        upload.write(body[i : i + chunk_size])
+    return upload.finish()
+
+
+def test_parts_are_stored_and_registered(make_handler):
+    handler = make_handler()
+    upload = MultipartUpload(handler, BOUNDARY)
+
+    files = feed(upload, multipart(("a.txt", b"alpha"), ("b.txt", b"beta")))
+
+    assert [(f["name"], f["size"]) for f in files] == [("a.txt", 5), ("b.txt", 4)]
+    assert files[0]["id"] == blob_digest(b"alpha")
+    assert handler.blobs.get(files[1]["id"]) == b"beta"
+    assert handler.attachment_info(files[0]["id"]) is not None
+    upload.abort()
+    assert handler.blobs.has(files[0]["id"])
+
+
+def test_file_size_limit(make_handler):
+    handler = make_handler()
+    upload = MultipartUpload(handler, BOUNDARY, max_file_bytes=8)
+
+    with pytest.raises(UploadTooLarge, match="big.txt"):
+        feed(upload, multipart(("big.txt", b"x" * 20)))
+    upload.abort()
+
+    assert len(handler.blobs) == 0
+    assert not list(handler.blobs.directory.glob("*.tmp"))
+
+
+def test_total_limit_discards_parts_already_committed(make_handler):
+    handler = make_handler()
+    kept = handler.add_attachment(b"shared")["id"]
+    upload = MultipartUpload(handler, BOUNDARY, max_total_bytes=16)
+
+    with pytest.raises(UploadTooLarge, match="total"):
+        feed(
+            upload,
+            multipart(("a.txt", b"shared"), ("b.txt", b"new"), ("c.txt", b"y" * 10)),
+        )
+    upload.abort()
+
+    # The new part is gone; the blob that existed before the upload stays
+    assert not handler.blobs.has(blob_digest(b"new"))
+    assert handler.blobs.has(kept)
+    assert not list(handler.blobs.directory.glob("*.tmp"))
+
+
+def test_upload_endpoint(make_client):
+    client, handler = make_client()
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY.decode()}"}
+
+    response = client.post(
+        "/api/attachments/upload",
+        content=multipart(("notes.txt", b"uploaded")),
+        headers=headers,
+    )
+    too_large = client.post(
+        "/api/attachments/upload",
+        content=multipart(("huge.txt", b"z" * (5 * 1024 * 1024 + 1))),
+        headers=headers,
+    )
+
+    attachment = response.json()["attachments"][0]
+    assert attachment["id"] == blob_digest(b"uploaded")
+    assert too_large.status_code == 413
+    assert not handler.blobs.has(blob_digest(b"z" * (5 * 1024 * 1024 + 1)))
@@ -0,0 +1,56 @@
+import pytest
+
+from sgope.memory._vectors import HashingEmbedder, VectorIndex, chunk_text
+
+pytest.importorskip("numpy")
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+def test_search_returns_top_k_best_first(tmp_path):
+    index = VectorIndex(tmp_path, embedder=HashingEmbedder(256))
+    index.add("fruit.md", "apples and pears in the orchard", 1.0, 30)
+    index.add("cars.md", "engines gearboxes and tyres", 1.0, 27)
+    index.add("mixed.md", "apples in the garage next to tyres", 1.0, 34)
+
+    hits = index.search("apples orchard", k=2)
+
+    assert [hit[0] for hit in hits] == ["fruit.md", "mixed.md"]
+    assert hits[0][3] >= hits[1][3]
+    assert index.search("apples", k=2, paths=["cars.md"])[0][0] == "cars.md"
+
+
+def test_unchanged_chunks_are_not_embedded_again(tmp_path):
+    embedder = CountingEmbedder()
+    index = VectorIndex(tmp_path, embedder=embedder)
+    text = "first paragraph " * 60 + "\n\n" + "second paragraph " * 60
+    index.add("a.md", text, 1.0, len(text))
+    first = len(embedder.embedded)
+
+    index.add("a.md", text + "\n\nthird paragraph", 2.0, len(text) + 17)
+
+    assert len(chunk_text(text)) == first > 1
+    # Chunks whose text is unchanged keep their vectors
+    assert len(embedder.embedded) - first < first
+    assert index.is_current("a.md", 2.0, len(text) + 17)
+
+
+def test_removed_rows_are_reused(tmp_path):
+    index = VectorIndex(tmp_path, embedder=HashingEmbedder(256))
+    index.add("a.md", "alpha", 1.0, 5)
+    index.add("b.md", "beta", 1.0, 4)
+
+    index.remove("a.md")
+    index.add("c.md", "gamma", 1.0, 5)
+
+    assert len(index) == 2
+    assert len(index._chunks) == 2
+    assert {hit[0] for hit in index.search("gamma", k=5)} == {"b.md", "c.md"}
@@ -165,6 +165,20 @@ export default function ChatInterface() {
                   );
                   break;
 
+                case "action_progress":
+                  // Background job step finished (e.g. file_analysis 2/3)
+                  assistantContent = `🔄 Executing action: ${data.action} (${
+                    data.step
+                  }${data.total ? ` ${data.index}/${data.total}` : ""})...`;
+                  setMessages((prev) =>
+                    prev.map((msg) =>
+                      msg.id === assistantMessageId
+                        ? { ...msg, content: assistantContent }
+                        : msg
+                    )
+                  );
+                  break;
+
                 case "action_complete":
                   console.log("Action completed:", data.action, data.result);
                   setIsActionActive(false); // Reset action state